@@ -0,0 +1,264 @@
+"""
+Agent-loop benchmark.
+
+Runs wrapper.run_agent against a scripted fake LLM, so the only thing being
+timed is the loop itself: tool dispatch, logging, context management. Each
+scenario runs in a fresh temp workspace and reports:
+
+    steps_per_sec   LLM calls completed per second
+    p50_ms, p99_ms  per-step time outside the LLM call (gap between LLM calls)
+    rss_growth_kb   wrapper RSS at the last step minus RSS after warm-up
+    log_bytes       bytes of session_log + raw_activity written
+
+Usage:
+    python3 bench_agent.py                          # run all, compare to bench_baseline.json
+    python3 bench_agent.py --scenarios slow_web --steps 20
+    python3 bench_agent.py --update-baseline        # after an intended change, or on new hardware
+
+Exits with status 1 if any metric is worse than the baseline by more than --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import threading
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+import wrapper
+
+DEFAULT_BASELINE = os.path.join(HERE, "bench_baseline.json")
+WARMUP_STEPS = 5
+# metric -> True when bigger is better
+METRICS = {"steps_per_sec": True, "p50_ms": False, "p99_ms": False, "rss_growth_kb": False, "log_bytes": False}
+# Differences smaller than this are noise, whatever the percentage
+NOISE_FLOOR = {"p50_ms": 2.0, "p99_ms": 5.0, "rss_growth_kb": 1024}
+
+
+# ==========================================
+# WORKLOADS
+# ==========================================
+def _call(name, *args):
+    return {"name": name, "arguments": [str(a) for a in args]}
+
+def parallel_reads(step, ctx):
+    return [_call("read", f"data/file_{(step * 10 + i) % 20}.txt") for i in range(10)]
+
+def big_writes(step, ctx):
+    # ~100 KB per argument keeps the subprocess mode under the per-argument argv limit
+    return [_call("write", f"out/big_{step}_{i}.txt", "x" * 100_000) for i in range(2)]
+
+def slow_web(step, ctx):
+    return [_call("http", "GET", f"{ctx['web_url']}/page/{step}/{i}") for i in range(5)]
+
+def long_history(step, ctx):
+    return [_call("read", "data/long.txt"), _call("append", "notes.md", f"step {step}\n")]
+
+SCENARIOS = {
+    "parallel_reads": (parallel_reads, 30),
+    "big_writes": (big_writes, 30),
+    "slow_web": (slow_web, 15),
+    "long_history": (long_history, 120),
+}
+
+# Written next to a scenario's numbers in the baseline, so whoever compares against them knows what they measure
+BASELINE_NOTES = {
+    "parallel_reads": "Reads cycle through 20 files, so after the first two steps nearly every read is a "
+                      "tool-cache hit; this mostly measures cache lookups, not file reads. Run with "
+                      "TOOL_CACHE_TTLS = {} to time the reads themselves.",
+}
+
+def _setup_workspace(ws):
+    os.makedirs(os.path.join(ws, "data"), exist_ok=True)
+    for i in range(20):
+        with open(os.path.join(ws, "data", f"file_{i}.txt"), "w") as f:
+            f.write(f"file {i}\n" * 200)
+    with open(os.path.join(ws, "data", "long.txt"), "w") as f:
+        f.write("history filler line\n" * 1000)   # ~20 KB per read, grows the prompt fast
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    delay = 0.3
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        body = b"<html>slow page</html>"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+# ==========================================
+# FAKE LLM
+# ==========================================
+def _rss_kb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return 0
+
+class ScriptedLLM:
+    """Stands in for the OpenAI client: answers step N with workload(N) and times the gaps between calls."""
+    def __init__(self, workload, steps, ctx, latency=0.0):
+        self.workload = workload
+        self.steps = steps
+        self.ctx = ctx
+        self.latency = latency
+        self.step = 0
+        self.last_end = None
+        self.gaps = []
+        self.rss = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        start = time.perf_counter()
+        if kwargs["messages"][0]["content"] == wrapper.SUMMARY_PROMPT:
+            content = "Benchmark summary of earlier steps."
+        else:
+            if self.last_end is not None:
+                self.gaps.append(start - self.last_end)
+            self.rss.append(_rss_kb())
+            self.step += 1
+            calls = self.workload(self.step, self.ctx) if self.step <= self.steps else [_call("finish")]
+            content = json.dumps({"thought": f"step {self.step}", "tool_calls": calls})
+        if self.latency:
+            time.sleep(self.latency)
+        self.last_end = time.perf_counter()
+        if kwargs.get("stream"):
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[i:i + 64]))])
+                         for i in range(0, len(content), 64)])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def _dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def _reset_wrapper(ws):
+    """Points wrapper at a fresh workspace and drops per-process caches that remember the old one."""
+    wrapper.flush_logs()
+    for event_log in wrapper._event_logs.values():
+        event_log.close()
+    wrapper._event_logs.clear()
+    wrapper._tools_module = None
+    wrapper._toolbox = None
+    wrapper.WORK_DIR = ws
+    wrapper.SESSION_FILE = os.path.join(ws, "session_log.txt")
+    wrapper.TOOL_SCRIPT = os.path.join(HERE, "use_tools.py")
+    os.chdir(ws)
+
+
+def run_scenario(name, steps=None, latency=0.0):
+    workload, default_steps = SCENARIOS[name]
+    steps = steps or default_steps
+    ws = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    cwd = os.getcwd()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        _setup_workspace(ws)
+        _reset_wrapper(ws)
+        wrapper.MAX_STEPS = steps + 2
+        llm = ScriptedLLM(workload, steps, {"web_url": f"http://127.0.0.1:{server.server_port}"}, latency)
+        wrapper.make_client = lambda is_async=False: llm
+
+        t0 = time.perf_counter()
+        wrapper.run_agent(f"benchmark scenario {name}")
+        elapsed = time.perf_counter() - t0
+
+        gaps_ms = [g * 1000 for g in llm.gaps[WARMUP_STEPS:]] or [g * 1000 for g in llm.gaps]
+        rss = llm.rss[WARMUP_STEPS:] or llm.rss
+        return {
+            "steps": llm.step,
+            "steps_per_sec": round(llm.step / elapsed, 2),
+            "p50_ms": round(_percentile(gaps_ms, 50), 2),
+            "p99_ms": round(_percentile(gaps_ms, 99), 2),
+            "rss_growth_kb": rss[-1] - rss[0] if rss else 0,
+            "log_bytes": _dir_bytes(os.path.join(ws, "raw_activity"))
+                         + sum(os.path.getsize(os.path.join(ws, f)) for f in os.listdir(ws) if f.startswith("session_log")),
+        }
+    finally:
+        server.shutdown()
+        os.chdir(cwd)
+        shutil.rmtree(ws, ignore_errors=True)
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = base.get(metric), metrics.get(metric)
+            if old is None or new is None or abs(new - old) < NOISE_FLOOR.get(metric, 0):
+                continue
+            if old == 0:
+                regressions.append(f"{name}.{metric}: {old} -> {new}")
+                continue
+            change = (new - old) / abs(old)
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{name}.{metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the agent loop with a scripted LLM")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--steps", type=int, default=None, help="Override steps per scenario")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake LLM latency per call, seconds")
+    parser.add_argument("--mode", default=wrapper.TOOL_DISPATCH_MODE, choices=["pool", "inprocess", "subprocess"])
+    parser.add_argument("--stream", action="store_true", help="Exercise the streaming path")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before failing")
+    parser.add_argument("--out", default=None, help="Also write results JSON here")
+    args = parser.parse_args()
+
+    wrapper.TOOL_DISPATCH_MODE = args.mode
+    wrapper.LLM_STREAM = args.stream
+    wrapper.LOG_ECHO = False
+
+    results = {}
+    for name in args.scenarios.split(","):
+        results[name] = run_scenario(name, args.steps, args.latency)
+        print(f"{name:16} " + "  ".join(f"{k}={v}" for k, v in results[name].items()))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {name: dict(metrics, **({"note": BASELINE_NOTES[name]} if name in BASELINE_NOTES else {}))
+                    for name, metrics in results.items()}
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        sys.exit(0)
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("REGRESSIONS:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No regressions against baseline.")
@@ -0,0 +1,68 @@
+"""
+Workspace blob store for oversized tool outputs.
+
+The wrapper writes any observation over its spill threshold to
+blobs/<id>.txt (id = first 16 hex chars of the sha256, so the same output is
+stored once) and puts a preview in the prompt instead: size, line count,
+the head and the tail. The model pulls the rest with
+`read_blob <id> <offset> <length>` (byte offsets) only if it needs it.
+"""
+import os
+import re
+import hashlib
+import tempfile
+
+BLOB_DIR = "blobs"
+MAX_READ_BYTES = 20000
+_BLOB_ID = re.compile(r"^[0-9a-f]{16}$")
+
+
+def blob_path(blob_id, directory=BLOB_DIR):
+    if not _BLOB_ID.match(blob_id or ""):
+        raise ValueError(f"Invalid blob id: {blob_id!r}")
+    return os.path.join(directory, f"{blob_id}.txt")
+
+def put(text, directory=BLOB_DIR):
+    """Stores text and returns its blob id."""
+    data = text.encode("utf-8", errors="replace")
+    blob_id = hashlib.sha256(data).hexdigest()[:16]
+    path = blob_path(blob_id, directory)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return blob_id
+
+def preview(text, blob_id, head_chars=1500, tail_chars=500):
+    size = len(text.encode("utf-8", errors="replace"))
+    lines = text.count("\n") + (0 if text.endswith("\n") else 1)
+    return (
+        f"[Output too large for the context: {size} bytes, {lines} lines. Stored as blob {blob_id}. "
+        f"Use read_blob {blob_id} <offset> <length> to read byte ranges (max {MAX_READ_BYTES} per call).]\n"
+        f"--- head ---\n{text[:head_chars]}\n"
+        f"--- tail ---\n{text[-tail_chars:] if tail_chars else ''}"
+    )
+
+def spill(text, threshold, directory=BLOB_DIR, head_chars=1500, tail_chars=500):
+    """text itself if it's under threshold chars, else a preview pointing at the stored blob."""
+    if not isinstance(text, str) or len(text) <= threshold:
+        return text
+    return preview(text, put(text, directory), head_chars, tail_chars)
+
+def read_range(blob_id, offset=0, length=MAX_READ_BYTES, directory=BLOB_DIR):
+    try:
+        path = blob_path(blob_id, directory)
+    except ValueError as e:
+        return f"Error: {e}"
+    if not os.path.exists(path):
+        return f"Error: Blob {blob_id} not found."
+    length = max(0, min(int(length), MAX_READ_BYTES))
+    size = os.path.getsize(path)
+    offset = max(0, int(offset))
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(length)
+    end = offset + len(data)
+    return f"[blob {blob_id} bytes {offset}-{end} of {size}]\n" + data.decode("utf-8", errors="replace")
@@ -0,0 +1,250 @@
+"""
+Record/replay cassettes for chat.completions.create.
+
+Recording wraps a real OpenAI client and appends every request/response pair to
+a JSONL cassette, keyed by a hash of the normalized request (model, messages
+and any other arguments except `stream`). Replaying serves the responses from
+the cassette with no network. Identical requests are answered in recorded order.
+A request with no exact match (e.g. a tool printed a different timestamp this
+time) gets the next response in recording order, so whole sessions still replay.
+
+    python3 cassette.py serve llm_cassette.jsonl --port 8765
+
+starts an OpenAI-compatible stand-in server over the same cassette, for
+clients that can only be pointed at a BASE_URL.
+"""
+import json
+import time
+import hashlib
+import argparse
+import threading
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLAY_CHUNK_CHARS = 16
+
+
+def request_key(kwargs):
+    request = {k: v for k, v in kwargs.items() if k not in ("stream", "stream_options")}
+    normalized = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def _to_namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(v) for v in value]
+    return value
+
+def _to_dict(resp):
+    if hasattr(resp, "model_dump"):
+        return resp.model_dump()
+    return json.loads(json.dumps(resp, default=lambda o: o.__dict__))
+
+def _stream_chunks(response):
+    """Splits a recorded response into delta chunks shaped like the OpenAI streaming API."""
+    choice = response["choices"][0]
+    content = choice["message"].get("content") or ""
+    for i in range(0, len(content), REPLAY_CHUNK_CHARS):
+        yield {"choices": [{"index": 0, "delta": {"content": content[i:i + REPLAY_CHUNK_CHARS]}, "finish_reason": None}]}
+    # Native-mode calls: a header delta with id and name, then the arguments in pieces
+    for index, call in enumerate(choice["message"].get("tool_calls") or []):
+        function = call.get("function") or {}
+        arguments = function.get("arguments") or ""
+        yield {"choices": [{"index": 0, "finish_reason": None, "delta": {"content": None, "tool_calls": [
+            {"index": index, "id": call.get("id"), "type": call.get("type") or "function",
+             "function": {"name": function.get("name"), "arguments": ""}}]}}]}
+        for i in range(0, len(arguments), REPLAY_CHUNK_CHARS):
+            yield {"choices": [{"index": 0, "finish_reason": None, "delta": {"content": None, "tool_calls": [
+                {"index": index, "id": None, "type": None,
+                 "function": {"name": None, "arguments": arguments[i:i + REPLAY_CHUNK_CHARS]}}]}}]}
+    yield {"choices": [{"index": 0, "delta": {"content": None}, "finish_reason": choice.get("finish_reason") or "stop"}],
+           "usage": response.get("usage")}
+
+
+class Cassette:
+    def __init__(self, path, strict=False):
+        self.path = path
+        self.strict = strict
+        self.lock = threading.Lock()
+        self.responses = []     # in recording order
+        self.by_key = {}        # key -> indexes into self.responses
+        self.served = {}
+        self.cursor = 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._add(json.loads(line))
+        except FileNotFoundError:
+            pass
+
+    def _add(self, entry):
+        self.by_key.setdefault(entry["key"], []).append(len(self.responses))
+        self.responses.append(entry["response"])
+
+    def record(self, kwargs, response):
+        entry = {"key": request_key(kwargs), "ts": time.time(), "request": kwargs, "response": response}
+        with self.lock:
+            self._add(entry)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    def lookup(self, kwargs):
+        key = request_key(kwargs)
+        with self.lock:
+            indexes = self.by_key.get(key)
+            if indexes:
+                n = self.served.get(key, 0)
+                self.served[key] = n + 1
+                # Past the recorded count, keep answering with the last one
+                index = indexes[min(n, len(indexes) - 1)]
+            elif not self.strict and self.cursor < len(self.responses):
+                index = self.cursor
+            else:
+                raise KeyError(f"Cassette {self.path} has no response for request {key[:12]}")
+            self.cursor = index + 1
+            return self.responses[index]
+
+
+def _assemble_stream(chunks):
+    """Rebuilds a full response dict from the streamed chunks we passed through."""
+    content, finish, usage = [], None, None
+    calls = {}      # index -> tool call, with its argument fragments joined as they arrive
+    for chunk in chunks:
+        if chunk.get("usage"):
+            usage = chunk["usage"]
+        for choice in chunk.get("choices") or []:
+            delta = choice.get("delta") or {}
+            content.append(delta.get("content") or "")
+            for tc in delta.get("tool_calls") or []:
+                call = calls.setdefault(tc.get("index", 0), {"id": None, "type": "function",
+                                                            "function": {"name": "", "arguments": ""}})
+                call["id"] = tc.get("id") or call["id"]
+                call["type"] = tc.get("type") or call["type"]
+                function = tc.get("function") or {}
+                call["function"]["name"] += function.get("name") or ""
+                call["function"]["arguments"] += function.get("arguments") or ""
+            finish = choice.get("finish_reason") or finish
+    message = {"role": "assistant", "content": "".join(content)}
+    if calls:
+        message["tool_calls"] = [calls[i] for i in sorted(calls)]
+    return {"choices": [{"index": 0, "message": message, "finish_reason": finish}], "usage": usage}
+
+
+class _Completions:
+    def __init__(self, cassette, mode, real):
+        self.cassette = cassette
+        self.mode = mode
+        self.real = real
+
+    def create(self, **kwargs):
+        if self.mode == "replay":
+            response = self.cassette.lookup(kwargs)
+            if kwargs.get("stream"):
+                return (_to_namespace(c) for c in _stream_chunks(response))
+            return _to_namespace(response)
+        resp = self.real.chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return self._record_stream(kwargs, resp)
+        self.cassette.record(kwargs, _to_dict(resp))
+        return resp
+
+    def _record_stream(self, kwargs, stream):
+        seen = []
+        for chunk in stream:
+            seen.append(_to_dict(chunk))
+            yield chunk
+        self.cassette.record(kwargs, _assemble_stream(seen))
+
+
+class _AsyncCompletions(_Completions):
+    async def create(self, **kwargs):
+        if self.mode == "replay":
+            response = self.cassette.lookup(kwargs)
+            if kwargs.get("stream"):
+                return self._replay_stream(response)
+            return _to_namespace(response)
+        resp = await self.real.chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return self._record_stream_async(kwargs, resp)
+        self.cassette.record(kwargs, _to_dict(resp))
+        return resp
+
+    async def _replay_stream(self, response):
+        for chunk in _stream_chunks(response):
+            yield _to_namespace(chunk)
+
+    async def _record_stream_async(self, kwargs, stream):
+        seen = []
+        async for chunk in stream:
+            seen.append(_to_dict(chunk))
+            yield chunk
+        self.cassette.record(kwargs, _assemble_stream(seen))
+
+
+class CassetteClient:
+    """
+    Drop-in for the parts of OpenAI/AsyncOpenAI the wrapper uses.
+    mode="record" needs `real`; mode="replay" never touches the network.
+    """
+    def __init__(self, path, mode, real=None, is_async=False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if mode == "record" and real is None:
+            raise ValueError("Recording needs a real client.")
+        completions = (_AsyncCompletions if is_async else _Completions)(Cassette(path), mode, real)
+        self.chat = SimpleNamespace(completions=completions)
+
+
+# ==========================================
+# STAND-IN SERVER
+# ==========================================
+def serve(path, host="127.0.0.1", port=8765):
+    cassette = Cassette(path)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            kwargs = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            try:
+                response = cassette.lookup(kwargs)
+            except KeyError as e:
+                self.send_response(404)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(json.dumps({"error": {"message": str(e)}}).encode("utf-8"))
+                return
+            base = {"id": "cassette", "object": "chat.completion", "created": int(time.time()),
+                    "model": kwargs.get("model")}
+            self.send_response(200)
+            if kwargs.get("stream"):
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for chunk in _stream_chunks(response):
+                    chunk = dict(base, object="chat.completion.chunk", **chunk)
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+            else:
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(json.dumps(dict(base, **response)).encode("utf-8"))
+
+        def log_message(self, fmt, *args):
+            pass
+
+    print(f"Serving {path} at http://{host}:{port}/v1 (set BASE_URL to this)")
+    ThreadingHTTPServer((host, port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM cassette tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_cmd = sub.add_parser("serve", help="Serve a cassette as an OpenAI-compatible endpoint")
+    serve_cmd.add_argument("cassette")
+    serve_cmd.add_argument("--host", default="127.0.0.1")
+    serve_cmd.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    serve(args.cassette, args.host, args.port)
@@ -0,0 +1,187 @@
+"""
+Unified-diff parsing and fuzzy hunk application for the `patch` tool.
+
+Hunks are located the way GNU patch does it, loosened for LLM-written diffs:
+  * the header line counts are ignored (models get them wrong); a hunk ends
+    at the next @@, file header or the end of the diff,
+  * each hunk is searched nearest-first around where the header (shifted by
+    the hunks before it) says it should be,
+  * if the exact text isn't found, whitespace differences are ignored, then
+    up to MAX_FUZZ context lines are dropped from each end of the hunk.
+Context lines keep the file's own text, so whitespace-fuzzy matches don't
+rewrite them. Applying never touches the disk; see AgentFileToolbox.patch.
+"""
+import re
+
+MAX_FUZZ = 2
+_HUNK = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,\d+)? @@")
+_LEVELS = (
+    ("exact", lambda s: s),
+    ("whitespace", lambda s: s.rstrip()),
+    ("whitespace", lambda s: " ".join(s.split())),
+)
+
+
+class PatchError(Exception):
+    pass
+
+
+class Hunk:
+    def __init__(self, old_start, header):
+        self.old_start = old_start
+        self.header = header
+        self.lines = []             # (tag, text): tag is " ", "-" or "+"
+        self.no_eol_new = False     # "\ No newline at end of file" after the new side's last line
+
+
+class FilePatch:
+    def __init__(self, old_path, new_path):
+        self.old_path = old_path    # None for a new file
+        self.new_path = new_path    # None for a deletion
+        self.hunks = []
+
+    @property
+    def path(self):
+        return self.new_path or self.old_path
+
+
+def _path(header):
+    path = header[4:].split("\t")[0].strip()
+    if path == "/dev/null":
+        return None
+    if path[:2] in ("a/", "b/"):
+        path = path[2:]
+    return path
+
+
+def parse(text):
+    """FilePatches of a unified diff (git or plain). Raises PatchError if there are none."""
+    lines = [l.rstrip("\r") for l in text.split("\n") if not l.startswith("```")]
+    patches, hunk = [], None
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            patches.append(FilePatch(_path(line), _path(lines[i + 1])))
+            hunk = None
+            i += 2
+            continue
+        match = _HUNK.match(line)
+        if match:
+            if not patches:
+                raise PatchError("Hunk before any '--- a/path' / '+++ b/path' header")
+            # With no old lines, the start is the line the hunk goes after
+            old_start = int(match.group(1)) + (1 if match.group(2) == "0" else 0)
+            hunk = Hunk(old_start, line)
+            patches[-1].hunks.append(hunk)
+        elif line.startswith("diff ") or line.startswith("index ") or line.startswith("new file") or line.startswith("deleted file"):
+            hunk = None
+        elif hunk is not None:
+            if line.startswith("\\"):
+                if hunk.lines and hunk.lines[-1][0] in " +":
+                    hunk.no_eol_new = True
+            elif line[:1] in (" ", "-", "+"):
+                hunk.lines.append((line[0], line[1:]))
+            elif line == "":
+                hunk.lines.append((" ", ""))    # blank context line with its leading space stripped
+        i += 1
+    for patch in patches:
+        for h in patch.hunks:
+            while h.lines and h.lines[-1] == (" ", ""):
+                h.lines.pop()
+        patch.hunks = [h for h in patch.hunks if h.lines]
+    if not patches:
+        raise PatchError("No '--- a/path' / '+++ b/path' file headers found")
+    return patches
+
+
+def _eol(line):
+    return line[len(line.rstrip("\r\n")):]
+
+def _split_lines(content):
+    """Lines with their endings, split on \\n only (str.splitlines also splits on form feeds and the like)."""
+    parts = content.split("\n")
+    return [p + "\n" for p in parts[:-1]] + ([parts[-1]] if parts[-1] else [])
+
+
+def _find(norm_file, old, expected, lower):
+    """Start index of `old` in norm_file at or after `lower`, nearest to `expected`, or None."""
+    if not old:
+        return min(max(expected, lower), len(norm_file))
+    last = len(norm_file) - len(old)
+    candidates = [i for i in range(lower, last + 1) if norm_file[i] == old[0]]
+    for i in sorted(candidates, key=lambda i: (abs(i - expected), i)):
+        if norm_file[i:i + len(old)] == old:
+            return i
+    return None
+
+
+def apply(content, hunks):
+    """
+    Applies hunks to content (str) and returns (new content, one status per hunk).
+    Raises PatchError listing every hunk that doesn't apply.
+    """
+    file_lines = _split_lines(content)
+    eol = "\r\n" if file_lines and file_lines[0].endswith("\r\n") else "\n"
+    bare = [l.rstrip("\r\n") for l in file_lines]
+    normalized = {}
+    out, statuses, failures = [], [], []
+    pos, shift = 0, 0       # next unconsumed file line; how far earlier hunks moved the line numbers
+    touched_end, no_eol_new = False, False
+    for number, hunk in enumerate(hunks, 1):
+        lead = next((i for i, (tag, _) in enumerate(hunk.lines) if tag != " "), len(hunk.lines))
+        trail = next((i for i, (tag, _) in enumerate(reversed(hunk.lines)) if tag != " "), len(hunk.lines))
+        found = None
+        for fuzz in range(MAX_FUZZ + 1):
+            cut_lead, cut_trail = min(fuzz, lead), min(fuzz, trail)
+            if fuzz and (cut_lead, cut_trail) == (min(fuzz - 1, lead), min(fuzz - 1, trail)):
+                continue        # no more context to drop
+            lines = hunk.lines[cut_lead:len(hunk.lines) - cut_trail]
+            old = [text for tag, text in lines if tag != "+"]
+            expected = max(0, hunk.old_start - 1 + shift + cut_lead)
+            for k, (level, norm) in enumerate(_LEVELS):
+                if k not in normalized:
+                    normalized[k] = bare if k == 0 else [norm(l) for l in bare]
+                at = _find(normalized[k], [norm(l) for l in old], expected, pos)
+                if at is not None:
+                    found = (at, lines, old, level, fuzz)
+                    break
+            if found:
+                break
+        if not found:
+            first = next((text for tag, text in hunk.lines if tag != "+"), "")
+            failures.append(f"hunk {number} ({hunk.header}) FAILED: context not found (first line: {first.strip()[:80]!r})")
+            continue
+        at, lines, old, level, fuzz = found
+        out.extend(file_lines[pos:at])
+        i = at
+        for tag, text in lines:
+            if tag == " ":
+                out.append(file_lines[i])
+                i += 1
+            elif tag == "-":
+                i += 1
+            else:
+                out.append(text + eol)
+        notes = []
+        if at != expected:
+            notes.append(f"offset {at - expected:+d} lines")
+        if level != "exact":
+            notes.append("ignoring whitespace")
+        if fuzz:
+            notes.append(f"fuzz {fuzz}")
+        statuses.append(f"hunk {number} OK" + (f" ({', '.join(notes)})" if notes else ""))
+        shift += at - expected     # header line numbers are in the original file's numbering
+        pos = i
+        touched_end = i == len(file_lines)
+        no_eol_new = hunk.no_eol_new
+    if failures:
+        raise PatchError("\n".join(failures))
+    out.extend(file_lines[pos:])
+    # Every line but the last needs its line ending (an insert after a last line without one)
+    for k in range(len(out) - 1):
+        if not _eol(out[k]):
+            out[k] += eol
+    if out and touched_end:
+        out[-1] = out[-1].rstrip("\r\n") + ("" if no_eol_new else eol)
+    return "".join(out), statuses
@@ -0,0 +1,222 @@
+"""
+Append-only event log for raw agent activity.
+
+Replaces the old one-file-per-event raw_activity/ dump. Everything goes into
+numbered JSONL segments (raw_activity/events-000001.jsonl, ...). Finished
+segments are gzipped. LLM prompts are stored as deltas: a "checkpoint" record
+holds the full message list, and the "delta" records after it hold only the
+messages appended since the previous call. A new checkpoint is written every
+CHECKPOINT_EVERY calls, at the start of each segment, and whenever the history
+was rewritten (e.g. compacted).
+
+Rebuild the exact prompt of any LLM call:
+    python3 event_log.py raw_activity 12
+
+BackgroundLogWriter is the queue + writer thread behind wrapper.log_event.
+"""
+import os
+import sys
+import json
+import gzip
+import glob
+import time
+import queue
+import shutil
+import atexit
+import threading
+
+CHECKPOINT_EVERY = 20
+SEGMENT_BYTES = 32 * 1024 * 1024
+
+
+class EventLog:
+    def __init__(self, directory, checkpoint_every=CHECKPOINT_EVERY, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        self.segment_bytes = segment_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        existing = sorted(glob.glob(os.path.join(directory, "events-*.jsonl*")))
+        self.segment = int(os.path.basename(existing[-1])[7:13]) + 1 if existing else 1
+        self.file = None
+        # Continue call numbering from a previous run in the same directory
+        self.calls = _last_call(existing[-1]) if existing else 0
+        self.last_messages = None
+        self.last_len = 0
+
+    def _open_segment(self):
+        path = os.path.join(self.directory, f"events-{self.segment:06d}.jsonl")
+        self.file = open(path, "a", encoding="utf-8")
+        self.last_messages = None   # every segment starts with a checkpoint
+
+    def _rotate(self):
+        path = self.file.name
+        self.file.close()
+        with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(path)
+        self.segment += 1
+        self._open_segment()
+
+    def _write(self, record):
+        if self.file is None:
+            self._open_segment()
+        self.file.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+        self.file.flush()
+        if self.file.tell() >= self.segment_bytes:
+            self._rotate()
+
+    def log_messages(self, messages):
+        """Logs the prompt of one LLM call, as a delta when the history only grew."""
+        with self.lock:
+            self.calls += 1
+            if self.file is None:
+                self._open_segment()
+            record = {"ts": time.time(), "call": self.calls}
+            if (messages is self.last_messages and len(messages) >= self.last_len
+                    and self.calls % self.checkpoint_every != 1):
+                record.update(type="delta", messages=messages[self.last_len:])
+            else:
+                record.update(type="checkpoint", messages=list(messages))
+            self._write(record)
+            self.last_messages = messages
+            self.last_len = len(messages)
+
+    def log(self, label, content):
+        with self.lock:
+            self._write({"ts": time.time(), "call": self.calls, "type": label, "content": content})
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+
+class BackgroundLogWriter:
+    """
+    Takes (path, text) entries from any thread and writes them from one
+    background thread, batching everything that arrived within `flush_interval`
+    seconds into a single open/write per file. Each entry is written whole and
+    in arrival order. A file is rotated to path.1 ... path.<backups> once it
+    passes `max_bytes`. With `echo`, entries are also printed to stdout
+    (unless written with echo=False).
+    """
+    _STOP = object()
+
+    def __init__(self, flush_interval=0.5, max_bytes=50 * 1024 * 1024, backups=5, echo=True):
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.echo = echo
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, path, text, echo=True):
+        self.queue.put((path, text, echo))
+
+    def flush(self, timeout=10):
+        """Blocks until everything queued so far is on disk."""
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(self._STOP)
+            self.thread.join(timeout=10)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not self._STOP and not isinstance(batch[-1], threading.Event):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            entries = [item for item in batch if isinstance(item, tuple)]
+            try:
+                self._write_batch(entries)
+            except Exception as e:
+                sys.stderr.write(f"log writer error: {e}\n")
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if batch[-1] is self._STOP:
+                return
+
+    def _write_batch(self, entries):
+        if not entries:
+            return
+        if self.echo and any(echo for _, _, echo in entries):
+            sys.stdout.write("".join(f"{text}\n" for _, text, echo in entries if echo))
+            sys.stdout.flush()
+        by_path = {}
+        for path, text, _ in entries:
+            by_path.setdefault(path, []).append(text)
+        for path, texts in by_path.items():
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(texts))
+                size = f.tell()
+            if size >= self.max_bytes:
+                self._rotate(path)
+
+    def _rotate(self, path):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        os.replace(path, f"{path}.1")
+
+
+def _read_segment(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def _last_call(path):
+    last = 0
+    try:
+        for record in _read_segment(path):
+            last = record.get("call", last)
+    except (OSError, ValueError):
+        pass
+    return last
+
+def iter_events(directory):
+    """Yields every record from all segments in order, gzipped or not."""
+    for path in sorted(glob.glob(os.path.join(directory, "events-*.jsonl*"))):
+        yield from _read_segment(path)
+
+def rebuild_prompt(directory, call):
+    """Returns the full message list sent on LLM call number `call` (1-based), or None."""
+    messages = None
+    for record in iter_events(directory):
+        if record["type"] == "checkpoint":
+            messages = list(record["messages"])
+        elif record["type"] == "delta":
+            messages.extend(record["messages"])
+        else:
+            continue
+        if record["call"] == call:
+            return messages
+    return None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python3 event_log.py <raw_activity_dir> <call_number>")
+        sys.exit(1)
+    prompt = rebuild_prompt(sys.argv[1], int(sys.argv[2]))
+    if prompt is None:
+        print(f"Call {sys.argv[2]} not found.")
+        sys.exit(1)
+    print(json.dumps(prompt, indent=2, ensure_ascii=False))
@@ -0,0 +1,268 @@
+"""
+Shared on-disk HTTP cache for the web tools.
+
+One directory, bind-mounted by the orchestrator into every agent container,
+so agents on the same topic reuse each other's web_search / web_fetch calls.
+
+    objects/ab/<sha256 of body>     response bodies, content-addressed (identical pages stored once)
+    keys/cd/<sha256 of request>     JSON metadata: body hash, status, headers, stored_at, ttl, ETag/Last-Modified
+    locks/<sha256 of request>       flock'd while one process fetches that request
+
+  * Every file is written to a temp name and os.replace()d into place, so a
+    reader never sees a half-written entry, whoever else is writing.
+  * A miss takes the request's lock before going upstream and re-checks the
+    cache once it has it, so 10 agents asking for the same URL at once make one
+    upstream call and the other 9 read its result.
+  * An expired entry with an ETag / Last-Modified is revalidated with a
+    conditional request; a 304 just renews it.
+  * Hits touch the key file's mtime, and a periodic sweep deletes the least
+    recently used keys (and bodies nothing points at any more) until the
+    cache is under max_bytes.
+"""
+import os
+import json
+import time
+import errno
+import fcntl
+import hashlib
+import tempfile
+
+import requests
+
+SWEEP_INTERVAL = 60     # seconds between eviction sweeps, across all processes sharing the cache
+
+
+class CachedResponse:
+    """The parts of requests.Response the tools use."""
+    def __init__(self, status_code, headers, content, url=""):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+        self.from_cache = True
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class HttpCache:
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024, default_ttl=3600, lock_timeout=60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.lock_timeout = lock_timeout
+        for sub in ("objects", "keys", "locks"):
+            os.makedirs(os.path.join(directory, sub), exist_ok=True)
+
+    # --- layout ---
+    def _key_path(self, key):
+        return os.path.join(self.directory, "keys", key[:2], key)
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    @staticmethod
+    def request_key(method, url, **kwargs):
+        request = {"method": method.upper(), "url": url,
+                   **{k: kwargs.get(k) for k in ("params", "json", "data") if kwargs.get(k) is not None}}
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    # --- entries ---
+    def _load(self, key):
+        try:
+            with open(self._key_path(key), "r") as f:
+                meta = json.load(f)
+            with open(self._object_path(meta["body"]), "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError, KeyError):
+            return None, None
+
+    def _store(self, key, response, ttl):
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        if not os.path.exists(self._object_path(digest)):
+            _atomic_write(self._object_path(digest), body)
+        meta = {
+            "body": digest,
+            "status": response.status_code,
+            "headers": {k.lower(): v for k, v in response.headers.items() if k.lower() in ("content-type", "etag", "last-modified")},
+            "url": response.url,
+            "stored_at": time.time(),
+            "ttl": ttl,
+        }
+        _atomic_write(self._key_path(key), json.dumps(meta).encode("utf-8"))
+        return meta
+
+    def _renew(self, key, meta):
+        meta = dict(meta, stored_at=time.time())
+        _atomic_write(self._key_path(key), json.dumps(meta).encode("utf-8"))
+        return meta
+
+    def _fresh(self, meta):
+        return time.time() - meta["stored_at"] < meta["ttl"]
+
+    def _hit(self, key, meta, body):
+        try:
+            os.utime(self._key_path(key))    # LRU clock
+        except OSError:
+            pass
+        return CachedResponse(meta["status"], meta["headers"], body, meta.get("url", ""))
+
+    # --- coalescing ---
+    def _lock(self, key):
+        """Exclusive flock on the request's lock file, or None if another process holds it past lock_timeout."""
+        fd = os.open(os.path.join(self.directory, "locks", key), os.O_RDWR | os.O_CREAT, 0o666)
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EACCES) or time.monotonic() > deadline:
+                    os.close(fd)
+                    return None
+                time.sleep(0.05)
+
+    @staticmethod
+    def _lock_nowait(path):
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except OSError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except OSError:
+            os.close(fd)
+            return None
+
+    @staticmethod
+    def _unlock(fd):
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    # --- public ---
+    def request(self, method, url, ttl=None, **kwargs):
+        """Like requests.request, but served from / stored into the shared cache. Only 200s are cached."""
+        ttl = self.default_ttl if ttl is None else ttl
+        key = self.request_key(method, url, **kwargs)
+        meta, body = self._load(key)
+        if meta and self._fresh(meta):
+            return self._hit(key, meta, body)
+
+        fd = self._lock(key)
+        try:
+            # Someone else may have fetched it while we waited for the lock
+            meta, body = self._load(key)
+            if meta and self._fresh(meta):
+                return self._hit(key, meta, body)
+
+            headers = dict(kwargs.pop("headers", None) or {})
+            if meta and meta["headers"].get("etag"):
+                headers["If-None-Match"] = meta["headers"]["etag"]
+            if meta and meta["headers"].get("last-modified"):
+                headers["If-Modified-Since"] = meta["headers"]["last-modified"]
+            response = requests.request(method, url, headers=headers or None, **kwargs)
+            if response.status_code == 304 and meta:
+                return self._hit(key, self._renew(key, meta), body)
+            if response.status_code == 200:
+                self._store(key, response, ttl)
+                self._maybe_sweep()
+            return response
+        finally:
+            self._unlock(fd)
+
+    # --- eviction ---
+    def _maybe_sweep(self):
+        stamp = os.path.join(self.directory, "sweep.stamp")
+        try:
+            if time.time() - os.path.getmtime(stamp) < SWEEP_INTERVAL:
+                return
+        except OSError:
+            pass
+        fd = os.open(stamp, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return      # another process is sweeping
+        try:
+            os.utime(stamp)
+            self.sweep()
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def sweep(self):
+        """Deletes least-recently-used keys until the bodies they reference fit in max_bytes."""
+        keys = []
+        for root, _, files in os.walk(os.path.join(self.directory, "keys")):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    with open(path, "r") as f:
+                        keys.append((os.path.getmtime(path), path, json.load(f)["body"]))
+                except (OSError, ValueError, KeyError):
+                    pass
+        objects = {}
+        for root, _, files in os.walk(os.path.join(self.directory, "objects")):
+            for name in files:
+                try:
+                    objects[name] = os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        refs = {}
+        for _, _, digest in keys:
+            refs[digest] = refs.get(digest, 0) + 1
+        # Bodies nobody references any more (their keys were overwritten) go first
+        for digest in [d for d in objects if d not in refs and not d.startswith(".tmp-")]:
+            self._remove(self._object_path(digest))
+            del objects[digest]
+        total = sum(objects.values())
+        for _, path, digest in sorted(keys):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            refs[digest] -= 1
+            if refs[digest] == 0 and digest in objects:
+                self._remove(self._object_path(digest))
+                total -= objects.pop(digest)
+        # Lock files of requests that are no longer cached, unless someone is fetching right now
+        lock_dir = os.path.join(self.directory, "locks")
+        for name in os.listdir(lock_dir):
+            if os.path.exists(self._key_path(name)):
+                continue
+            fd = self._lock_nowait(os.path.join(lock_dir, name))
+            if fd is not None:
+                self._remove(os.path.join(lock_dir, name))
+                self._unlock(fd)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,134 @@
+"""
+Event-driven inbox for steering a running agent.
+
+Messages reach the agent two ways:
+  * INCOMING_MESSAGE.md, as before. A watcher thread picks it up within
+    INBOX_POLL_INTERVAL instead of once per step. The file is renamed before
+    reading, so a write that races the read lands in a fresh file instead of
+    being truncated away.
+  * inbox.sock, a Unix domain socket in the workspace. Each connection
+    carries one message.
+
+A message starting with "URGENT:" sets `urgent`. The agent loop watches that
+flag, abandons the LLM call or tool calls in flight, and injects the message
+right away.
+"""
+import os
+import socket
+import threading
+
+URGENT_PREFIX = "URGENT:"
+INBOX_POLL_INTERVAL = 0.5
+SOCKET_NAME = "inbox.sock"
+
+
+class Inbox:
+    def __init__(self, interrupt_file="INCOMING_MESSAGE.md", socket_path=SOCKET_NAME, on_error=None):
+        self.interrupt_file = interrupt_file
+        self.socket_path = socket_path
+        self.on_error = on_error or (lambda msg: None)
+        self.lock = threading.Lock()
+        self.pending = []
+        self.urgent = threading.Event()
+        self.closed = threading.Event()
+        self.server = None
+        threading.Thread(target=self._watch_file, name="inbox-file", daemon=True).start()
+        if socket_path:
+            self._start_socket()
+
+    # --- producers ---
+    def put(self, text):
+        text = text.strip()
+        if not text:
+            return
+        urgent = text.startswith(URGENT_PREFIX)
+        if urgent:
+            text = text[len(URGENT_PREFIX):].strip()
+        with self.lock:
+            self.pending.append(text)
+        if urgent:
+            self.urgent.set()
+
+    def _take_file(self):
+        try:
+            if os.path.getsize(self.interrupt_file) == 0:
+                return
+        except OSError:
+            return      # no file (or another thread just claimed it)
+        # The watcher and drain() can both get here; a per-thread claim name means neither overwrites the other's
+        claimed = f"{self.interrupt_file}.reading-{os.getpid()}-{threading.get_ident()}"
+        try:
+            try:
+                os.replace(self.interrupt_file, claimed)
+            except FileNotFoundError:
+                return      # the other one claimed it first
+            with open(claimed, "r") as f:
+                self.put(f.read())
+            os.remove(claimed)
+        except Exception as e:
+            self.on_error(f"Failed to read/clear interruption file: {e}")
+
+    def _watch_file(self):
+        while not self.closed.wait(INBOX_POLL_INTERVAL):
+            self._take_file()
+
+    def _start_socket(self):
+        try:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(self.socket_path)
+            self.server.listen(8)
+        except Exception as e:
+            self.on_error(f"Inbox socket unavailable, using {self.interrupt_file} only: {e}")
+            self.server = None
+            return
+        threading.Thread(target=self._serve_socket, name="inbox-socket", daemon=True).start()
+
+    def _serve_socket(self):
+        while not self.closed.is_set():
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            with conn:
+                chunks = []
+                while True:
+                    data = conn.recv(65536)
+                    if not data:
+                        break
+                    chunks.append(data)
+            self.put(b"".join(chunks).decode("utf-8", errors="replace"))
+
+    # --- consumer ---
+    def drain(self):
+        """Returns and clears all pending messages (also picks up the file right now)."""
+        self._take_file()
+        with self.lock:
+            messages, self.pending = self.pending, []
+            self.urgent.clear()
+        return messages
+
+    def close(self):
+        self.closed.set()
+        if self.server:
+            self.server.close()
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+
+
+def send(workspace, text, urgent=False):
+    """Delivers a message to the agent in `workspace`, over the socket when it is up, else via the file."""
+    if urgent:
+        text = f"{URGENT_PREFIX} {text}"
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(os.path.join(workspace, SOCKET_NAME))
+            s.sendall(text.encode("utf-8"))
+        return True
+    except OSError:
+        with open(os.path.join(workspace, "INCOMING_MESSAGE.md"), "a") as f:
+            f.write(text + "\n")
+        return False
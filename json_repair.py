@@ -0,0 +1,135 @@
+"""
+Local repair for almost-JSON LLM output.
+
+Saves the "System Error: ... Please output VALID JSON" round-trip for the usual
+slips: markdown fences, prose around the object, trailing commas, comments,
+Python literals (True/False/None), single-quoted strings, bare keys and raw
+newlines inside strings.
+
+Output cut off inside a string, array or object is rejected, not closed: the
+tail of a truncated tool call (say, half a file for `write`) must never look
+like a finished one.
+"""
+import re
+import json
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _outer_object(text):
+    """The first balanced {...} in text, or everything from the first '{' if it never closes."""
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth, quote, escape = 0, None, False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if quote:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == quote:
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def _drop_trailing_comma(out):
+    """Removes a ',' (and the whitespace after it) from the end of the token list, e.g. before a closing bracket."""
+    k = len(out)
+    while k and out[k - 1].isspace():
+        k -= 1
+    if k and out[k - 1] == ",":
+        del out[k - 1:]
+
+
+def _normalize(text):
+    """Rewrites quotes, literals, comments, trailing commas and control characters token by token. Raises if text ends unclosed."""
+    out = []
+    stack = []
+    quote = None
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if ch == "\\" and i + 1 < len(text):
+                nxt = text[i + 1]
+                out.append("'" if nxt == "'" else ch + nxt)
+                i += 2
+                continue
+            if ch == quote:
+                out.append('"')
+                quote = None
+            elif ch == '"':
+                out.append('\\"')      # a double quote inside a single-quoted string
+            elif ch == "\n":
+                out.append("\\n")
+            elif ch == "\r":
+                out.append("\\r")
+            elif ch == "\t":
+                out.append("\\t")
+            else:
+                out.append(ch)
+            i += 1
+            continue
+        if ch in "\"'":
+            quote = ch
+            out.append('"')
+        elif ch == "/" and text[i:i + 2] == "//":
+            end = text.find("\n", i)
+            i = len(text) if end < 0 else end
+            continue
+        elif ch == "/" and text[i:i + 2] == "/*":
+            end = text.find("*/", i + 2)
+            i = len(text) if end < 0 else end + 2
+            continue
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            _drop_trailing_comma(out)
+            out.append(ch)
+        elif ch.isalpha():
+            word = re.match(r"[A-Za-z_][A-Za-z0-9_]*", text[i:]).group(0)
+            i += len(word)
+            if re.match(r"\s*:", text[i:]):
+                out.append(f'"{word}"')     # bare key
+            else:
+                out.append(_PY_LITERALS.get(word, word))
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    if quote or stack:
+        raise json.JSONDecodeError("Unterminated string" if quote else f"Expecting '{stack[-1]}'", text, len(text))
+    return "".join(out)
+
+
+def loads(raw):
+    """json.loads with repairs. Raises json.JSONDecodeError if the text still can't be read."""
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        error = e
+    fenced = _FENCE.search(raw)
+    text = _outer_object(fenced.group(1) if fenced else raw)
+    if text is None:
+        raise error
+    # The extracted object as is first: repairs only ever touch text outside strings
+    for candidate in (text, _normalize(text)):
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    raise error
@@ -0,0 +1,175 @@
+"""
+Line-offset index for ranged reads of large files.
+
+One pass over the file through mmap records the byte offset of every
+STRIDE-th line start. After that, any line range is a seek to the nearest
+checkpoint plus at most STRIDE-1 newline searches, whatever the file size,
+and head / tail / line counts come from the same index.
+
+Indexes are kept in memory and, for files over PERSIST_MIN_BYTES, saved to
+`cache_dir` so the next tool process (subprocess dispatch starts a fresh one
+per call) doesn't rescan. An index is only used while the file's mtime and
+size still match the ones it was built from.
+"""
+import os
+import mmap
+import struct
+import hashlib
+import tempfile
+from array import array
+from itertools import accumulate
+
+STRIDE = 64                         # lines between checkpoints
+CHUNK = 16 * 1024 * 1024            # bytes scanned per split() while building
+PERSIST_MIN_BYTES = 1024 * 1024     # smaller files are cheap to rescan
+MAX_READ_BYTES = 100000
+_HEADER = struct.Struct("<4sIqQQ")  # magic, stride, mtime_ns, size, lines
+_MAGIC = b"LIX1"
+_MEMO_SIZE = 32
+_memo = {}
+
+
+class LineIndex:
+    def __init__(self, mtime_ns, size, lines, checkpoints):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.lines = lines
+        self.checkpoints = checkpoints     # array('Q'): byte offset of line 0, STRIDE, 2*STRIDE, ...
+
+    def offset(self, mm, line):
+        """Byte offset where 0-based `line` starts (self.size past the last line)."""
+        if line >= self.lines:
+            return self.size
+        pos = self.checkpoints[line // STRIDE]
+        for _ in range(line % STRIDE):
+            pos = mm.find(b"\n", pos) + 1
+        return pos
+
+
+def _scan(mm, size):
+    checkpoints = array("Q", [0])
+    starts = 1      # line starts seen so far (line 0 starts at 0)
+    for base in range(0, size, CHUNK):
+        parts = mm[base:base + CHUNK].split(b"\n")
+        # Offsets right after each newline in this chunk
+        found = list(accumulate(map((1).__add__, map(len, parts[:-1])), initial=base))[1:]
+        checkpoints.extend(found[(-starts) % STRIDE::STRIDE])
+        starts += len(found)
+    # A trailing newline doesn't start another line
+    lines = starts - 1 if size and mm[size - 1:size] == b"\n" else starts if size else 0
+    return lines, checkpoints
+
+
+def _cache_path(path, cache_dir):
+    return os.path.join(cache_dir, hashlib.sha256(path.encode("utf-8")).hexdigest()[:32] + ".idx")
+
+def _load(path, cache_dir, st):
+    try:
+        with open(_cache_path(path, cache_dir), "rb") as f:
+            magic, stride, mtime_ns, size, lines = _HEADER.unpack(f.read(_HEADER.size))
+            if (magic, stride, mtime_ns, size) != (_MAGIC, STRIDE, st.st_mtime_ns, st.st_size):
+                return None
+            checkpoints = array("Q")
+            checkpoints.frombytes(f.read())
+        return LineIndex(mtime_ns, size, lines, checkpoints)
+    except (OSError, struct.error, ValueError):
+        return None
+
+def _save(path, cache_dir, index):
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, STRIDE, index.mtime_ns, index.size, index.lines))
+            f.write(index.checkpoints.tobytes())
+        os.replace(tmp, _cache_path(path, cache_dir))
+    except OSError:
+        pass    # the index is only an optimisation
+
+def get_index(path, mm=None, cache_dir=None):
+    """The LineIndex of `path`, from memory, from cache_dir, or built with one scan of `mm`."""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    index = _memo.get(path)
+    if index and (index.mtime_ns, index.size) == (st.st_mtime_ns, st.st_size):
+        return index
+    index = _load(path, cache_dir, st) if cache_dir else None
+    if index is None:
+        if mm is None:
+            with map_file(path) as mm:
+                return get_index(path, mm, cache_dir)
+        lines, checkpoints = _scan(mm, st.st_size)
+        index = LineIndex(st.st_mtime_ns, st.st_size, lines, checkpoints)
+        if cache_dir and st.st_size >= PERSIST_MIN_BYTES:
+            _save(path, cache_dir, index)
+    if len(_memo) >= _MEMO_SIZE:
+        _memo.pop(next(iter(_memo)))
+    _memo[path] = index
+    return index
+
+
+class _Empty(bytes):
+    """Stands in for the mmap of an empty file (mmap can't map 0 bytes)."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+def map_file(path):
+    """Read-only mmap of the file (bytes-like), usable as a context manager."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return _Empty()
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _decode(data):
+    return data.decode("utf-8", errors="replace")
+
+
+def read_lines(path, start, end=None, cache_dir=None, max_bytes=MAX_READ_BYTES):
+    """Lines start..end (1-based, inclusive; end=None reads to EOF), capped at max_bytes."""
+    with map_file(path) as mm:
+        index = get_index(path, mm, cache_dir)
+        if index.lines == 0:
+            return "[empty file]"
+        start = max(1, start)
+        if start > index.lines:
+            return f"Error: Line {start} is past the end of the file ({index.lines} lines)."
+        end = index.lines if end is None else min(end, index.lines)
+        if end < start:
+            return f"Error: Empty line range {start}-{end}."
+        begin = index.offset(mm, start - 1)
+        stop = index.offset(mm, end)
+        note = ""
+        if stop - begin > max_bytes:
+            cut = mm.rfind(b"\n", begin, begin + max_bytes) + 1
+            if cut > begin:
+                stop = cut
+                end = start + mm[begin:stop].count(b"\n") - 1
+                note = f" (cut at {max_bytes} bytes; continue from line {end + 1})"
+            else:
+                stop = begin + max_bytes
+                end = start
+                note = f" (line {start} is longer than {max_bytes} bytes; read the rest with bytes {stop})"
+        return f"[lines {start}-{end} of {index.lines}{note}]\n" + _decode(mm[begin:stop])
+
+def head(path, n=50, cache_dir=None, max_bytes=MAX_READ_BYTES):
+    return read_lines(path, 1, n, cache_dir, max_bytes)
+
+def tail(path, n=50, cache_dir=None, max_bytes=MAX_READ_BYTES):
+    lines = get_index(path, cache_dir=cache_dir).lines
+    return read_lines(path, max(1, lines - n + 1), lines, cache_dir, max_bytes)
+
+def read_bytes(path, offset=0, length=MAX_READ_BYTES, max_bytes=MAX_READ_BYTES):
+    with map_file(path) as mm:
+        size = len(mm)
+        offset = min(max(0, offset), size)
+        data = mm[offset:offset + max(0, min(length, max_bytes))]
+    return f"[bytes {offset}-{offset + len(data)} of {size}]\n" + _decode(data)
+
+def summary(path, cache_dir=None):
+    """wc-style line and byte counts."""
+    index = get_index(path, cache_dir=cache_dir)
+    average = index.size / index.lines if index.lines else 0
+    return f"{index.lines} lines, {index.size} bytes, {average:.0f} bytes/line on average"
@@ -0,0 +1,117 @@
+"""
+In-process metrics registry with an OpenMetrics export.
+
+Counters and histograms keyed by name + labels. render() produces the
+OpenMetrics text format, which Prometheus can scrape from serve()'s endpoint
+or pick up from the file write_textfile() keeps up to date (node_exporter
+textfile collector style).
+"""
+import os
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels, extra=None):
+    items = list(labels) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    def __init__(self, help_texts=None):
+        self.help = dict(help_texts or {})
+        self.lock = threading.Lock()
+        self.counters = {}      # name -> {labels: value}
+        self.histograms = {}    # name -> {labels: _Histogram}
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = _Histogram(buckets)
+            series[key].observe(value)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name in sorted(self.counters):
+                lines.append(f"# TYPE {name} counter")
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                for key, value in sorted(self.counters[name].items()):
+                    lines.append(f"{name}_total{_labels(key)} {_number(value)}")
+            for name in sorted(self.histograms):
+                lines.append(f"# TYPE {name} histogram")
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                for key, hist in sorted(self.histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(key, {'le': _number(float(bound))})} {cumulative}")
+                    lines.append(f"{name}_bucket{_labels(key, {'le': '+Inf'})} {hist.count}")
+                    lines.append(f"{name}_count{_labels(key)} {hist.count}")
+                    lines.append(f"{name}_sum{_labels(key)} {_number(hist.sum)}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        tmp = os.path.join(directory, f".tmp-{os.path.basename(path)}-{os.getpid()}-{threading.get_ident()}")
+        # open() leaves the mode to the umask; mkstemp's 0600 would hide the file from a collector running as another user
+        with open(tmp, "w") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serves /metrics on a daemon thread. Returns the server."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
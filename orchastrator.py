@@ -9,6 +9,7 @@ import docker.errors
 import tempfile
 
 import time
+import inbox
 from rich.live import Live
 from rich.layout import Layout
 from rich.panel import Panel
@@ -16,7 +17,6 @@ from rich.panel import Panel
 def orchestrate_ui(folder_path):
     # Paths to the specific agent files
     progress_file = os.path.join(folder_path, "TASK_PROGRESS.md")
-    incoming_file = os.path.join(folder_path, "INCOMING_MESSAGE.md")
     
     layout = Layout()
     layout.split_column(
@@ -32,10 +32,10 @@ def orchestrate_ui(folder_path):
                     layout["upper"].update(Panel(f.read()[-1000:], title="Agent Progress"))
             
             # 2. Handle User Input (Blinking Cursor simulation)
+            # Prefix with "URGENT:" to cancel whatever the agent is doing right now
             msg = input("Inject Message > ") # Standard CLI prompt [4]
             if msg:
-                with open(incoming_file, "w") as f:
-                    f.write(msg)
+                inbox.send(folder_path, msg)
                 print(f"Sent to agent: {msg}")
 
 def image_exists(client, image_name):
@@ -49,7 +49,9 @@ def setup_and_launch(
     task_text: str,
     kb_folder: str = None,
     system_prompt_file: str = None,
-    image_name: str = "agent-python:3.9"  # Changed default to custom permanent tag
+    image_name: str = "agent-python:3.9",  # Changed default to custom permanent tag
+    http_cache_dir: str = "http_cache",  # Shared by every agent launched from here; None to disable
+    profile: str = None  # AGENT_PROFILE inside the container, e.g. "cprofile,tracemalloc"
 ):
     client = docker.from_env()
 
@@ -80,7 +82,7 @@ RUN pip install --no-cache-dir docker openai rich requests
     host_path.mkdir(parents=True, exist_ok=True)
 
     # 3-5. (Unchanged: copy files, KB, task.md, system prompt)
-    required_files = ["wrapper.py", "use_tools.py"]
+    required_files = ["wrapper.py", "use_tools.py", "tool_pool.py", "event_log.py", "inbox.py", "cassette.py", "resilient_llm.py", "tool_scheduler.py", "tool_cache.py", "http_cache.py", "json_repair.py", "blob_store.py", "metrics.py", "profiling.py", "line_index.py", "version_store.py", "diff_patch.py", "tree_walk.py"]
     print(f"[*] Initializing workspace at: {host_path}")
     for file_name in required_files:
         if Path(file_name).exists():
@@ -104,6 +106,13 @@ RUN pip install --no-cache-dir docker openai rich requests
         shutil.copy(system_prompt_file, host_path / "custom_system_prompt.txt")
         print(f"[+] Custom system prompt injected.")
 
+    volumes = {str(host_path): {"bind": "/agent_workspace", "mode": "rw"}}
+    if http_cache_dir:
+        cache_path = Path(http_cache_dir).resolve()
+        cache_path.mkdir(parents=True, exist_ok=True)
+        volumes[str(cache_path)] = {"bind": "/http_cache", "mode": "rw"}
+        print(f"[+] Shared HTTP cache mounted from {cache_path}")
+
     print(f"[+] Workspace ready. Launching container...")
 
     # 6. Launch (no pip now)
@@ -111,7 +120,12 @@ RUN pip install --no-cache-dir docker openai rich requests
         image=image_name,
         name=folder_name,
         command=["python3", "/agent_workspace/wrapper.py"],  # Deps pre-installed
-        volumes={str(host_path): {"bind": "/agent_workspace", "mode": "rw"}},
+        volumes=volumes,
+        environment={
+            "AGENT_ID": folder_name,
+            **({"AGENT_HTTP_CACHE": "/http_cache"} if http_cache_dir else {}),
+            **({"AGENT_PROFILE": profile} if profile else {}),
+        },
         working_dir="/agent_workspace",
         network="ai",
         detach=True,
@@ -127,6 +141,8 @@ if __name__ == "__main__":
     parser.add_argument("--task", type=str, help="The task string", required=True)
     parser.add_argument("--kb", type=str, help="Path to local Knowledge Base folder", default=None)
     parser.add_argument("--system", type=str, help="Path to custom system prompt file", default=None)
+    parser.add_argument("--http-cache", type=str, help="Host folder for the web cache shared by all agents ('' to disable)", default="http_cache")
+    parser.add_argument("--profile", type=str, help="Profilers to run in the agent, e.g. 'cprofile,tracemalloc,sampler' (see profiling.py)", default=None)
     
     args = parser.parse_args()
 
@@ -136,7 +152,9 @@ if __name__ == "__main__":
     folder_name = setup_and_launch(
         task_text=args.task,
         kb_folder=args.kb,
-        system_prompt_file=args.system
+        system_prompt_file=args.system,
+        http_cache_dir=args.http_cache or None,
+        profile=args.profile
     )
 
     if folder_name:
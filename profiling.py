@@ -0,0 +1,203 @@
+"""
+Opt-in profiling for long agent sessions.
+
+Turned on with AGENT_PROFILE, a comma-separated list of:
+  cprofile     cProfile of the agent loop thread (LLM parsing, context trimming,
+               tool submission) merged with one cProfile per tool call on the
+               pool threads (see wrap()); dumped as .prof plus a pstats top-N summary
+  tracemalloc  memory snapshot per dump, with the top allocation growth since the
+               previous one
+  sampler      wall-clock stack sampler over the tool pool threads ("tool-*"),
+               written as collapsed stacks (flamegraph.pl / speedscope input)
+
+Everything is dumped to raw_activity/profiles/ every AGENT_PROFILE_EVERY steps
+(default 10) and once more when the session ends. AGENT_PROFILE_SAMPLE_MS sets
+the sampler interval (default 10).
+
+What runs in this process is what gets profiled. With TOOL_DISPATCH_MODE
+"pool" or "subprocess" the tools themselves run in other processes, so the
+pool threads show up waiting on them (tool_pool._read_exact, subprocess.run);
+use "inprocess" to profile the tool code. The asyncio loop (run_agent_async)
+runs everything on the loop thread, which is profiled and sampled instead of
+"tool-*", and its tools are always subprocesses.
+
+From Python 3.12 cProfile runs on sys.monitoring: only one profile can be
+enabled per process, and it sees every thread. The loop thread's profile then
+covers the pool threads by itself and wrap() adds nothing. If some other
+profiler already holds the slot, profiling is skipped rather than failing
+the session.
+"""
+import os
+import sys
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+
+MODES = ("cprofile", "tracemalloc", "sampler")
+TOP_N = 40
+# The profilers' own allocations would otherwise top every tracemalloc diff
+_OWN_FILES = [tracemalloc.Filter(False, f) for f in (__file__, tracemalloc.__file__, cProfile.__file__, pstats.__file__)]
+PROCESS_WIDE_PROFILE = sys.version_info >= (3, 12)
+
+
+def _start_profile():
+    """An enabled cProfile.Profile, or None if another profiler is already active (3.12+ allows one)."""
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        return None
+    return profile
+
+
+class StackSampler:
+    """Samples the stacks of threads whose names start with `prefixes` every `interval` seconds."""
+    def __init__(self, interval=0.01, prefixes=("tool-",)):
+        self.interval = interval
+        self.prefixes = prefixes
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            with self.lock:
+                for ident, frame in sys._current_frames().items():
+                    name = names.get(ident, "")
+                    if not name.startswith(self.prefixes):
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    # Pool threads are numbered (tool-file_3); fold them by pool
+                    stack.append(name.rsplit("_", 1)[0])
+                    self.counts[";".join(reversed(stack))] += 1
+
+    def drain(self):
+        """Collapsed stack counts since the last drain."""
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+        return counts
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join(timeout=1)
+
+
+class Profiler:
+    def __init__(self, directory, modes, every=10, sample_interval=0.01, threads=("tool-",)):
+        self.directory = directory
+        self.modes = set(modes)
+        self.every = max(1, every)
+        self.steps = 0
+        self.profile = None
+        self.call_profiles = []     # finished per-call profiles from wrap(), merged at the next dump
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.sampler = None
+        os.makedirs(directory, exist_ok=True)
+        if "cprofile" in self.modes:
+            self.profile = _start_profile()
+            if self.profile is None:
+                sys.stderr.write("profiling: another profiler is active, cprofile mode is off\n")
+        self.owns_tracemalloc = False
+        if "tracemalloc" in self.modes:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+                self.owns_tracemalloc = True
+            self.snapshot = tracemalloc.take_snapshot().filter_traces(_OWN_FILES)
+        if "sampler" in self.modes:
+            self.sampler = StackSampler(sample_interval, threads)
+            self.sampler.start()
+
+    @classmethod
+    def from_env(cls, directory, threads=("tool-",)):
+        """A running Profiler if AGENT_PROFILE asks for one, else None. `threads`: name prefixes the sampler watches."""
+        modes = [m.strip() for m in os.environ.get("AGENT_PROFILE", "").lower().split(",") if m.strip()]
+        if "all" in modes:
+            modes = MODES
+        modes = [m for m in modes if m in MODES]
+        if not modes:
+            return None
+        every = int(os.environ.get("AGENT_PROFILE_EVERY", "10"))
+        sample_ms = float(os.environ.get("AGENT_PROFILE_SAMPLE_MS", "10"))
+        return cls(directory, modes, every, sample_ms / 1000, threads)
+
+    def step(self):
+        """Call once per finished step (of any session sharing this profiler); dumps every `every` steps."""
+        with self.lock:
+            self.steps += 1
+            steps = self.steps
+        if steps % self.every == 0:
+            self.dump(f"step{steps:04d}")
+
+    def wrap(self, fn):
+        """
+        fn, with each call profiled on the thread that runs it: before 3.12 a cProfile.Profile
+        only sees the thread that enabled it, so the loop thread's profile misses the pool threads.
+        """
+        if not self.profile or PROCESS_WIDE_PROFILE:
+            return fn
+
+        def profiled(*args):
+            profile = _start_profile()
+            if profile is None:
+                return fn(*args)
+            try:
+                return fn(*args)
+            finally:
+                profile.disable()
+                profile.create_stats()
+                with self.lock:
+                    self.call_profiles.append(profile)
+        return profiled
+
+    def dump(self, label, restart=True):
+        if self.profile:
+            self.profile.disable()
+            with self.lock:
+                calls, self.call_profiles = self.call_profiles, []
+            path = os.path.join(self.directory, f"cprofile_{label}")
+            with open(path + ".txt", "w") as f:
+                stats = pstats.Stats(self.profile, *calls, stream=f)
+                stats.dump_stats(path + ".prof")
+                if PROCESS_WIDE_PROFILE:
+                    f.write("All threads (one process-wide profile)\n")
+                else:
+                    f.write(f"Loop thread plus {len(calls)} tool call(s) on the pool threads\n")
+                stats.sort_stats("cumulative").print_stats(TOP_N)
+                stats.sort_stats("tottime").print_stats(TOP_N)
+        if self.snapshot:
+            snapshot = tracemalloc.take_snapshot().filter_traces(_OWN_FILES)
+            current, peak = tracemalloc.get_traced_memory()
+            with open(os.path.join(self.directory, f"tracemalloc_{label}.txt"), "w") as f:
+                f.write(f"traced: current={current} bytes peak={peak} bytes\n\n")
+                f.write(f"Top {TOP_N} allocation growth since the previous dump:\n")
+                for diff in snapshot.compare_to(self.snapshot, "lineno")[:TOP_N]:
+                    f.write(f"{diff}\n")
+            self.snapshot = snapshot
+        if self.sampler:
+            counts = self.sampler.drain()
+            with open(os.path.join(self.directory, f"sampler_{label}.txt"), "w") as f:
+                for stack, count in counts.most_common():
+                    f.write(f"{stack} {count}\n")
+        if self.profile and restart:
+            # A fresh profile per dump, so each file covers only its own steps
+            self.profile = _start_profile()
+
+    def stop(self):
+        """Final dump, then switches everything off."""
+        self.dump("final", restart=False)
+        if self.owns_tracemalloc:
+            tracemalloc.stop()
+        if self.sampler:
+            self.sampler.stop()
@@ -0,0 +1,238 @@
+"""
+Retry / circuit-breaker / failover layer in front of chat.completions.create.
+
+ResilientClient looks like an OpenAI client to the wrapper, but each create():
+  * retries rate limits, 5xx, timeouts and connection errors with jittered
+    exponential backoff, sleeping for the server's Retry-After when it sends one,
+  * keeps a circuit breaker per endpoint: after `breaker_threshold` failures
+    in a row the endpoint is skipped for `breaker_cooldown` seconds, then one
+    trial call decides whether it closes again (other callers fail over or
+    wait meanwhile),
+  * fails over to the next endpoint (e.g. a secondary BASE_URL/MODEL_NAME)
+    right after a retryable failure, and skips open endpoints entirely,
+  * never runs past `deadline` seconds in total; the remaining budget is also
+    passed down as the request timeout.
+Errors that won't go away on retry (400, 401, 404...) are raised immediately.
+"""
+import time
+import random
+import asyncio
+import threading
+import email.utils
+from types import SimpleNamespace
+
+import openai
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 520, 522, 524, 529}
+HALF_OPEN_POLL = 0.25   # seconds between checks while another caller's trial call is in flight
+
+
+class AllEndpointsDown(Exception):
+    pass
+
+
+class Endpoint:
+    """One provider endpoint: a client, the model to request on it, and its breaker state."""
+    def __init__(self, name, client, model=None, breaker_threshold=5, breaker_cooldown=60):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False      # half-open: one caller's trial call is in flight
+        self.lock = threading.Lock()
+
+    def _usable(self, now):
+        if self.opened_at is None:
+            return True
+        return now - self.opened_at >= self.breaker_cooldown and not self.trial
+
+    def available(self, now):
+        with self.lock:
+            return self._usable(now)
+
+    def claim(self, now):
+        """available(), except that once half-open only the first caller gets through, until its trial call resolves."""
+        with self.lock:
+            if not self._usable(now):
+                return False
+            if self.opened_at is not None:
+                self.trial = True
+            return True
+
+    def release(self):
+        """Ends a trial call that neither succeeded nor failed retryably; the next caller gets to try."""
+        with self.lock:
+            self.trial = False
+
+    def reopens_in(self, now):
+        with self.lock:
+            if self.opened_at is None:
+                return 0
+            if self.trial:
+                return HALF_OPEN_POLL
+            return max(0.0, self.breaker_cooldown - (now - self.opened_at))
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self, now):
+        """Returns True if this failure opened the breaker."""
+        with self.lock:
+            self.failures += 1
+            self.trial = False
+            half_open = self.opened_at is not None
+            if half_open or self.failures >= self.breaker_threshold:
+                self.opened_at = now
+                return True
+            return False
+
+
+def is_retryable(error):
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS
+    return False
+
+def retry_after(error):
+    """Seconds the server asked us to wait, if it said."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+class _Policy:
+    def __init__(self, endpoints, max_retries, backoff_base, backoff_max, deadline, on_event):
+        self.endpoints = endpoints
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self.on_event = on_event or (lambda msg: None)
+
+    def pick(self, now, avoid=None, claim=True):
+        """
+        First endpoint whose breaker lets a call through, preferring one other than
+        `avoid` (the one that just failed). (None, seconds until one reopens) if all are open.
+        With claim=False it only looks: no half-open trial slot is taken.
+        """
+        ordered = [e for e in self.endpoints if e is not avoid] + [e for e in self.endpoints if e is avoid]
+        for endpoint in ordered:
+            if endpoint.claim(now) if claim else endpoint.available(now):
+                return endpoint, 0
+        return None, min(e.reopens_in(now) for e in self.endpoints)
+
+    def backoff(self, attempt, error):
+        hinted = retry_after(error)
+        if hinted is not None:
+            return min(hinted, self.backoff_max)
+        # Full jitter: anywhere between 0 and the exponential cap
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, endpoint, kwargs, remaining):
+        kwargs = dict(kwargs)
+        if endpoint.model:
+            kwargs["model"] = endpoint.model
+        kwargs["timeout"] = remaining
+        return kwargs
+
+    def failed(self, endpoint, error, attempt, started):
+        """Records a failure and returns how long to sleep before the next try. Raises when giving up."""
+        now = time.monotonic()
+        if not is_retryable(error):
+            endpoint.release()
+            raise error
+        if endpoint.record_failure(now):
+            self.on_event(f"Circuit opened for {endpoint.name} after {endpoint.failures} failures")
+        remaining = self.deadline - (now - started)
+        if attempt >= self.max_retries or remaining <= 0:
+            raise error
+        wait = self.backoff(attempt, error)
+        nxt, reopen = self.pick(now, avoid=endpoint, claim=False)
+        if nxt is not None and nxt is not endpoint:
+            wait = 0    # a healthy alternative is ready, fail over right away
+        elif nxt is None:
+            wait = max(wait, reopen)
+        if wait >= remaining:
+            raise error
+        self.on_event(f"{endpoint.name} failed ({type(error).__name__}: {error}); retry {attempt + 1}/{self.max_retries} in {wait:.1f}s")
+        return wait
+
+    def no_endpoint(self, started, reopen):
+        remaining = self.deadline - (time.monotonic() - started)
+        if reopen >= remaining:
+            raise AllEndpointsDown("All LLM endpoints are circuit-broken.")
+        return reopen
+
+
+class ResilientClient:
+    def __init__(self, endpoints, max_retries=6, backoff_base=1.0, backoff_max=30.0, deadline=300.0, on_event=None):
+        self.policy = _Policy(endpoints, max_retries, backoff_base, backoff_max, deadline, on_event)
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        policy = self.policy
+        started = time.monotonic()
+        attempt = 0
+        failed = None
+        while True:
+            endpoint, reopen = policy.pick(time.monotonic(), avoid=failed)
+            if endpoint is None:
+                time.sleep(policy.no_endpoint(started, reopen))
+                continue
+            remaining = policy.deadline - (time.monotonic() - started)
+            try:
+                resp = endpoint.client.chat.completions.create(**policy.request(endpoint, kwargs, remaining))
+            except Exception as e:
+                time.sleep(policy.failed(endpoint, e, attempt, started))
+                failed = endpoint
+                attempt += 1
+                continue
+            except BaseException:
+                endpoint.release()      # cancelled / interrupted: don't hold a trial slot
+                raise
+            endpoint.record_success()
+            return resp
+
+
+class AsyncResilientClient(ResilientClient):
+    async def create(self, **kwargs):
+        policy = self.policy
+        started = time.monotonic()
+        attempt = 0
+        failed = None
+        while True:
+            endpoint, reopen = policy.pick(time.monotonic(), avoid=failed)
+            if endpoint is None:
+                await asyncio.sleep(policy.no_endpoint(started, reopen))
+                continue
+            remaining = policy.deadline - (time.monotonic() - started)
+            try:
+                resp = await endpoint.client.chat.completions.create(**policy.request(endpoint, kwargs, remaining))
+            except Exception as e:
+                await asyncio.sleep(policy.failed(endpoint, e, attempt, started))
+                failed = endpoint
+                attempt += 1
+                continue
+            except BaseException:
+                endpoint.release()      # cancelled / interrupted: don't hold a trial slot
+                raise
+            endpoint.record_success()
+            return resp
@@ -0,0 +1,27 @@
+import blob_store
+from use_tools import AgentFileToolbox
+
+
+def test_small_outputs_pass_through(tmp_path):
+    assert blob_store.spill("short", 100, str(tmp_path)) == "short"
+    assert not list(tmp_path.iterdir())
+
+
+def test_large_output_is_stored_once_and_previewed(tmp_path):
+    text = "".join(f"line {i}\n" for i in range(5000))
+    out = blob_store.spill(text, 1000, str(tmp_path), head_chars=20, tail_chars=10)
+    blob_id = out.split("Stored as blob ")[1][:16]
+    assert f"{len(text)} bytes, 5000 lines" in out
+    assert out.endswith("--- head ---\nline 0\nline 1\nline 2\n--- tail ---\nline 4999\n")
+    assert blob_store.spill(text, 1000, str(tmp_path)).count(blob_id) == 2
+    assert [p.name for p in tmp_path.iterdir()] == [f"{blob_id}.txt"]
+
+
+def test_read_range_and_bad_ids(tmp_path):
+    blob_id = blob_store.put("héllo world" * 3000, str(tmp_path))
+    assert blob_store.read_range(blob_id, 0, 5, str(tmp_path)).endswith("]\nhéll")
+    header = blob_store.read_range(blob_id, 10, 10 ** 9, str(tmp_path)).split("\n", 1)[0]
+    assert header == f"[blob {blob_id} bytes 10-{10 + blob_store.MAX_READ_BYTES} of {12 * 3000}]"
+    assert blob_store.read_range("0" * 16, 0, 10, str(tmp_path)) == f"Error: Blob {'0' * 16} not found."
+    ft = AgentFileToolbox(str(tmp_path))
+    assert ft.read_blob("../../etc/passwd") == "Error: Invalid blob id: '../../etc/passwd'"
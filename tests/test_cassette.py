@@ -0,0 +1,69 @@
+import asyncio
+from types import SimpleNamespace
+
+from cassette import CassetteClient
+from wrapper import NativeStreamParser
+
+NATIVE_REQUEST = {"model": "m", "messages": [{"role": "user", "content": "go"}], "tools": [], "stream": True}
+
+
+def _chunk(content=None, tool_calls=None, finish=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=finish)], usage=None)
+
+def _tc(index, id=None, name=None, arguments=None):
+    return SimpleNamespace(index=index, id=id, type="function" if id else None,
+                           function=SimpleNamespace(name=name, arguments=arguments))
+
+def _native_stream():
+    # How providers stream two tool calls: header first, then argument fragments
+    yield _chunk(content="Reading both.")
+    yield _chunk(tool_calls=[_tc(0, "call_a", "read", "")])
+    yield _chunk(tool_calls=[_tc(0, arguments='{"path": ')])
+    yield _chunk(tool_calls=[_tc(0, arguments='"a.py"}')])
+    yield _chunk(tool_calls=[_tc(1, "call_b", "list", '{"path": "src"}')])
+    yield _chunk(finish="tool_calls")
+
+
+class _Real:
+    def __init__(self, stream):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: stream()))
+
+
+def _parse(chunks):
+    parser = NativeStreamParser()
+    for chunk in chunks:
+        for choice in chunk.choices:
+            parser.feed_delta(choice.delta)
+    return parser.result()
+
+
+def test_native_stream_round_trip(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    recorder = CassetteClient(path, "record", real=_Real(_native_stream))
+    recorded = _parse(recorder.chat.completions.create(**NATIVE_REQUEST))
+
+    replayer = CassetteClient(path, "replay")
+    replayed = _parse(replayer.chat.completions.create(**NATIVE_REQUEST))
+    assert replayed == recorded
+    assert [c["name"] for c in replayed["tool_calls"]] == ["read", "list"]
+    assert replayed["thought"] == "Reading both."
+
+
+def test_native_stream_replays_as_full_message(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    list(CassetteClient(path, "record", real=_Real(_native_stream)).chat.completions.create(**NATIVE_REQUEST))
+    message = CassetteClient(path, "replay").chat.completions.create(**dict(NATIVE_REQUEST, stream=False)).choices[0].message
+    assert [(tc.id, tc.function.name, tc.function.arguments) for tc in message.tool_calls] == [
+        ("call_a", "read", '{"path": "a.py"}'), ("call_b", "list", '{"path": "src"}')]
+
+
+def test_async_replay_streams_tool_calls(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    list(CassetteClient(path, "record", real=_Real(_native_stream)).chat.completions.create(**NATIVE_REQUEST))
+
+    async def replay():
+        stream = await CassetteClient(path, "replay", is_async=True).chat.completions.create(**NATIVE_REQUEST)
+        return [chunk async for chunk in stream]
+
+    assert [c["name"] for c in _parse(asyncio.run(replay()))["tool_calls"]] == ["read", "list"]
@@ -0,0 +1,55 @@
+import wrapper
+from wrapper import ContextWindow
+
+
+def _window(monkeypatch, messages, budget):
+    ctx = ContextWindow(messages)
+    monkeypatch.setattr(ctx, "budget", budget)
+    return ctx
+
+
+def _tool_turn(i):
+    return [{"role": "assistant", "content": None,
+             "tool_calls": [{"id": f"c{i}", "type": "function", "function": {"name": "read", "arguments": "{}"}}]},
+            {"role": "tool", "tool_call_id": f"c{i}", "content": "x" * 400}]
+
+
+def test_summary_never_separates_tool_results_from_their_call(monkeypatch):
+    monkeypatch.setattr(wrapper, "KEEP_RECENT_MESSAGES", 3)
+    messages = [{"role": "system", "content": "s"}, {"role": "user", "content": "Begin task."}]
+    for i in range(4):
+        messages += _tool_turn(i)
+    ctx = _window(monkeypatch, messages, 100)
+    middle = ctx.compactable()
+    kept = ctx.apply_summary("done so far")[3:]
+    assert middle + kept == messages[2:]
+    assert kept[0]["role"] == "assistant" and kept[1]["tool_call_id"] == kept[0]["tool_calls"][0]["id"]
+
+
+def test_tool_calls_count_towards_the_budget():
+    call = _tool_turn(0)[0]
+    call["tool_calls"][0]["function"]["arguments"] = "y" * 4000
+    assert wrapper.count_tokens(call) > 1000
+
+
+def test_oversized_recent_observations_are_trimmed_when_there_is_nothing_to_summarize(monkeypatch):
+    monkeypatch.setattr(wrapper, "log_event", lambda *a: None)
+    messages = [{"role": "system", "content": "s"}, {"role": "user", "content": "Begin task."},
+                {"role": "assistant", "content": '{"thought": "read it"}'},
+                {"role": "user", "content": "Tool read Result: " + "a" * 40000},
+                {"role": "user", "content": "<INCOMING_MESSAGE_INTERRUPTION : " + "b" * 8000 + " >"}]
+    ctx = _window(monkeypatch, messages, 5000)
+    assert ctx.compactable() == []
+    out = wrapper.compact_context(ctx, client=None)
+    assert ctx.total <= ctx.budget
+    assert ctx.total == sum(wrapper.count_tokens(m) for m in out)
+    assert out[3]["content"].startswith("Tool read Result: aaa") and "trimmed to fit the context window" in out[3]["content"]
+    assert out[4] == messages[4]
+
+
+def test_trimmed_tool_messages_keep_their_call_id(monkeypatch):
+    messages = [{"role": "system", "content": "s"}, {"role": "user", "content": "Begin task."}] + _tool_turn(0)
+    messages[3]["content"] = "x" * 40000
+    ctx = _window(monkeypatch, messages, 2000)
+    assert ctx.trim_observations() == 1
+    assert ctx.messages[3]["tool_call_id"] == "c0" and len(ctx.messages[3]["content"]) < 3000
@@ -0,0 +1,85 @@
+import os
+import stat
+
+import pytest
+
+import diff_patch
+from use_tools import AgentFileToolbox
+
+ORIGINAL = "".join(f"line {i}\n" for i in range(1, 21))
+
+
+def _apply(content, diff):
+    (patch,) = diff_patch.parse(diff)
+    return diff_patch.apply(content, patch.hunks)
+
+
+def test_exact_hunk():
+    new, statuses = _apply(ORIGINAL, "--- a/f\n+++ b/f\n@@ -4,3 +4,3 @@\n line 4\n-line 5\n+LINE 5\n line 6\n")
+    assert new == ORIGINAL.replace("line 5\n", "LINE 5\n")
+    assert statuses == ["hunk 1 OK"]
+
+
+def test_wrong_line_numbers_are_found_nearby():
+    new, statuses = _apply(ORIGINAL, "--- a/f\n+++ b/f\n@@ -1,3 +1,3 @@\n line 14\n-line 15\n+LINE 15\n line 16\n")
+    assert new == ORIGINAL.replace("line 15\n", "LINE 15\n")
+    assert "offset +13 lines" in statuses[0]
+
+
+def test_whitespace_and_fuzz():
+    content = ORIGINAL.replace("line 6\n", "line 6   \n")
+    diff = "--- a/f\n+++ b/f\n@@ -3,5 +3,5 @@\n line 3\n line X\n-line 5\n+LINE 5\n line 6\n line 7\n"
+    new, statuses = _apply(content, diff)
+    assert "LINE 5\nline 6   \n" in new     # context keeps the file's own text
+    assert "fuzz" in statuses[0]
+
+
+def test_crlf_file_keeps_its_line_endings():
+    crlf = ORIGINAL.replace("\n", "\r\n")
+    new, _ = _apply(crlf, "--- a/f\n+++ b/f\n@@ -2,1 +2,2 @@\n line 2\n+inserted\n")
+    assert "line 2\r\ninserted\r\nline 3\r\n" in new
+
+
+def test_failing_hunk_raises():
+    with pytest.raises(diff_patch.PatchError, match="hunk 1"):
+        _apply(ORIGINAL, "--- a/f\n+++ b/f\n@@ -4,2 +4,2 @@\n nothing like this\n-here\n+there\n")
+
+
+def test_patch_is_all_or_nothing(tmp_path):
+    ft = AgentFileToolbox(str(tmp_path))
+    (tmp_path / "a.txt").write_text(ORIGINAL)
+    (tmp_path / "b.txt").write_text(ORIGINAL)
+    diff = ("--- a/a.txt\n+++ b/a.txt\n@@ -1,1 +1,1 @@\n-line 1\n+LINE 1\n"
+            "--- a/b.txt\n+++ b/b.txt\n@@ -1,1 +1,1 @@\n-no such line\n+x\n")
+    assert ft.patch(diff).startswith("Error")
+    assert (tmp_path / "a.txt").read_text() == ORIGINAL
+
+
+def test_new_files_get_umask_permissions(tmp_path):
+    ft = AgentFileToolbox(str(tmp_path))
+    ft.patch("--- /dev/null\n+++ b/new.txt\n@@ -0,0 +1,2 @@\n+hello\n+world\n")
+    (tmp_path / "plain.txt").write_text("")
+    assert (tmp_path / "new.txt").read_text() == "hello\nworld\n"
+    # Same as a file created with open(), not mkstemp's 0600
+    assert stat.S_IMODE((tmp_path / "new.txt").stat().st_mode) == stat.S_IMODE((tmp_path / "plain.txt").stat().st_mode)
+
+
+def test_new_files_follow_the_current_umask(tmp_path):
+    ft = AgentFileToolbox(str(tmp_path))
+    old_umask = os.umask(0o027)
+    try:
+        ft.write("new.txt", "x")
+    finally:
+        os.umask(old_umask)
+    assert stat.S_IMODE((tmp_path / "new.txt").stat().st_mode) == 0o640
+    assert [p.name for p in tmp_path.iterdir() if ".tmp-" in p.name] == []
+
+
+def test_existing_file_keeps_its_mode(tmp_path):
+    ft = AgentFileToolbox(str(tmp_path))
+    script = tmp_path / "run.sh"
+    script.write_text("echo a\n")
+    script.chmod(0o755)
+    ft.patch("--- a/run.sh\n+++ b/run.sh\n@@ -1 +1 @@\n-echo a\n+echo b\n")
+    assert script.read_text() == "echo b\n"
+    assert stat.S_IMODE(script.stat().st_mode) == 0o755
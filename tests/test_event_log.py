@@ -0,0 +1,68 @@
+import os
+
+from event_log import EventLog, BackgroundLogWriter, iter_events, rebuild_prompt
+
+
+def _conversation(log, calls):
+    """Logs `calls` LLM calls on one growing history; returns the prompt sent on each."""
+    messages = [{"role": "system", "content": "sys"}]
+    sent = []
+    for i in range(calls):
+        messages.append({"role": "user", "content": f"turn {i} " + "x" * 50})
+        log.log_messages(messages)
+        sent.append(list(messages))
+        messages.append({"role": "assistant", "content": f"reply {i}"})
+    return sent
+
+
+def test_prompts_are_deltas_between_checkpoints(tmp_path):
+    log = EventLog(str(tmp_path), checkpoint_every=5)
+    sent = _conversation(log, 12)
+    log.close()
+    kinds = [r["type"] for r in iter_events(str(tmp_path))]
+    assert kinds == ["checkpoint"] + ["delta"] * 4 + ["checkpoint"] + ["delta"] * 4 + ["checkpoint", "delta"]
+    for call, messages in enumerate(sent, 1):
+        assert rebuild_prompt(str(tmp_path), call) == messages
+    assert rebuild_prompt(str(tmp_path), 13) is None
+
+
+def test_rewritten_history_gets_a_checkpoint(tmp_path):
+    log = EventLog(str(tmp_path))
+    messages = _conversation(log, 3)[-1]
+    compacted = messages[:1] + [{"role": "user", "content": "Summary: ..."}]
+    log.log_messages(compacted)
+    log.log("TOOL_RESULT", "ok")
+    log.close()
+    records = list(iter_events(str(tmp_path)))
+    assert [r["type"] for r in records][-2:] == ["checkpoint", "TOOL_RESULT"]
+    assert rebuild_prompt(str(tmp_path), 4) == compacted
+
+
+def test_segments_rotate_to_gzip_and_numbering_survives_a_restart(tmp_path):
+    log = EventLog(str(tmp_path), checkpoint_every=1000, segment_bytes=500)
+    sent = _conversation(log, 10)
+    log.close()
+    names = sorted(os.listdir(tmp_path))
+    assert len(names) > 2 and all(n.endswith(".jsonl.gz") for n in names[:-1])
+
+    again = EventLog(str(tmp_path))
+    again.log_messages([{"role": "system", "content": "new run"}])
+    again.close()
+    for call, messages in enumerate(sent, 1):
+        assert rebuild_prompt(str(tmp_path), call) == messages
+    assert rebuild_prompt(str(tmp_path), 11) == [{"role": "system", "content": "new run"}]
+
+
+def test_background_writer_keeps_order_and_rotates(tmp_path, capsys):
+    writer = BackgroundLogWriter(flush_interval=0.01, max_bytes=100, backups=2)
+    path = str(tmp_path / "logs" / "session.log")
+    for i in range(30):
+        writer.write(path, f"entry {i:02d}\n", echo=i == 0)
+    writer.flush()
+    writer.close()
+    files = [path + ".2", path + ".1", path]
+    text = "".join(open(p).read() for p in files if os.path.exists(p))
+    entries = text.splitlines()
+    assert entries == sorted(entries) and entries[-1] == "entry 29"
+    assert os.path.exists(path + ".1")
+    assert capsys.readouterr().out == "entry 00\n\n"
@@ -0,0 +1,91 @@
+import os
+import time
+import threading
+
+import requests
+
+import http_cache
+from http_cache import HttpCache
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None, url=""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.url = url
+
+
+class Upstream:
+    """Replaces requests.request; answers with `reply(url, headers)` and records each call."""
+    def __init__(self, monkeypatch, reply, delay=0.0):
+        self.calls = []
+        self.lock = threading.Lock()
+
+        def request(method, url, headers=None, **kwargs):
+            time.sleep(delay)
+            with self.lock:
+                self.calls.append((url, headers or {}))
+            return reply(url, headers or {})
+        monkeypatch.setattr(requests, "request", request)
+
+
+def test_second_request_is_a_hit(tmp_path, monkeypatch):
+    upstream = Upstream(monkeypatch, lambda url, h: FakeResponse(200, b"page", {"Content-Type": "text/html"}, url))
+    cache = HttpCache(str(tmp_path))
+    first = cache.request("GET", "https://example.com/a")
+    second = cache.request("GET", "https://example.com/a")
+    assert first.content == second.content == b"page"
+    assert getattr(second, "from_cache", False) and second.headers["content-type"] == "text/html"
+    assert len(upstream.calls) == 1
+    cache.request("GET", "https://example.com/a", params={"q": 1})
+    assert len(upstream.calls) == 2
+
+
+def test_errors_are_not_cached(tmp_path, monkeypatch):
+    upstream = Upstream(monkeypatch, lambda url, h: FakeResponse(500, b"down", url=url))
+    cache = HttpCache(str(tmp_path))
+    cache.request("GET", "https://example.com/a")
+    cache.request("GET", "https://example.com/a")
+    assert len(upstream.calls) == 2
+
+
+def test_concurrent_misses_make_one_upstream_call(tmp_path, monkeypatch):
+    upstream = Upstream(monkeypatch, lambda url, h: FakeResponse(200, b"page", url=url), delay=0.2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(HttpCache(str(tmp_path)).request("GET", "https://example.com/a").content))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    assert results == [b"page"] * 5
+    assert len(upstream.calls) == 1
+
+
+def test_expired_entry_is_revalidated(tmp_path, monkeypatch):
+    def reply(url, headers):
+        if headers.get("If-None-Match") == '"v1"':
+            return FakeResponse(304, url=url)
+        return FakeResponse(200, b"page", {"ETag": '"v1"'}, url)
+    upstream = Upstream(monkeypatch, reply)
+    cache = HttpCache(str(tmp_path))
+    cache.request("GET", "https://example.com/a", ttl=0)
+    again = cache.request("GET", "https://example.com/a", ttl=0)
+    assert again.status_code == 200 and again.content == b"page"
+    assert upstream.calls[1][1] == {"If-None-Match": '"v1"'}
+
+
+def test_sweep_evicts_least_recently_used(tmp_path, monkeypatch):
+    Upstream(monkeypatch, lambda url, h: FakeResponse(200, url.encode() * 100, url=url))
+    monkeypatch.setattr(http_cache, "SWEEP_INTERVAL", 3600)
+    cache = HttpCache(str(tmp_path), max_bytes=5000)
+    for i, url in enumerate(["https://example.com/old", "https://example.com/used", "https://example.com/new"]):
+        cache.request("GET", url)
+        key_path = cache._key_path(cache.request_key("GET", url))
+        os.utime(key_path, (1000 + i, 1000 + i))
+    cache._hit(cache.request_key("GET", "https://example.com/used"), *cache._load(cache.request_key("GET", "https://example.com/used")))
+    cache.sweep()
+    assert cache._load(cache.request_key("GET", "https://example.com/old")) == (None, None)
+    assert cache._load(cache.request_key("GET", "https://example.com/used"))[1] is not None
+    assert cache._load(cache.request_key("GET", "https://example.com/new"))[1] is not None
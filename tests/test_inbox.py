@@ -0,0 +1,52 @@
+import time
+import threading
+
+from inbox import Inbox
+
+
+def test_concurrent_takes_never_lose_or_duplicate_messages(tmp_path):
+    errors = []
+    path = tmp_path / "INCOMING_MESSAGE.md"
+    inbox = Inbox(str(path), socket_path=None, on_error=errors.append)
+    try:
+        sent = [f"message {i}" for i in range(300)]
+        writer_done = threading.Event()
+
+        def writer():
+            deadline = time.monotonic() + 20
+            for text in sent:
+                # Like a user writing the next message: only once the last one was picked up
+                while path.exists() and time.monotonic() < deadline:
+                    time.sleep(0)
+                tmp = tmp_path / "tmp.md"
+                tmp.write_text(text)
+                tmp.replace(path)
+            writer_done.set()
+
+        def taker():
+            while not writer_done.is_set():
+                inbox._take_file()
+                time.sleep(0)
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=taker) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(30)
+        received = inbox.drain()
+        assert sorted(received) == sorted(sent)
+        assert errors == []
+        assert not list(tmp_path.glob("*.reading*"))
+    finally:
+        inbox.close()
+
+
+def test_urgent_prefix_sets_flag_and_is_stripped(tmp_path):
+    inbox = Inbox(str(tmp_path / "INCOMING_MESSAGE.md"), socket_path=None)
+    try:
+        inbox.put("URGENT: stop that")
+        assert inbox.urgent.is_set()
+        assert inbox.drain() == ["stop that"]
+        assert not inbox.urgent.is_set()
+    finally:
+        inbox.close()
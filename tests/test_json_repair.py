@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+import json_repair
+
+
+def test_valid_json_is_untouched():
+    raw = '{"tool": "write", "args": ["a.py", "x = {\\"k\\": [1, 2, ], }"]}'
+    assert json_repair.loads(raw) == json.loads(raw)
+
+
+def test_trailing_commas_inside_strings_survive_extraction():
+    raw = 'Sure:\n```json\n{"tool": "write", "args": ["a.py", "x = {\\"k\\": [1, 2, ], }"]}\n```'
+    assert json_repair.loads(raw)["args"][1] == 'x = {"k": [1, 2, ], }'
+
+
+def test_trailing_commas_outside_strings_are_dropped():
+    raw = 'Here you go {"tool": "edit", "args": ["a.py", "[1, ]", "b",],}'
+    assert json_repair.loads(raw) == {"tool": "edit", "args": ["a.py", "[1, ]", "b"]}
+
+
+def test_python_literals_single_quotes_and_bare_keys():
+    assert json_repair.loads("{tool: 'read', 'flag': True, 'x': None,}") == {"tool": "read", "flag": True, "x": None}
+
+
+@pytest.mark.parametrize("raw", [
+    '{"tool": "read", "args": ["a.py"',
+    '{"thought":"x","tool_calls":[{"name":"write","arguments":["a.py","def f():\n return 1\n\ndef g',
+    '```json\n{"tool": "read", "args": ["a.py"]',
+    '{"tool": "read", "args": ["a.py"]]',
+])
+def test_truncated_or_unbalanced_input_is_rejected(raw):
+    with pytest.raises(json.JSONDecodeError):
+        json_repair.loads(raw)
+
+
+def test_comments_are_removed():
+    assert json_repair.loads('{"tool": "read", // why\n "args": ["a"] /* x */}') == {"tool": "read", "args": ["a"]}
@@ -0,0 +1,37 @@
+import line_index
+from use_tools import AgentFileToolbox
+
+
+def _toolbox(tmp_path, lines=1000):
+    (tmp_path / "f.txt").write_text("".join(f"line {i}\n" for i in range(1, lines + 1)))
+    return AgentFileToolbox(str(tmp_path))
+
+
+def test_lines_without_a_start_reads_from_the_top(tmp_path):
+    ft = _toolbox(tmp_path)
+    out = ft.read("f.txt", "lines")
+    assert out.startswith("[lines 1-200 of 1000]\nline 1\n")
+
+
+def test_ranges_and_shorthand(tmp_path):
+    ft = _toolbox(tmp_path)
+    assert ft.read("f.txt", "lines", "500", "502") == "[lines 500-502 of 1000]\nline 500\nline 501\nline 502\n"
+    assert ft.read("f.txt", "10-11") == "[lines 10-11 of 1000]\nline 10\nline 11\n"
+    assert ft.read("f.txt", "tail", "1") == "[lines 1000-1000 of 1000]\nline 1000\n"
+    assert ft.read("f.txt", "wc").startswith("f.txt: 1000 lines")
+    assert ft.read("f.txt", "lines", "2000").startswith("Error: Line 2000 is past the end")
+
+
+def test_bad_numbers_name_the_usage(tmp_path):
+    ft = _toolbox(tmp_path)
+    assert ft.read("f.txt", "lines", "ten") == "Error: read f.txt lines <start> [end] takes whole numbers, got ten."
+    assert ft.read("f.txt", "sideways").startswith("Error: Unknown read mode 'sideways'")
+
+
+def test_index_matches_a_plain_split_at_every_stride(tmp_path):
+    path = tmp_path / "g.txt"
+    lines = [f"{i}" * (i % 7) + "\n" for i in range(3 * line_index.STRIDE + 5)]
+    path.write_text("".join(lines) + "no newline at the end")
+    for start in (1, line_index.STRIDE, line_index.STRIDE + 1, 2 * line_index.STRIDE + 3):
+        out = line_index.read_lines(str(path), start, start + 2)
+        assert out.split("\n", 1)[1] == "".join(lines[start - 1:start + 2])
@@ -0,0 +1,62 @@
+import os
+import stat
+import urllib.request
+
+import metrics
+from metrics import MetricsRegistry
+
+
+def test_counters_and_labels_render_as_openmetrics():
+    registry = MetricsRegistry({"agent_tool_calls": "Tool calls by tool"})
+    registry.inc("agent_tool_calls", tool="read")
+    registry.inc("agent_tool_calls", 2, tool="read")
+    registry.inc("agent_tool_calls", tool='say "hi"\n')
+    text = registry.render()
+    assert "# TYPE agent_tool_calls counter\n# HELP agent_tool_calls Tool calls by tool\n" in text
+    assert 'agent_tool_calls_total{tool="read"} 3\n' in text
+    assert 'agent_tool_calls_total{tool="say \\"hi\\"\\n"} 1\n' in text
+    assert text.endswith("# EOF\n")
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    for value in (0.2, 0.5, 3, 1000):
+        registry.observe("agent_step_seconds", value, buckets=(0.5, 1, 5), phase="llm")
+    lines = [l for l in registry.render().splitlines() if l.startswith("agent_step_seconds")]
+    assert lines == [
+        'agent_step_seconds_bucket{phase="llm",le="0.5"} 2',
+        'agent_step_seconds_bucket{phase="llm",le="1.0"} 2',
+        'agent_step_seconds_bucket{phase="llm",le="5.0"} 3',
+        'agent_step_seconds_bucket{phase="llm",le="+Inf"} 4',
+        'agent_step_seconds_count{phase="llm"} 4',
+        'agent_step_seconds_sum{phase="llm"} 1003.7',
+    ]
+
+
+def test_textfile_is_replaced_whole_and_readable_by_others(tmp_path):
+    registry = MetricsRegistry()
+    registry.inc("agent_steps")
+    path = tmp_path / "agent.prom"
+    old_umask = os.umask(0o022)
+    try:
+        registry.write_textfile(str(path))
+        registry.inc("agent_steps")
+        registry.write_textfile(str(path))
+    finally:
+        os.umask(old_umask)
+    assert "agent_steps_total 2\n" in path.read_text()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert [p.name for p in tmp_path.iterdir()] == ["agent.prom"]
+
+
+def test_serve_exposes_the_registry():
+    registry = MetricsRegistry()
+    registry.inc("agent_steps")
+    server = registry.serve(0)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics", timeout=5) as resp:
+            assert resp.headers["Content-Type"] == metrics.CONTENT_TYPE
+            assert b"agent_steps_total 1\n" in resp.read()
+    finally:
+        server.shutdown()
+        server.server_close()
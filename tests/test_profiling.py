@@ -0,0 +1,83 @@
+import time
+import threading
+import concurrent.futures
+
+import pytest
+
+import profiling
+from profiling import Profiler
+
+
+def _tool_body_for_profile(n):
+    return sum(i * i for i in range(n))
+
+
+def _run_on_pool(profiler):
+    with concurrent.futures.ThreadPoolExecutor(4, thread_name_prefix="tool-file") as pool:
+        return list(pool.map(profiler.wrap(_tool_body_for_profile), [1000] * 8))
+
+
+@pytest.mark.skipif(profiling.PROCESS_WIDE_PROFILE, reason="3.12+ uses one process-wide profile")
+def test_tool_calls_on_pool_threads_reach_the_cprofile_dump(tmp_path):
+    profiler = Profiler(str(tmp_path), ["cprofile"])
+    assert _run_on_pool(profiler)[0] == _tool_body_for_profile(1000)
+    profiler.stop()
+    text = (tmp_path / "cprofile_final.txt").read_text()
+    assert "8 tool call(s)" in text
+    assert "_tool_body_for_profile" in text
+    assert (tmp_path / "cprofile_final.prof").stat().st_size > 0
+
+
+@pytest.mark.skipif(not profiling.PROCESS_WIDE_PROFILE, reason="sys.monitoring-based cProfile is 3.12+")
+def test_process_wide_profile_covers_pool_threads(tmp_path):
+    profiler = Profiler(str(tmp_path), ["cprofile"])
+    assert profiler.wrap(_tool_body_for_profile) is _tool_body_for_profile
+    assert _run_on_pool(profiler)[0] == _tool_body_for_profile(1000)
+    profiler.stop()
+    text = (tmp_path / "cprofile_final.txt").read_text()
+    assert "process-wide" in text and "_tool_body_for_profile" in text
+
+
+def test_tool_calls_run_unprofiled_when_another_profiler_is_active(tmp_path, monkeypatch):
+    profiler = Profiler(str(tmp_path), ["cprofile"])
+    monkeypatch.setattr(profiling, "PROCESS_WIDE_PROFILE", False)
+    monkeypatch.setattr(profiling, "_start_profile", lambda: None)
+    try:
+        assert _run_on_pool(profiler) == [_tool_body_for_profile(1000)] * 8
+        assert Profiler(str(tmp_path / "second"), ["cprofile"]).profile is None
+    finally:
+        monkeypatch.undo()
+        profiler.stop()
+
+
+def test_wrap_is_a_no_op_without_cprofile(tmp_path):
+    profiler = Profiler(str(tmp_path), ["tracemalloc"])
+    try:
+        assert profiler.wrap(_tool_body_for_profile) is _tool_body_for_profile
+    finally:
+        profiler.stop()
+
+
+def test_steps_are_counted_across_sessions(tmp_path):
+    profiler = Profiler(str(tmp_path), ["cprofile"], every=3)
+    for _ in range(7):
+        profiler.step()     # e.g. two sessions on one loop, interleaved
+    profiler.stop()
+    assert sorted(p.name for p in tmp_path.glob("*.txt")) == ["cprofile_final.txt", "cprofile_step0003.txt", "cprofile_step0006.txt"]
+
+
+def test_sampler_watches_the_named_threads(tmp_path):
+    profiler = Profiler(str(tmp_path), ["sampler"], sample_interval=0.002, threads=("loop-",))
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            _tool_body_for_profile(100)
+
+    thread = threading.Thread(target=spin, name="loop-main")
+    thread.start()
+    time.sleep(0.2)
+    stop.set()
+    thread.join()
+    profiler.stop()
+    assert "loop-main;" in (tmp_path / "sampler_final.txt").read_text()
@@ -0,0 +1,133 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from resilient_llm import Endpoint, ResilientClient, AsyncResilientClient
+
+
+class FakeClient:
+    """Stands in for an OpenAI client; each create() sleeps, then returns or raises `result`."""
+    def __init__(self, name, delay=0.0, result=None):
+        self.name = name
+        self.delay = delay
+        self.result = result
+        self.calls = []
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        start = time.monotonic()
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls.append((start, time.monotonic()))
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.name
+
+
+class AsyncFakeClient(FakeClient):
+    async def create(self, **kwargs):
+        start = time.monotonic()
+        await asyncio.sleep(self.delay)
+        self.calls.append((start, time.monotonic()))
+        return self.name
+
+
+def half_open(name, client, cooldown=60):
+    endpoint = Endpoint(name, client, breaker_threshold=1, breaker_cooldown=cooldown)
+    endpoint.failures = 1
+    endpoint.opened_at = time.monotonic() - cooldown - 1
+    return endpoint
+
+
+def run_concurrently(fn, n):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fn())) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    return results
+
+
+def test_half_open_lets_one_trial_through_and_fails_over_the_rest():
+    primary = FakeClient("primary", delay=0.3)
+    secondary = FakeClient("secondary")
+    client = ResilientClient([half_open("primary", primary), Endpoint("secondary", secondary)], deadline=10)
+
+    results = run_concurrently(lambda: client.create(messages=[]), 5)
+
+    assert len(primary.calls) == 1
+    assert sorted(results) == ["primary"] + ["secondary"] * 4
+
+
+def test_half_open_single_endpoint_waits_for_the_trial_then_closes():
+    primary = FakeClient("primary", delay=0.3)
+    endpoint = half_open("primary", primary)
+    client = ResilientClient([endpoint], deadline=10)
+
+    results = run_concurrently(lambda: client.create(messages=[]), 4)
+
+    assert results == ["primary"] * 4
+    calls = sorted(primary.calls)
+    trial_end = calls[0][1]
+    assert all(start >= trial_end for start, _ in calls[1:])
+    assert endpoint.opened_at is None and not endpoint.trial
+
+
+def test_failed_trial_reopens_the_breaker():
+    endpoint = half_open("primary", FakeClient("primary", result=openai.APIConnectionError(request=None)))
+    client = ResilientClient([endpoint], max_retries=0, deadline=10)
+
+    with pytest.raises(openai.APIConnectionError):
+        client.create(messages=[])
+
+    now = time.monotonic()
+    assert not endpoint.trial
+    assert not endpoint.available(now) and endpoint.reopens_in(now) > 50
+
+
+def test_non_retryable_error_releases_the_trial_slot():
+    primary = FakeClient("primary", result=ValueError("malformed request"))
+    endpoint = half_open("primary", primary)
+    client = ResilientClient([endpoint], deadline=10)
+
+    with pytest.raises(ValueError):
+        client.create(messages=[])
+
+    assert not endpoint.trial and endpoint.available(time.monotonic())
+
+
+def test_async_half_open_lets_one_trial_through():
+    primary = AsyncFakeClient("primary", delay=0.2)
+    secondary = AsyncFakeClient("secondary")
+    client = AsyncResilientClient([half_open("primary", primary), Endpoint("secondary", secondary)], deadline=10)
+
+    async def main():
+        return await asyncio.gather(*(client.create(messages=[]) for _ in range(5)))
+
+    results = asyncio.run(main())
+
+    assert len(primary.calls) == 1
+    assert sorted(results) == ["primary"] + ["secondary"] * 4
+
+
+def test_cancelled_trial_releases_the_slot():
+    primary = AsyncFakeClient("primary", delay=5)
+    endpoint = half_open("primary", primary)
+    client = AsyncResilientClient([endpoint], deadline=10)
+
+    async def main():
+        task = asyncio.ensure_future(client.create(messages=[]))
+        await asyncio.sleep(0.05)
+        assert endpoint.trial
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert not endpoint.trial
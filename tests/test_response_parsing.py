@@ -0,0 +1,149 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import wrapper
+from wrapper import StreamingResponseParser, NativeStreamParser
+
+TRUNCATED = '{"thought":"x","tool_calls":[{"name":"write","arguments":["a.py","def f():\\n return 1\\n\\ndef g'
+
+
+def _stream(text, pieces):
+    """Feeds text in `pieces`-sized deltas; returns (result, calls dispatched while streaming)."""
+    dispatched = []
+    parser = StreamingResponseParser(on_tool_call=dispatched.append)
+    for i in range(0, len(text), pieces):
+        parser.feed_delta(SimpleNamespace(content=text[i:i + pieces]))
+    return parser.result(), dispatched
+
+
+def _native_message(*calls, content=""):
+    tool_calls = [SimpleNamespace(id=f"call_{i}", type="function", function=SimpleNamespace(name=name, arguments=args))
+                  for i, (name, args) in enumerate(calls)]
+    return SimpleNamespace(content=content, tool_calls=tool_calls)
+
+
+def test_truncated_text_response_is_a_parse_error():
+    with pytest.raises(json.JSONDecodeError):
+        wrapper._parse_response_text(TRUNCATED)
+
+
+def test_truncated_stream_runs_nothing_past_the_last_complete_call():
+    text = '{"thought":"x","tool_calls":[{"name":"read","arguments":["b.py"]},' + TRUNCATED[29:]
+    result, dispatched = _stream(text, 7)
+    assert dispatched == [{"name": "read", "arguments": ["b.py"]}]
+    assert result["tool_calls"] == dispatched
+    assert "cut off after 1 complete tool call" in result["invalid_tool_calls"][0]
+
+
+def test_truncated_stream_with_no_complete_call_is_a_parse_error():
+    with pytest.raises(json.JSONDecodeError):
+        _stream(TRUNCATED, 5)
+
+
+def test_native_call_with_cut_off_arguments_is_not_run():
+    message = _native_message(("read", '{"path": "a.py"}'), ("write", '{"path": "a.py", "content": "def g'))
+    parsed = wrapper._parse_native_message(message)
+    assert parsed["tool_calls"] == [{"name": "read", "arguments": ["a.py"], "id": "call_0"}]
+    assert "write" in parsed["invalid_tool_calls"][0]
+
+
+def test_native_stream_drops_the_cut_off_call():
+    dispatched = []
+    parser = NativeStreamParser(on_tool_call=dispatched.append)
+    parser.feed_delta(SimpleNamespace(content=None, tool_calls=[
+        SimpleNamespace(index=0, id="c0", type="function", function=SimpleNamespace(name="write", arguments='{"path": "a.py", "con'))]))
+    result = parser.result()
+    assert dispatched == [] and result["tool_calls"] == []
+    assert len(result["invalid_tool_calls"]) == 1
+
+
+def test_invalid_calls_are_reported_and_kept_out_of_the_history():
+    response = {"thought": "t", "tool_calls": [], "invalid_tool_calls": ["Could not parse tool call 'x'."]}
+    assert wrapper._invalid_call_observations(response) == ["System Error: Could not parse tool call 'x'. Please send that call again."]
+    assert json.loads(wrapper._assistant_message(response)["content"]) == {"thought": "t", "tool_calls": []}
+
+
+RESPONSE = ('Sure.\n```json\n{"thought": "Line one\\nline \\u00e9 two", "tool_calls": ['
+            '{"name": "read", "arguments": ["a {b} [c].py"]}, '
+            '{"name": "write", "arguments": ["out.txt", "quote \\" and }"]}]}\n```')
+
+
+@pytest.mark.parametrize("pieces", [1, 3, 16, len(RESPONSE)])
+def test_split_chunks_emit_each_call_as_it_closes(pieces):
+    thoughts = []
+    dispatched = []
+    parser = StreamingResponseParser(on_tool_call=dispatched.append, on_thought=thoughts.append)
+    seen_at = []
+    for i in range(0, len(RESPONSE), pieces):
+        parser.feed_delta(SimpleNamespace(content=RESPONSE[i:i + pieces]))
+        seen_at.append(len(dispatched))
+    result = parser.result()
+    assert dispatched == [{"name": "read", "arguments": ["a {b} [c].py"]},
+                          {"name": "write", "arguments": ["out.txt", 'quote " and }']}]
+    assert result == {"thought": "Line one\nline é two", "tool_calls": dispatched}
+    assert thoughts == ["Line one", "line é two"]
+    if pieces == 1:
+        # The first call went out before the second one had even started streaming
+        assert seen_at[RESPONSE.index('{"name": "write"')] == 1
+
+
+def test_malformed_element_is_skipped_and_reported():
+    text = ('{"thought": "t", "tool_calls": [{"name": "read", "arguments": ["a"]}, '
+            '{"name": "read" "arguments": ["b"]}, {"name": "list", "arguments": ["."]}]}')
+    result, dispatched = _stream(text, 4)
+    assert dispatched == [{"name": "read", "arguments": ["a"]}, {"name": "list", "arguments": ["."]}]
+    assert result["tool_calls"] == dispatched
+    assert len(result["invalid_tool_calls"]) == 1 and '"name": "read" "arguments"' in result["invalid_tool_calls"][0]
+
+
+def test_hand_off_submits_calls_the_stream_could_not_see():
+    # Single-quoted JSON: the streaming parser can't follow it, the repair at the end can
+    result, dispatched = _stream("{'thought': 't', 'tool_calls': [{'name': 'read', 'arguments': ['a']}]}", 5)
+    assert dispatched == []
+    assert result["tool_calls"] == [{"name": "read", "arguments": ["a"]}]
+
+
+
+def test_native_turn_is_recorded_as_tool_calls_and_tool_results(monkeypatch):
+    monkeypatch.setattr(wrapper, "LLM_TOOL_MODE", "native")
+    message = _native_message(("read", '{"path": "a.py"}'), ("write", '{"path": "b.py", "con'), ("list", "{}"),
+                              content="Looking around.")
+    parsed = wrapper._parse_native_message(message)
+    assistant = wrapper._assistant_message(parsed)
+    assert assistant["content"] == "Looking around."
+    assert [tc["id"] for tc in assistant["tool_calls"]] == ["call_0", "call_1", "call_2"]
+    assert assistant["tool_calls"][1]["function"] == {"name": "write", "arguments": '{"path": "b.py", "con'}
+
+    submitted = [(call, None) for call in parsed["tool_calls"]]
+    results = wrapper._observation_messages(parsed, submitted, ["Tool read Result: x", "Tool list Result: y"])
+    assert [(m["role"], m["tool_call_id"]) for m in results] == [("tool", "call_0"), ("tool", "call_1"), ("tool", "call_2")]
+    assert results[0]["content"] == "Tool read Result: x" and results[2]["content"] == "Tool list Result: y"
+    assert results[1]["content"].startswith("System Error: Could not parse the arguments of tool call write")
+
+
+def test_native_stream_keeps_call_ids():
+    parser = NativeStreamParser()
+    parser.feed_delta(SimpleNamespace(content=None, tool_calls=[
+        SimpleNamespace(index=0, id="c0", type="function", function=SimpleNamespace(name="read", arguments=""))]))
+    parser.feed_delta(SimpleNamespace(content=None, tool_calls=[
+        SimpleNamespace(index=0, id=None, type=None, function=SimpleNamespace(name=None, arguments='{"path": "a"}'))]))
+    result = parser.result()
+    assert result["tool_calls"] == [{"name": "read", "arguments": ["a"], "id": "c0"}]
+    assert result["native_tool_calls"] == [{"id": "c0", "type": "function", "function": {"name": "read", "arguments": '{"path": "a"}'}}]
+
+
+def test_text_mode_turn_is_one_user_message(monkeypatch):
+    monkeypatch.setattr(wrapper, "LLM_TOOL_MODE", "json")
+    parsed = {"thought": "t", "tool_calls": [{"name": "read", "arguments": ["a"]}]}
+    assert wrapper._assistant_message(parsed) == {"role": "assistant", "content": json.dumps(parsed)}
+    assert wrapper._observation_messages(parsed, [(parsed["tool_calls"][0], None)], ["Tool read Result: x"]) == [
+        {"role": "user", "content": "Tool read Result: x"}]
+
+
+def test_error_prompt_depends_on_the_mode(monkeypatch):
+    monkeypatch.setattr(wrapper, "LLM_TOOL_MODE", "native")
+    assert "function calls" in wrapper._error_prompt("Invalid JSON format") and "VALID JSON" not in wrapper._error_prompt("x")
+    monkeypatch.setattr(wrapper, "LLM_TOOL_MODE", "json")
+    assert "VALID JSON ONLY" in wrapper._error_prompt("x")
@@ -0,0 +1,78 @@
+import os
+import time
+
+from tool_cache import ToolCache
+
+
+def _cache(tmp_path, **kw):
+    (tmp_path / "a.txt").write_text("alpha")
+    (tmp_path / "b.txt").write_text("beta")
+    return ToolCache({"read": None, "list": None, "web_fetch": 60}, root=str(tmp_path), **kw)
+
+
+def test_hit_after_put_and_errors_are_not_cached(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.get("read", ["a.txt"]) is None
+    cache.put("read", ["a.txt"], "alpha")
+    assert cache.get("read", ["a.txt"]) == "alpha"
+    cache.put("read", ["missing.txt"], "Error: File not found")
+    assert cache.get("read", ["missing.txt"]) is None
+    cache.put("write", ["a.txt", "x"], "ok")
+    assert cache.get("write", ["a.txt", "x"]) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_write_invalidates_only_overlapping_paths(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("read", ["a.txt"], "alpha")
+    cache.put("read", ["b.txt"], "beta")
+    cache.put("list", ["."], "a.txt b.txt")
+    cache.invalidate({"name": "write", "arguments": ["a.txt", "new"]})
+    assert cache.get("read", ["a.txt"]) is None
+    assert cache.get("list", ["."]) is None         # the directory holds a.txt
+    assert cache.get("read", ["b.txt"]) == "beta"
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_tools_that_may_touch_anything_drop_every_path_entry(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("read", ["a.txt"], "alpha")
+    cache.put("web_fetch", ["https://example.com"], "<html>")
+    cache.invalidate({"name": "run_python", "arguments": ["print(1)"]})
+    assert cache.get("read", ["a.txt"]) is None
+    assert cache.get("web_fetch", ["https://example.com"]) == "<html>"
+
+
+def test_changes_made_outside_the_tools_are_noticed(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("read", ["a.txt"], "alpha")
+    path = tmp_path / "a.txt"
+    path.write_text("changed by hand")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert cache.get("read", ["a.txt"]) is None
+
+
+def test_web_entries_expire(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache.put("web_fetch", ["https://example.com"], "<html>")
+    now[0] += 59
+    assert cache.get("web_fetch", ["https://example.com"]) == "<html>"
+    now[0] += 2
+    assert cache.get("web_fetch", ["https://example.com"]) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = _cache(tmp_path, max_bytes=40)
+    cache.put("web_fetch", ["1"], "x" * 10)
+    cache.put("web_fetch", ["2"], "x" * 10)
+    cache.put("web_fetch", ["3"], "x" * 10)
+    assert cache.get("web_fetch", ["1"]) is not None    # now most recently used
+    cache.put("web_fetch", ["4"], "x" * 10)
+    cache.put("web_fetch", ["5"], "x" * 10)
+    assert cache.get("web_fetch", ["2"]) is None
+    assert cache.get("web_fetch", ["1"]) is not None
+    stats = cache.stats()
+    assert stats["bytes"] <= 40 and stats["evictions"] == 1
@@ -0,0 +1,85 @@
+import os
+import threading
+
+import pytest
+
+import tool_pool
+from tool_pool import ToolWorkerPool, PoolExhausted
+
+TOOL_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "use_tools.py")
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pool = ToolWorkerPool(TOOL_SCRIPT, size=2)
+    yield pool
+    pool.shutdown()
+
+
+def test_calls_round_trip(pool):
+    resp = pool.call("timestamp", [], timeout=10)
+    assert resp["code"] == 0 and resp["output"]
+
+
+def test_waiting_for_a_worker_times_out_with_pool_exhausted(pool):
+    held = [pool._acquire(5), pool._acquire(5)]
+    with pytest.raises(PoolExhausted):
+        pool.call("timestamp", [], timeout=10, acquire_timeout=0.2)
+    for worker in held:
+        pool.idle.put(worker)
+    assert pool.call("timestamp", [], timeout=10)["code"] == 0
+
+
+def test_failed_respawn_keeps_the_slot(pool, monkeypatch):
+    for worker in [pool._acquire(5), pool._acquire(5)]:
+        pool._retire(worker)
+    assert pool.workers == []
+
+    real = tool_pool.ToolWorker
+    monkeypatch.setattr(tool_pool, "ToolWorker", lambda script: (_ for _ in ()).throw(OSError("fork failed")))
+    with pytest.raises(OSError):
+        pool.call("timestamp", [], timeout=10, acquire_timeout=1)
+    monkeypatch.setattr(tool_pool, "ToolWorker", real)
+
+    # Both slots are still there: two callers at once each get a fresh worker
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.call("timestamp", [], timeout=10, acquire_timeout=10)))
+               for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+    assert len(results) == 2 and len(pool.workers) == 2
+
+
+def test_crashed_worker_is_replaced(pool):
+    worker = pool._acquire(5)
+    worker.kill()
+    pool.idle.put(worker)
+    for _ in range(3):
+        assert pool.call("timestamp", [], timeout=10)["code"] == 0
+    assert len(pool.workers) <= 2
+
+
+def test_cold_slots_start_only_when_every_worker_is_busy(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pool = ToolWorkerPool(TOOL_SCRIPT, size=3, warm=1)
+    try:
+        assert len(pool.workers) == 1
+        for _ in range(3):
+            pool.call("timestamp", [], timeout=10)
+        assert len(pool.workers) == 1       # one at a time: the warm worker is reused
+        held = [pool._acquire(5) for _ in range(3)]
+        assert len(pool.workers) == 3 and len(set(held)) == 3
+        with pytest.raises(PoolExhausted):
+            pool._acquire(0.1)
+        for worker in held:
+            pool.idle.put(worker)
+    finally:
+        pool.shutdown()
+
+
+def test_worker_pool_covers_every_scheduler_slot():
+    import wrapper
+    assert wrapper.TOOL_POOL_SIZE >= sum(p["concurrency"] for p in wrapper.TOOL_POOLS.values())
@@ -0,0 +1,128 @@
+import threading
+import time
+import concurrent.futures
+
+import pytest
+
+import wrapper
+from tool_scheduler import ToolScheduler, TurnGraph, run_after, access_sets, conflicts
+
+
+def _scheduler():
+    return ToolScheduler({"file": {"tools": ["read", "write", "edit"], "concurrency": 4}})
+
+
+def _graph_submit(graph, scheduler, call, fn):
+    return graph.add(call, lambda deps: run_after(deps, lambda: scheduler.submit(call["name"], fn)))
+
+
+def test_conflicting_calls_run_in_order_and_others_in_parallel(tmp_path):
+    scheduler, graph, order = _scheduler(), TurnGraph(str(tmp_path)), []
+    gate = threading.Event()
+
+    def slow_write():
+        gate.wait(2)
+        order.append("write a")
+
+    first = _graph_submit(graph, scheduler, {"name": "write", "arguments": ["a.txt", "x"]}, slow_write)
+    second = _graph_submit(graph, scheduler, {"name": "read", "arguments": ["a.txt"]}, lambda: order.append("read a"))
+    other = _graph_submit(graph, scheduler, {"name": "read", "arguments": ["b.txt"]}, lambda: order.append("read b"))
+    other.result(2)
+    assert order == ["read b"]          # didn't wait for the write to a.txt
+    gate.set()
+    second.result(2)
+    assert order == ["read b", "write a", "read a"]
+    assert first.done()
+    scheduler.shutdown()
+
+
+def test_parent_directory_write_conflicts_with_child_read(tmp_path):
+    write_dir = access_sets({"name": "mkdir", "arguments": ["src"]}, str(tmp_path))
+    read_child = access_sets({"name": "read", "arguments": ["src/a.py"]}, str(tmp_path))
+    read_other = access_sets({"name": "read", "arguments": ["srcx/a.py"]}, str(tmp_path))
+    assert conflicts(write_dir, read_child)
+    assert not conflicts(write_dir, read_other)
+
+
+def test_run_after_cancelled_before_start_never_starts():
+    dep = concurrent.futures.Future()
+    started = []
+    outer = run_after([dep], lambda: started.append(1) or concurrent.futures.Future())
+    assert outer.cancel()
+    dep.set_result(None)
+    assert started == [] and outer.cancelled()
+
+
+def test_run_after_start_on_shut_down_pool_fails_the_future():
+    scheduler = _scheduler()
+    dep = concurrent.futures.Future()
+    outer = run_after([dep], lambda: scheduler.submit("read", lambda: "never"))
+    scheduler.shutdown()
+    dep.set_result(None)    # must not raise out of the callback
+    with pytest.raises(RuntimeError):
+        outer.result(1)
+
+
+def test_drain_late_calls_waits_for_running_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(wrapper, "LATE_CALLS_DRAIN_TIMEOUT", 1)
+    monkeypatch.setattr(wrapper, "log_event", lambda *args, **kwargs: None)
+    scheduler = _scheduler()
+    target = tmp_path / "late.txt"
+
+    def late_write():
+        time.sleep(0.2)
+        target.write_text("landed")
+        return 0, "ok"
+
+    running = scheduler.submit("write", late_write)
+    waiting = run_after([concurrent.futures.Future()], lambda: scheduler.submit("edit", lambda: (0, "never")))
+    late = [("call_1", {"name": "write"}, running), ("call_2", {"name": "edit"}, waiting)]
+    wrapper.drain_late_calls(late)
+    scheduler.shutdown()
+    assert target.read_text() == "landed"
+    assert waiting.cancelled()
+
+
+def test_run_after_cannot_cancel_a_call_that_is_running():
+    dep = concurrent.futures.Future()
+    inner = concurrent.futures.Future()
+    outer = run_after([dep], lambda: inner)
+    dep.set_result(None)
+    inner.set_running_or_notify_cancel()
+    assert not outer.cancel() and not outer.cancelled()
+    inner.set_result("written")
+    assert outer.result(1) == "written"
+
+
+def test_run_after_cancel_reaches_a_queued_call():
+    dep = concurrent.futures.Future()
+    inner = concurrent.futures.Future()
+    outer = run_after([dep], lambda: inner)
+    dep.set_result(None)
+    assert outer.cancel()
+    assert inner.cancelled() and outer.cancelled()
+
+
+def test_urgent_interrupt_carries_running_calls_instead_of_reporting_them_cancelled():
+    running = concurrent.futures.Future()
+    running.set_running_or_notify_cancel()
+    queued = concurrent.futures.Future()
+    done = concurrent.futures.Future()
+    done.set_result((False, "Tool read Result: ok"))
+    submitted = [({"name": "read"}, done), ({"name": "write"}, running), ({"name": "list"}, queued)]
+    late = []
+    _, observations = wrapper._collect_observations(submitted, False, 2, late, cancel=True)
+    assert observations[0] == "Tool read Result: ok"
+    assert observations[1].startswith("Tool write Result: PENDING (call 3.2 was already running")
+    assert observations[2] == "Tool list Result: CANCELLED (interrupted by incoming message before it started)"
+    assert late == [("3.2", {"name": "write"}, running)] and queued.cancelled()
+
+
+def test_abandoned_llm_call_carries_its_running_tools(monkeypatch):
+    monkeypatch.setattr(wrapper, "log_event", lambda *args, **kwargs: None)
+    running = concurrent.futures.Future()
+    running.set_running_or_notify_cancel()
+    queued = concurrent.futures.Future()
+    late = []
+    wrapper._abandon_submitted([({"name": "run_python"}, running), ({"name": "read"}, queued)], 0, late)
+    assert late == [("1.1", {"name": "run_python"}, running)] and queued.cancelled()
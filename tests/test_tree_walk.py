@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+import tree_walk
+from use_tools import AgentFileToolbox
+
+
+def _tree(root):
+    for rel, size in [("a.py", 10), ("b/c.py", 300), ("b/d/e.txt", 5), ("b/d/f.py", 50), ("b-x.py", 1),
+                      ("g.txt", 2000), ("node_modules/x.js", 1), ("z/y.py", 7)]:
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+
+
+def _paths(page):
+    return [e.path for e in page]
+
+
+def _all_pages(root, **kw):
+    pages, cursor = [], None
+    while True:
+        page, cursor = tree_walk.find(str(root), cursor=cursor, **kw)
+        pages.append(_paths(page))
+        if cursor is None:
+            return pages
+
+
+def test_name_order_is_depth_first_and_skips_ignored(tmp_path):
+    _tree(tmp_path)
+    page, cursor = tree_walk.find(str(tmp_path))
+    assert cursor is None
+    assert _paths(page) == ["a.py", "b", "b/c.py", "b/d", "b/d/e.txt", "b/d/f.py", "b-x.py", "g.txt", "z", "z/y.py"]
+
+
+def test_pages_cover_every_entry_once(tmp_path):
+    _tree(tmp_path)
+    everything = _paths(tree_walk.find(str(tmp_path))[0])
+    for sort in tree_walk.SORTS:
+        pages = _all_pages(tmp_path, sort=sort, limit=3)
+        flat = [p for page in pages for p in page]
+        assert sorted(flat) == sorted(everything), sort
+        assert all(len(page) == 3 for page in pages[:-1])
+
+
+def test_cursor_is_stable_when_entries_appear_or_vanish(tmp_path):
+    _tree(tmp_path)
+    first, cursor = tree_walk.find(str(tmp_path), limit=3)
+    assert _paths(first) == ["a.py", "b", "b/c.py"]
+    (tmp_path / "a0.py").write_text("new")       # sorts before the cursor
+    (tmp_path / "b" / "c.py").unlink()            # the cursor entry itself
+    second, _ = tree_walk.find(str(tmp_path), limit=3, cursor=cursor)
+    assert _paths(second) == ["b/d", "b/d/e.txt", "b/d/f.py"]
+
+
+def test_size_order_is_largest_first(tmp_path):
+    _tree(tmp_path)
+    page, _ = tree_walk.find(str(tmp_path), kind="f", sort="size", limit=3)
+    assert _paths(page) == ["g.txt", "b/c.py", "b/d/f.py"]
+
+
+def test_filters_and_depth(tmp_path):
+    _tree(tmp_path)
+    assert _paths(tree_walk.find(str(tmp_path), patterns=["*.py"])[0]) == ["a.py", "b/c.py", "b/d/f.py", "b-x.py", "z/y.py"]
+    assert _paths(tree_walk.find(str(tmp_path), patterns=["b/*/*.py"])[0]) == ["b/d/f.py"]
+    assert _paths(tree_walk.find(str(tmp_path), kind="d")[0]) == ["b", "b/d", "z"]
+    assert _paths(tree_walk.find(str(tmp_path), max_depth=1)[0]) == ["a.py", "b", "b-x.py", "g.txt", "z"]
+    assert "node_modules/x.js" in _paths(tree_walk.find(str(tmp_path), ignore=())[0])
+
+
+def test_resuming_does_not_read_subtrees_before_the_cursor(tmp_path, monkeypatch):
+    _tree(tmp_path)
+    _, cursor = tree_walk.find(str(tmp_path), limit=6)    # last shown: b/d/f.py
+    scanned = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(tree_walk.os, "scandir", lambda d: scanned.append(os.path.relpath(d, tmp_path)) or real_scandir(d))
+    page, _ = tree_walk.find(str(tmp_path), limit=6, cursor=cursor)
+    assert _paths(page) == ["b-x.py", "g.txt", "z", "z/y.py"]
+    assert scanned == [".", "b", os.path.join("b", "d"), "z"]
+
+
+def test_bad_cursors_are_rejected(tmp_path):
+    _tree(tmp_path)
+    _, cursor = tree_walk.find(str(tmp_path), limit=2)
+    with pytest.raises(ValueError, match="sort=name"):
+        tree_walk.find(str(tmp_path), sort="size", cursor=cursor)
+    with pytest.raises(ValueError, match="malformed"):
+        tree_walk.find(str(tmp_path), cursor="not a cursor")
+
+
+def test_find_tool_pages_with_a_follow_up_command(tmp_path):
+    _tree(tmp_path)
+    ft = AgentFileToolbox(str(tmp_path))
+    out = ft.find("b", "pattern=*.py limit=1")
+    first, hint = out.splitlines()
+    assert first.endswith(" b/c.py")
+    cursor = hint.split("cursor=")[1].rstrip("]")
+    assert ft.find("b", f"pattern=*.py limit=1 cursor={cursor}").endswith(" b/d/f.py")
+    assert ft.find("b", "sort=random").startswith("Error: sort must be one of")
+    assert ft.find(".", "cursor=bogus") == "Error: malformed cursor"
@@ -0,0 +1,112 @@
+import io
+import os
+import time
+import tracemalloc
+
+import pytest
+
+import version_store
+from version_store import VersionStore, chunk, iter_chunks
+from use_tools import AgentFileToolbox
+
+
+def _text(lines, seed=0):
+    return "".join(f"line {i} seed {seed} some text to make it longer\n" for i in range(lines)).encode()
+
+
+def test_chunks_are_content_defined_and_independent_of_read_size():
+    data = _text(20000) + b"x" * (3 * version_store.MAX_CHUNK_BYTES + 5)
+    chunks = chunk(data)
+    assert b"".join(chunks) == data
+    assert all(len(c) <= version_store.MAX_CHUNK_BYTES for c in chunks)
+    for block in (1000, 4096, 65536):
+        assert list(iter_chunks(io.BytesIO(data), block)) == chunks
+    # An edit near the start only changes the chunks around it
+    edited = chunk(data.replace(b"line 5 seed", b"LINE 5 seed", 1))
+    assert len(set(edited) - set(chunks)) == 1
+
+
+def test_save_and_restore_round_trip(tmp_path):
+    store = VersionStore(str(tmp_path / ".versions"))
+    target = tmp_path / "f.txt"
+    contents = [_text(3000, seed) for seed in range(3)]
+    for data in contents:
+        target.write_bytes(data)
+        store.save("f.txt", str(target))
+    assert store.save("f.txt", str(target)) is None     # unchanged
+    assert [v["version"] for v in store.versions("f.txt")] == [1, 2, 3]
+    for number, data in enumerate(contents, 1):
+        assert store.content("f.txt", number) == data
+
+
+def test_edit_of_a_big_file_never_holds_it_in_memory(tmp_path):
+    ft = AgentFileToolbox(str(tmp_path))
+    target = tmp_path / "big.txt"
+    target.write_bytes(_text(400000))       # ~20 MB
+    size = os.path.getsize(target)
+    tracemalloc.start()
+    try:
+        out = ft.edit_file("big.txt", "line 399998 seed", "EDITED seed")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert "Error" not in out
+    assert peak < 4 * 1024 * 1024 < size / 4
+    assert ft.versions.content("big.txt", 1) == _text(400000)
+
+
+def _save(store, tmp_path, path, data):
+    target = tmp_path / "work"
+    target.write_bytes(data)
+    return store.save(path, str(target))
+
+
+def test_keep_and_age_retention(tmp_path, monkeypatch):
+    store = VersionStore(str(tmp_path / ".versions"), keep=3, max_age_days=1)
+    for seed in range(5):
+        _save(store, tmp_path, "f.txt", _text(10, seed))
+    assert [v["version"] for v in store.versions("f.txt")] == [3, 4, 5]
+    now = time.time()
+    monkeypatch.setattr(version_store.time, "time", lambda: now + 2 * 86400)
+    store.gc()
+    assert [v["version"] for v in store.versions("f.txt")] == [5]     # the newest always stays
+
+
+def test_gc_drops_oldest_versions_over_budget_and_frees_their_chunks(tmp_path):
+    store = VersionStore(str(tmp_path / ".versions"), max_bytes=10 ** 9)
+    for seed in range(4):
+        for path in ("a.txt", "b.txt"):
+            _save(store, tmp_path, path, _text(2000, seed) + path.encode())
+    chunk_files = lambda: sum(len(files) for _, _, files in os.walk(tmp_path / ".versions" / "chunks"))
+    before = chunk_files()
+    store.max_bytes = 1
+    assert store.gc() > 0
+    assert [v["version"] for v in store.versions("a.txt")] == [4]
+    assert [v["version"] for v in store.versions("b.txt")] == [4]
+    assert store.content("a.txt", 4) == _text(2000, 3) + b"a.txt"
+    assert chunk_files() < before
+
+
+def test_gc_is_not_quadratic_in_versions(tmp_path):
+    # A long-lived store, written directly: 50 paths x 200 versions sharing most chunks
+    store = VersionStore(str(tmp_path / ".versions"), keep=1000, max_age_days=1000, max_bytes=1)
+    shared = [store._put_chunk(b"shared %d\n" % i) for i in range(3)]
+    now = time.time()
+    for p in range(50):
+        versions = [{"version": n + 1, "ts": now - 10000 + n, "size": 0, "sha256": "", "reason": "write",
+                     "chunks": shared + [store._put_chunk(b"path %d version %d\n" % (p, n))]} for n in range(200)]
+        store._save_index({"path": f"f{p}.txt", "versions": versions})
+    started = time.monotonic()
+    store.gc()
+    assert time.monotonic() - started < 5
+    assert all([v["version"] for v in store.versions(f"f{p}.txt")] == [200] for p in range(50))
+
+
+@pytest.mark.parametrize("version", ["latest", "v", "1.5", "v-2"])
+def test_restore_rejects_bad_version_numbers(tmp_path, version):
+    ft = AgentFileToolbox(str(tmp_path))
+    ft.write("f.txt", "one")
+    ft.write("f.txt", "two")
+    assert ft.restore("f.txt", version).startswith(f"Error: invalid version {version!r}")
+    assert ft.restore("f.txt", "v1") == "Restored f.txt to version 1 (3 bytes)."
+    assert (tmp_path / "f.txt").read_text() == "one"
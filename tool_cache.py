@@ -0,0 +1,112 @@
+"""
+Session-scoped cache for tool results.
+
+Keyed on tool name + arguments. Only tools listed in `ttls` are cached:
+  * path tools (read, list) live until a call that may write the same path
+    (write, append, edit, mkdir, or anything like run_python that may touch
+    any file) invalidates them, and are also dropped if the file's mtime/size
+    changed behind our back,
+  * web tools (web_search, web_fetch) expire after their TTL in seconds.
+Error results are never cached. Entries are evicted least-recently-used once
+the cached results pass `max_bytes`.
+"""
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from tool_scheduler import access_sets, conflicts, EVERYTHING
+
+
+def _signature(paths):
+    """(mtime_ns, size) of each path, so edits made outside the agent's tools are noticed too."""
+    sig = []
+    for path in sorted(paths):
+        try:
+            st = os.stat(path)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append(None)
+    return sig
+
+
+class ToolCache:
+    def __init__(self, ttls, max_bytes=32 * 1024 * 1024, root="."):
+        self.ttls = ttls    # tool -> seconds, or None to keep until invalidated
+        self.max_bytes = max_bytes
+        self.root = root
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()    # key -> (result, access, signature, expires_at, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _key(self, name, args):
+        return name + "\0" + json.dumps([str(a) for a in args], ensure_ascii=False)
+
+    def _drop(self, key):
+        self.bytes -= self.entries.pop(key)[4]
+
+    def get(self, name, args):
+        """Cached result, or None on a miss."""
+        if name not in self.ttls:
+            return None
+        key = self._key(name, args)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                result, access, signature, expires_at, _ = entry
+                if (expires_at is None or time.monotonic() < expires_at) and signature == _signature(access[0]):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(self, name, args, result):
+        if name not in self.ttls or not isinstance(result, str) or result.lstrip().upper().startswith("ERROR"):
+            return
+        size = len(result.encode("utf-8"))
+        if size > self.max_bytes // 4:
+            return
+        access = access_sets({"name": name, "arguments": args}, self.root)
+        ttl = self.ttls[name]
+        key = self._key(name, args)
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (result, access, _signature(access[0]), None if ttl is None else time.monotonic() + ttl, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, call):
+        """Drops every entry that `call` may have changed. Call it after any tool that isn't served from the cache."""
+        if call.get("name") in self.ttls:
+            return
+        access = access_sets(call, self.root)
+        if access[1] is not EVERYTHING and not access[1]:
+            return
+        with self.lock:
+            stale = [key for key, entry in self.entries.items() if entry[1][0] and conflicts(entry[1], access)]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,233 @@
+"""
+Persistent tool worker pool.
+
+Each worker is a long-lived `python3 tool_pool.py <use_tools.py>` process that
+imports use_tools.py once and answers requests over its stdin/stdout pipes.
+Messages are length-prefixed JSON frames:
+
+    [4 bytes big-endian length][utf-8 JSON payload]
+
+    request : {"tool": "read", "args": ["a.txt"]}
+    response: {"output": "...", "code": 0, "tool_ms": 0.4, "rss_kb": 23100}
+
+A worker that crashes or hangs only takes its own call down with it; the pool
+kills it and starts a fresh one the next time a caller needs a worker.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import select
+import struct
+import threading
+import subprocess
+import importlib.util
+
+HEADER = struct.Struct(">I")
+PING = "__ping__"
+_FREE_SLOT = None   # queued in place of a retired worker: the next caller starts a new one
+
+
+class PoolExhausted(TimeoutError):
+    """No worker became free (or could be started) in time."""
+
+
+# ==========================================
+# FRAMING
+# ==========================================
+def send_frame(stream, obj):
+    payload = json.dumps(obj).encode("utf-8")
+    stream.write(HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+def _read_exact(fd, n, deadline=None):
+    buf = b""
+    while len(buf) < n:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("worker did not answer in time")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                raise TimeoutError("worker did not answer in time")
+        chunk = os.read(fd, n - len(buf))
+        if not chunk:
+            raise EOFError("worker pipe closed")
+        buf += chunk
+    return buf
+
+def recv_frame(fd, deadline=None):
+    (length,) = HEADER.unpack(_read_exact(fd, HEADER.size, deadline))
+    return json.loads(_read_exact(fd, length, deadline).decode("utf-8"))
+
+
+# ==========================================
+# WORKER SIDE
+# ==========================================
+def _rss_kb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def serve(tool_script):
+    # Keep the protocol pipe private: anything a tool prints goes to stderr instead.
+    proto_out = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    in_fd = sys.stdin.fileno()
+
+    spec = importlib.util.spec_from_file_location("use_tools", tool_script)
+    tools = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tools)
+    ft = tools.AgentFileToolbox()
+
+    while True:
+        try:
+            req = recv_frame(in_fd)
+        except EOFError:
+            return
+        t0 = time.perf_counter()
+        if req.get("tool") == PING:
+            output, code = "pong", 0
+        else:
+            output, code = tools.dispatch(str(req.get("tool")), [str(a) for a in req.get("args", [])], ft=ft)
+        send_frame(proto_out, {
+            "output": output,
+            "code": code,
+            "tool_ms": (time.perf_counter() - t0) * 1000,
+            "rss_kb": _rss_kb(),
+        })
+
+
+# ==========================================
+# POOL SIDE
+# ==========================================
+class ToolWorker:
+    def __init__(self, tool_script):
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), tool_script],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self.calls = 0
+        self.rss_kb = 0
+        self.last_used = time.monotonic()
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def call(self, tool_name, args, timeout):
+        send_frame(self.proc.stdin, {"tool": tool_name, "args": args})
+        resp = recv_frame(self.proc.stdout.fileno(), time.monotonic() + timeout)
+        self.calls += 1
+        self.rss_kb = resp.get("rss_kb", 0)
+        self.last_used = time.monotonic()
+        return resp
+
+    def kill(self):
+        try:
+            self.proc.kill()
+            self.proc.wait(timeout=5)
+        except Exception:
+            pass
+
+
+class ToolWorkerPool:
+    """
+    Fixed-size pool of ToolWorkers.
+    `warm` workers (default: all of them) start up front; the other slots start
+    theirs the first time every running worker is busy. Idle workers are reused
+    most-recently-used first, so a quiet pool doesn't grow past what it needs.
+    Workers are recycled after `max_calls` calls or once their RSS passes
+    `max_rss_mb`, killed on timeout, and pinged before reuse if they sat idle
+    longer than `health_check_after` seconds.
+    """
+    def __init__(self, tool_script, size=4, max_calls=200, max_rss_mb=512, health_check_after=30, warm=None):
+        self.tool_script = tool_script
+        self.size = size
+        self.max_calls = max_calls
+        self.max_rss_kb = max_rss_mb * 1024
+        self.health_check_after = health_check_after
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.workers = []
+        self.recycled = 0
+        warm = size if warm is None else min(warm, size)
+        # Free slots at the bottom, so they're only taken once no started worker is idle
+        for _ in range(size - warm):
+            self.idle.put(_FREE_SLOT)
+        for _ in range(warm):
+            self.idle.put(self._spawn())
+
+    def _spawn(self):
+        worker = ToolWorker(self.tool_script)
+        with self.lock:
+            self.workers.append(worker)
+        return worker
+
+    def _retire(self, worker):
+        """Kills the worker and frees its slot; the replacement is started lazily by _acquire."""
+        worker.kill()
+        with self.lock:
+            if worker in self.workers:
+                self.workers.remove(worker)
+            self.recycled += 1
+        self.idle.put(_FREE_SLOT)
+
+    def _healthy(self, worker):
+        if not worker.alive():
+            return False
+        if time.monotonic() - worker.last_used < self.health_check_after:
+            return True
+        try:
+            return worker.call(PING, [], timeout=5).get("output") == "pong"
+        except Exception:
+            return False
+
+    def _acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                worker = self.idle.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise PoolExhausted(f"no tool worker became free within {timeout}s")
+            if worker is _FREE_SLOT:
+                try:
+                    return self._spawn()
+                except Exception:
+                    self.idle.put(_FREE_SLOT)   # keep the slot for the next caller to retry
+                    raise
+            if self._healthy(worker):
+                return worker
+            self._retire(worker)
+
+    def call(self, tool_name, args, timeout=45, acquire_timeout=None):
+        """
+        Returns the worker's response dict. Raises TimeoutError / EOFError like a failed subprocess,
+        and PoolExhausted if no worker is free within acquire_timeout (default: timeout).
+        """
+        worker = self._acquire(timeout if acquire_timeout is None else acquire_timeout)
+        try:
+            resp = worker.call(tool_name, args, timeout)
+        except Exception:
+            self._retire(worker)
+            raise
+        if worker.calls >= self.max_calls or worker.rss_kb > self.max_rss_kb:
+            self._retire(worker)
+        else:
+            self.idle.put(worker)
+        return resp
+
+    def shutdown(self):
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.kill()
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "use_tools.py"))
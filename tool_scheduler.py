@@ -0,0 +1,288 @@
+"""
+Persistent tool scheduler with named pools.
+
+Every tool belongs to a pool (web_search, web_fetch, http, run_python, file, default).
+Each pool has its own concurrency limit and, optionally, a token-bucket rate limit,
+so a burst of 20 web_search calls queues locally at the provider's 5/s instead of
+getting throttled upstream, while file reads in the same turn are not held up.
+
+Pools keep their threads across steps. metrics() reports, per pool, the calls
+submitted/completed, the current and peak queue depth, and the queue wait
+(time spent waiting for a free slot plus a rate-limit token).
+
+Within one turn, TurnGraph orders calls that touch the same paths. Each call
+gets a read set and a write set; a call waits for every earlier call in the
+turn it conflicts with (write/write or read/write on the same path or on a
+parent directory) and runs in parallel with everything else. Tools whose
+file access can't be known up front (run_python, shell, ...) act as a barrier
+for file tools but not for web tools.
+"""
+import os
+import time
+import asyncio
+import threading
+import concurrent.futures
+
+DEFAULT_POOL = "default"
+
+# tool -> (index of the path argument, "read" | "write"); tools not listed touch no files
+PATH_ACCESS = {
+    "read": (0, "read"),
+    "list": (0, "read"),
+    "find": (0, "read"),
+    "write": (0, "write"),
+    "append": (0, "write"),
+    "edit": (0, "write"),
+    "multi_edit": (0, "write"),
+    "mkdir": (0, "write"),
+    "restore": (0, "write"),
+}
+# patch isn't listed: it touches whatever paths its diff names, so it's scheduled like run_python
+NO_FILE_ACCESS = {"web_search", "web_fetch", "http", "timestamp", "wait", "finish", "stop", "exit", "read_blob"}
+EVERYTHING = None   # read/write set of a tool that may touch any file
+
+
+class TokenBucket:
+    """`rate` tokens per second, up to `burst` saved up. Thread-safe."""
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Takes one token and returns how many seconds the caller must wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class ToolPool:
+    def __init__(self, name, concurrency=10, rate=None, burst=None):
+        self.name = name
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"tool-{name}")
+        self.lock = threading.Lock()
+        self.semaphores = {}    # per event loop, for the asyncio path
+        self.submitted = 0
+        self.completed = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _enqueued(self):
+        with self.lock:
+            self.submitted += 1
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+    def _started(self, enqueued_at):
+        waited = time.monotonic() - enqueued_at
+        with self.lock:
+            self.queued -= 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def _finished(self):
+        with self.lock:
+            self.completed += 1
+
+    def _dropped(self):
+        """A queued call that was cancelled before it started."""
+        with self.lock:
+            self.queued -= 1
+
+    def _run(self, enqueued_at, fn, args):
+        if self.bucket:
+            time.sleep(self.bucket.reserve())
+        self._started(enqueued_at)
+        try:
+            return fn(*args)
+        finally:
+            self._finished()
+
+    def submit(self, fn, *args):
+        self._enqueued()
+        future = self.executor.submit(self._run, time.monotonic(), fn, args)
+        future.add_done_callback(lambda f: self._dropped() if f.cancelled() else None)
+        return future
+
+    async def run_async(self, coro_fn, *args):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            semaphore = self.semaphores.setdefault(loop, asyncio.Semaphore(self.concurrency))
+        enqueued_at = time.monotonic()
+        self._enqueued()
+        started = False
+        try:
+            async with semaphore:
+                if self.bucket:
+                    await asyncio.sleep(self.bucket.reserve())
+                self._started(enqueued_at)
+                started = True
+                return await coro_fn(*args)
+        finally:
+            self._finished() if started else self._dropped()
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "queued": self.queued,
+                "max_queued": self.max_queued,
+                "wait_avg_ms": round(self.wait_total / self.submitted * 1000, 1) if self.submitted else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 1),
+            }
+
+
+class ToolScheduler:
+    """
+    config: {pool_name: {"tools": [...], "concurrency": n, "rate": per_sec, "burst": n}}.
+    Tools not listed in any pool go to the "default" pool.
+    """
+    def __init__(self, config):
+        self.pools = {}
+        self.tool_to_pool = {}
+        for name, spec in config.items():
+            self.pools[name] = ToolPool(name, spec.get("concurrency", 10), spec.get("rate"), spec.get("burst"))
+            for tool in spec.get("tools", []):
+                self.tool_to_pool[tool] = name
+        if DEFAULT_POOL not in self.pools:
+            self.pools[DEFAULT_POOL] = ToolPool(DEFAULT_POOL)
+
+    def pool_for(self, tool_name):
+        return self.pools[self.tool_to_pool.get(tool_name, DEFAULT_POOL)]
+
+    def submit(self, tool_name, fn, *args):
+        return self.pool_for(tool_name).submit(fn, *args)
+
+    async def run_async(self, tool_name, coro_fn, *args):
+        return await self.pool_for(tool_name).run_async(coro_fn, *args)
+
+    def metrics(self):
+        return {name: pool.metrics() for name, pool in self.pools.items() if pool.submitted}
+
+    def shutdown(self, wait=False):
+        for pool in self.pools.values():
+            pool.executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# ==========================================
+# PER-TURN DEPENDENCIES
+# ==========================================
+def access_sets(call, root="."):
+    """(reads, writes) as sets of absolute paths; EVERYTHING for tools that may touch any file."""
+    name = call.get("name")
+    args = call.get("arguments") or []
+    if name in NO_FILE_ACCESS:
+        return set(), set()
+    if name not in PATH_ACCESS:
+        return EVERYTHING, EVERYTHING
+    index, mode = PATH_ACCESS[name]
+    path = str(args[index]) if len(args) > index else "."
+    paths = {os.path.normpath(os.path.join(os.path.abspath(root), path))}
+    return (paths, set()) if mode == "read" else (set(), paths)
+
+def _overlap(a, b):
+    if a is EVERYTHING:
+        return b is EVERYTHING or bool(b)
+    if b is EVERYTHING:
+        return bool(a)
+    for x in a:
+        for y in b:
+            if x == y or x.startswith(y.rstrip(os.sep) + os.sep) or y.startswith(x.rstrip(os.sep) + os.sep):
+                return True
+    return False
+
+def conflicts(first, second):
+    (r1, w1), (r2, w2) = first, second
+    return _overlap(w1, w2) or _overlap(w1, r2) or _overlap(r1, w2)
+
+
+class TurnGraph:
+    """
+    Dependency DAG for the tool calls of one turn, built as calls arrive.
+    add(call, make) calls make(deps) with the handles of the earlier calls this
+    one must wait for, and remembers the handle it returns.
+    """
+    def __init__(self, root="."):
+        self.root = root
+        self.nodes = []     # (access, handle) in call order
+
+    def add(self, call, make):
+        access = access_sets(call, self.root)
+        deps = [handle for earlier, handle in self.nodes if conflicts(earlier, access)]
+        handle = make(deps)
+        self.nodes.append((access, handle))
+        return handle
+
+    def carry(self, call, handle):
+        """Registers a call still running from an earlier turn, so conflicting calls in this turn wait for it."""
+        self.nodes.append((access_sets(call, self.root), handle))
+
+
+class _Deferred(concurrent.futures.Future):
+    """
+    Stands in for a call that is still waiting on its dependencies. Once the real
+    call is queued, cancel() is passed on to it and, like Future.cancel(), fails
+    once it is running.
+    """
+    def __init__(self):
+        super().__init__()
+        self.inner = None
+        self.handover = threading.RLock()
+
+    def cancel(self):
+        with self.handover:
+            if self.inner is None:
+                return super().cancel()
+        return self.inner.cancel()      # relay() cancels this one too if it worked
+
+def run_after(deps, start):
+    """
+    Future for start(), which is called (and returns a Future) once every future
+    in `deps` is done. Nothing blocks a pool thread while waiting.
+    """
+    if not deps:
+        return start()
+    outer = _Deferred()
+    remaining = [len(deps)]
+    lock = threading.Lock()
+
+    def relay(inner):
+        if inner.cancelled():
+            concurrent.futures.Future.cancel(outer)
+        elif outer.set_running_or_notify_cancel():
+            if inner.exception() is not None:
+                outer.set_exception(inner.exception())
+            else:
+                outer.set_result(inner.result())
+
+    def dep_done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        with outer.handover:
+            if outer.cancelled():
+                return
+            try:
+                inner = start()
+            except Exception as e:
+                # e.g. the pool was shut down while this call waited on its dependencies
+                if outer.set_running_or_notify_cancel():
+                    outer.set_exception(e)
+                return
+            outer.inner = inner
+        inner.add_done_callback(relay)
+
+    for dep in deps:
+        dep.add_done_callback(dep_done)
+    return outer
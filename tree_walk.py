@@ -0,0 +1,150 @@
+"""
+Recursive directory listing for the `find` tool.
+
+Built on os.scandir: whether an entry is a directory comes from the dirent
+type the kernel already returned, so a walk costs one getdents per directory
+and no stat per entry. Entries are only stat()ed when their size or mtime is
+shown or sorted on, which for the default name order means only the page
+being returned.
+
+Pages are addressed by an opaque cursor holding the sort key of the last
+entry shown, not an offset, so files appearing or disappearing between calls
+don't shift or repeat entries. In name order the walk is depth-first with
+each directory sorted, which is the same order as comparing path component
+tuples; resuming after a cursor skips every subtree that lies wholly before
+it without reading it, and the walk stops as soon as the page is full.
+Size and mtime order need every match, so they walk (and stat) the whole
+filtered tree, keeping only the top page.
+"""
+import os
+import json
+import heapq
+import base64
+from fnmatch import fnmatchcase
+
+# Tool state and dependency trees nobody wants in a listing; ignore=none lists everything
+DEFAULT_IGNORE = (".git", "node_modules", "__pycache__", ".venv", ".versions", ".line_index", "blobs")
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 2000
+SORTS = ("name", "size", "mtime")       # size and mtime are largest / newest first
+
+
+class Entry:
+    __slots__ = ("parts", "dirent", "is_dir", "_stat")
+
+    def __init__(self, parts, dirent, is_dir):
+        self.parts = parts          # path components relative to the walk root
+        self.dirent = dirent
+        self.is_dir = is_dir
+        self._stat = None
+
+    @property
+    def path(self):
+        return "/".join(self.parts)
+
+    def stat(self):
+        """lstat of the entry (None if it vanished); one syscall, then cached."""
+        if self._stat is None:
+            try:
+                self._stat = self.dirent.stat(follow_symlinks=False)
+            except OSError:
+                self._stat = False
+        return self._stat or None
+
+    @property
+    def size(self):
+        st = self.stat()
+        return st.st_size if st and not self.is_dir else 0
+
+    @property
+    def mtime_ns(self):
+        st = self.stat()
+        return st.st_mtime_ns if st else 0
+
+
+def walk(root, ignore=DEFAULT_IGNORE, max_depth=None, after=None):
+    """
+    Depth-first Entries under root, each directory in name order. Names matching
+    an `ignore` glob are skipped with their subtrees; symlinked directories are
+    listed but not followed. With `after` (a parts tuple), starts right after it.
+    """
+    def scan(parts, directory):
+        try:
+            with os.scandir(directory) as it:
+                dirents = sorted(it, key=lambda d: d.name)
+        except OSError:
+            return
+        for dirent in dirents:
+            if any(fnmatchcase(dirent.name, p) for p in ignore):
+                continue
+            rel = parts + (dirent.name,)
+            try:
+                is_dir = dirent.is_dir(follow_symlinks=False)
+            except OSError:
+                is_dir = False
+            if after is not None and rel <= after:
+                # Before the cursor; its subtree is too unless the cursor is inside it
+                if not (is_dir and after[:len(rel)] == rel):
+                    continue
+            else:
+                yield Entry(rel, dirent, is_dir)
+            if is_dir and (max_depth is None or len(rel) < max_depth):
+                yield from scan(rel, dirent.path)
+    return scan((), root)
+
+
+def _matches(entry, patterns, kind):
+    if kind == "f" and entry.is_dir or kind == "d" and not entry.is_dir:
+        return False
+    if not patterns:
+        return True
+    # A pattern with a slash matches the relative path, otherwise just the name
+    return any(fnmatchcase(entry.path if "/" in p else entry.parts[-1], p) for p in patterns)
+
+
+def _sort_key(entry, sort):
+    if sort == "size":
+        return [-entry.size, list(entry.parts)]
+    if sort == "mtime":
+        return [-entry.mtime_ns, list(entry.parts)]
+    return [list(entry.parts)]
+
+
+def encode_cursor(sort, key):
+    return base64.urlsafe_b64encode(json.dumps([sort, key]).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor, sort):
+    """The sort key a cursor points after. Raises ValueError if it's malformed or from another sort order."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("malformed cursor")
+    if cursor_sort != sort:
+        raise ValueError(f"cursor is for sort={cursor_sort}, not sort={sort}")
+    return key
+
+
+def find(root, patterns=(), ignore=DEFAULT_IGNORE, max_depth=None, kind=None, sort="name", limit=DEFAULT_LIMIT, cursor=None):
+    """
+    One page of matching Entries under root and the cursor of the next page (None on the last).
+    kind is "f" (files), "d" (directories) or None (both). Raises ValueError on a bad cursor.
+    """
+    after = decode_cursor(cursor, sort) if cursor else None
+    if sort == "name":
+        start = tuple(after[0]) if after else None
+        page = []
+        for entry in walk(root, ignore, max_depth, start):
+            if _matches(entry, patterns, kind):
+                page.append(entry)
+                if len(page) > limit:
+                    break
+    else:
+        keyed = [(_sort_key(e, sort), e) for e in walk(root, ignore, max_depth) if _matches(e, patterns, kind)]
+        if after is not None:
+            keyed = [item for item in keyed if item[0] > after]
+        page = [e for _, e in heapq.nsmallest(limit + 1, keyed, key=lambda item: item[0])]
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor(sort, _sort_key(page[-1], sort))
+    return page, None
@@ -2,7 +2,9 @@ import sys
 import os
 import subprocess
 import shlex
-import shutil
+import stat
+import ast
+import json
 import datetime
 import time
 import signal
@@ -11,6 +13,30 @@ from pathlib import Path
 import traceback
 import requests
 
+# Shared web cache directory, bind-mounted into every container by orchastrator.py (see http_cache.py)
+HTTP_CACHE_DIR = os.environ.get("AGENT_HTTP_CACHE", "/http_cache")
+WEB_SEARCH_CACHE_TTL = 3600
+WEB_FETCH_CACHE_TTL = 6 * 3600
+# Plain `read` of a bigger file returns a summary and the first lines instead of the whole file (see line_index.py)
+READ_FULL_MAX_BYTES = 1024 * 1024
+READ_DEFAULT_LINES = 200
+_http_cache = None
+
+def web_request(method, url, ttl, **kwargs):
+    """requests.request through the shared HTTP cache when it is mounted, straight upstream otherwise."""
+    global _http_cache
+    if _http_cache is None:
+        _http_cache = False
+        if os.path.isdir(HTTP_CACHE_DIR):
+            try:
+                from http_cache import HttpCache
+                _http_cache = HttpCache(HTTP_CACHE_DIR)
+            except Exception as e:
+                print(f"[DEBUG] http cache disabled: {e}", file=sys.stderr)
+    if _http_cache:
+        return _http_cache.request(method, url, ttl=ttl, **kwargs)
+    return requests.request(method, url, **kwargs)
+
 def parse_xml_args(args):
     """Extract values from XML-style tags like <path>val</path>"""
     parsed = []
@@ -50,12 +76,31 @@ class AgentFirewall:
             return f"System Error: {str(e)}"
 
 # --- AGENT FILE TOOLBOX CLASS ---
+COPY_BLOCK = 1024 * 1024
+def _temp_beside(target: Path):
+    """
+    Empty temp file in target's directory (so os.replace onto target is atomic) with target's
+    permissions, or those open() would give a new file: it's created 0666 and the kernel
+    applies the umask (mkstemp's would be 0600)
+    """
+    while True:
+        tmp = str(target.parent / f".{target.name}.tmp-{os.urandom(6).hex()}")
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            break
+        except FileExistsError:
+            continue
+    os.close(fd)
+    if target.exists():
+        os.chmod(tmp, stat.S_IMODE(target.stat().st_mode))
+    return tmp
+
 class AgentFileToolbox:
     def __init__(self, workspace_root: str = "."):
+        from version_store import VersionStore, STORE_DIR
         self.root = Path(workspace_root).resolve()
-        self.trash_dir = self.root / "deleted-modified"
         self.root.mkdir(parents=True, exist_ok=True)
-        self.trash_dir.mkdir(parents=True, exist_ok=True)
+        self.versions = VersionStore(self.root / STORE_DIR)
 
     def _safe_path(self, target_path: str) -> Path:
         resolved = (self.root / target_path).resolve()
@@ -63,23 +108,56 @@ class AgentFileToolbox:
             raise PermissionError("Access Denied: Path outside workspace.")
         return resolved
 
-    def _move_to_trash(self, path: Path):
-        if path.exists() and path != self.trash_dir:
-            ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            shutil.move(str(path), str(self.trash_dir / f"{path.name}_{ts}"))
+    def _save_version(self, path: Path, reason: str):
+        """Keeps the current content in the version store before it's overwritten (see version_store.py)"""
+        if path.is_file():
+            self.versions.save(str(path.relative_to(self.root)), path, reason)
 
     def mkdir(self, path: str):
         self._safe_path(path).mkdir(parents=True, exist_ok=True)
         return f"Created directory: {path}"
 
-    def read(self, path: str):
+    def read(self, path: str, mode: str = None, a: str = None, b: str = None):
+        """
+        Whole file, or a range served through mmap + a cached line index:
+        lines <start> [end] | bytes <offset> [length] | head [n] | tail [n] | wc
+        ("<start>-<end>" alone is short for lines).
+        """
+        import line_index
         target = self._safe_path(path)
         print(f"[DEBUG] reading: {target}", file=sys.stderr)
-        return target.read_text(encoding='utf-8') if target.is_file() else "Error: Not found."
+        if not target.is_file():
+            return "Error: Not found."
+        index_dir = str(self.root / ".line_index")
+        if mode and re.match(r"^\d+(-\d+)?$", mode):
+            mode, a, b = ("lines", *mode.split("-"), None)[:3]
+        if mode is None:
+            if target.stat().st_size <= READ_FULL_MAX_BYTES:
+                return target.read_text(encoding='utf-8')
+            return (f"[{path} is too large to read at once: {line_index.summary(target, index_dir)}. "
+                    f"Use read {path} lines <start> <end> | bytes <offset> <length> | head <n> | tail <n>.]\n"
+                    + line_index.head(target, READ_DEFAULT_LINES, index_dir))
+        try:
+            if mode == "lines":
+                start = int(a or 1)
+                end = int(b) if b is not None else start + READ_DEFAULT_LINES - 1
+                return line_index.read_lines(target, start, end, index_dir)
+            if mode == "bytes":
+                return line_index.read_bytes(target, int(a or 0), int(b) if b is not None else line_index.MAX_READ_BYTES)
+            if mode == "head":
+                return line_index.head(target, int(a or 50), index_dir)
+            if mode == "tail":
+                return line_index.tail(target, int(a or 50), index_dir)
+        except ValueError:
+            usage = {"lines": "lines <start> [end]", "bytes": "bytes <offset> [length]", "head": "head [n]", "tail": "tail [n]"}[mode]
+            return f"Error: read {path} {usage} takes whole numbers, got {' '.join(str(x) for x in (a, b) if x is not None)}."
+        if mode == "wc":
+            return f"{path}: {line_index.summary(target, index_dir)}"
+        return f"Error: Unknown read mode '{mode}'. Use lines, bytes, head, tail or wc."
 
     def write(self, path: str, content: str):
         target = self._safe_path(path)
-        if target.exists(): self._move_to_trash(target)
+        self._save_version(target, "write")
         target.write_text(content, encoding='utf-8')
         return f"Written: {path}"
 
@@ -96,47 +174,301 @@ class AgentFileToolbox:
         if not target.is_dir():
             return f"Error: {path} is not a directory"
         items = []
-        for item in target.iterdir():
-            item_type = "DIR" if item.is_dir() else "FILE"
-            size = item.stat().st_size if item.is_file() else "-"
-            items.append(f"{item_type:6} {size:>10} {item.name}")
+        # scandir's cached dirent types save the is_dir()/is_file() stats; only files get one
+        with os.scandir(target) as entries:
+            for entry in entries:
+                is_dir = entry.is_dir()
+                item_type = "DIR" if is_dir else "FILE"
+                size = entry.stat().st_size if not is_dir and entry.is_file() else "-"
+                items.append(f"{item_type:6} {size:>10} {entry.name}")
         return "\n".join(items) if items else "(empty directory)"
 
+    def find(self, path: str = ".", options: str = ""):
+        """
+        Recursive listing (see tree_walk.py). options are key=value pairs:
+        pattern=<glob>[,<glob>] ignore=<glob>,...|none depth=<n> type=f|d
+        sort=name|size|mtime limit=<n> cursor=<from the previous page>
+        """
+        import tree_walk
+        target = self._safe_path(path)
+        if not target.is_dir():
+            return f"Error: {path} is not a directory"
+        try:
+            opts = dict(o.split("=", 1) for o in shlex.split(options or ""))
+        except ValueError:
+            return "Error: find options are key=value pairs, e.g. pattern=*.py depth=2 sort=size"
+        unknown = set(opts) - {"pattern", "ignore", "depth", "type", "sort", "limit", "cursor"}
+        if unknown:
+            return f"Error: Unknown find option(s): {', '.join(sorted(unknown))}"
+        patterns = [p for p in opts.get("pattern", "").split(",") if p]
+        if "ignore" in opts:
+            ignore = [p for p in opts["ignore"].split(",") if p and p != "none"]
+        else:
+            ignore = tree_walk.DEFAULT_IGNORE
+        kind = opts.get("type") or None
+        sort = opts.get("sort", "name")
+        if kind not in (None, "f", "d"):
+            return "Error: type must be f or d"
+        if sort not in tree_walk.SORTS:
+            return f"Error: sort must be one of {', '.join(tree_walk.SORTS)}"
+        try:
+            depth = int(opts["depth"]) if "depth" in opts else None
+            limit = min(max(1, int(opts.get("limit", tree_walk.DEFAULT_LIMIT))), tree_walk.MAX_LIMIT)
+        except ValueError:
+            return "Error: depth and limit must be integers"
+        try:
+            page, cursor = tree_walk.find(str(target), patterns, ignore, depth, kind, sort, limit, opts.get("cursor"))
+        except ValueError as e:
+            return f"Error: {e}"
+        if not page:
+            return "(no matches)" if not opts.get("cursor") else "(no more matches)"
+        # Workspace-relative paths, so they can go straight into read/edit
+        prefix = "" if target == self.root else str(target.relative_to(self.root)) + "/"
+        lines = []
+        for entry in page:
+            item_type = "DIR" if entry.is_dir else "LINK" if entry.dirent.is_symlink() else "FILE"
+            size = "-" if entry.is_dir else entry.size
+            mtime = datetime.datetime.fromtimestamp(entry.mtime_ns / 1e9).strftime("%Y-%m-%d %H:%M")
+            lines.append(f"{item_type:6} {size:>10} {mtime} {prefix}{entry.path}{'/' if entry.is_dir else ''}")
+        if cursor:
+            rest = " ".join(shlex.quote(f"{k}={v}") for k, v in opts.items() if k != "cursor")
+            lines.append(f"[{len(page)} shown, more remain: find {shlex.quote(path)} {rest + ' ' if rest else ''}cursor={cursor}]")
+        return "\n".join(lines)
+
     def edit_file(self, path: str, old_string: str, new_string: str, occurrence: int = 1):
         """
         Search and replace in file. 
         occurrence: which match to replace (1=first, -1=all)
         """
+        return self._edit(path, [(old_string, new_string, occurrence)])
+
+    def multi_edit(self, path: str, edits: str):
+        """
+        Several search/replace edits to one file in one pass. edits is a JSON list of
+        {"old": ..., "new": ..., "occurrence": n} (or [old, new, n]); every edit matches
+        against the file as it was before the call, and either all apply or none.
+        """
+        try:
+            parsed = json.loads(edits)
+        except ValueError:
+            try:
+                parsed = ast.literal_eval(edits)
+            except (ValueError, SyntaxError):
+                return "Error: edits must be a JSON list of {\"old\", \"new\", \"occurrence\"} objects"
+        if isinstance(parsed, dict):
+            parsed = [parsed]
+        batch = []
+        for edit in parsed if isinstance(parsed, list) else []:
+            if isinstance(edit, dict) and "old" in edit and "new" in edit:
+                batch.append((edit["old"], edit["new"], edit.get("occurrence", 1)))
+            elif isinstance(edit, (list, tuple)) and len(edit) in (2, 3):
+                batch.append(tuple(edit) + ((1,) if len(edit) == 2 else ()))
+            else:
+                return f"Error: Can't read edit {edit!r}; use {{\"old\": ..., \"new\": ..., \"occurrence\": 1}}"
+        if not batch:
+            return "Error: No edits given"
+        return self._edit(path, batch)
+
+    def _edit(self, path: str, edits):
+        """
+        Finds every edit's matches in one read-only mmap of the file, then streams the
+        file with the replacements into a temp file that atomically replaces it, so the
+        file is never missing or half-written. The previous content goes to the version
+        store in READ_BLOCK pieces, so peak memory is a few MB whatever the file size.
+        """
+        import line_index
         target = self._safe_path(path)
         if not target.is_file():
             return f"Error: File {path} not found"
-        
-        content = target.read_text(encoding='utf-8')
-        
-        if occurrence == -1:
-            # Replace all occurrences
-            new_content = content.replace(old_string, new_string)
-            count = content.count(old_string)
-            if count == 0:
-                return f"Error: Pattern not found in {path}"
-        else:
-            # Replace specific occurrence
-            parts = content.split(old_string)
-            if len(parts) <= occurrence:
-                return f"Error: Only {len(parts)-1} occurrences found, requested #{occurrence}"
-            new_content = old_string.join(parts[:occurrence]) + new_string + old_string.join(parts[occurrence:])
-            count = 1
-        
+
+        spans, errors, count = [], [], 0
+        with line_index.map_file(target) as mm:
+            crlf = mm.find(b"\r\n") >= 0
+            for number, (old, new, occurrence) in enumerate(edits, 1):
+                label = f"edit {number}: " if len(edits) > 1 else ""
+                old, new, occurrence = str(old), str(new), int(occurrence)
+                if crlf and "\r" not in old:
+                    # read shows CRLF files with plain newlines; keep the file's line endings
+                    old, new = old.replace("\n", "\r\n"), new.replace("\n", "\r\n")
+                if not old:
+                    errors.append(f"{label}Empty search string")
+                    continue
+                if occurrence == 0 or occurrence < -1:
+                    errors.append(f"{label}occurrence must be 1, 2, ... or -1 for all")
+                    continue
+                old_bytes, new_bytes = old.encode("utf-8"), new.encode("utf-8")
+                matches, pos = [], 0
+                while occurrence == -1 or len(matches) < occurrence:
+                    found = mm.find(old_bytes, pos)
+                    if found < 0:
+                        break
+                    matches.append(found)
+                    pos = found + len(old_bytes)
+                if occurrence == -1 and not matches:
+                    errors.append(f"{label}Pattern not found in {path}")
+                elif occurrence != -1 and len(matches) < occurrence:
+                    errors.append(f"{label}Only {len(matches)} occurrences found, requested #{occurrence}")
+                else:
+                    chosen = matches if occurrence == -1 else matches[-1:]
+                    spans.extend((start, start + len(old_bytes), new_bytes, number) for start in chosen)
+                    count += len(chosen)
+            spans.sort()
+            for (_, end, _, first), (start, _, _, second) in zip(spans, spans[1:]):
+                if start < end:
+                    errors.append(f"edits {first} and {second} overlap")
+                    break
+            if errors:
+                if len(edits) == 1:
+                    return f"Error: {errors[0]}"
+                return f"Error: No changes made to {path}:\n" + "\n".join(f"  {e}" for e in errors)
+            tmp = _temp_beside(target)
+            try:
+                with open(tmp, "wb") as f:
+                    pos = 0
+                    for start, end, new_bytes, _ in spans + [(len(mm), len(mm), b"", 0)]:
+                        for block in range(pos, start, COPY_BLOCK):
+                            f.write(mm[block:min(start, block + COPY_BLOCK)])
+                        f.write(new_bytes)
+                        pos = end
+            except BaseException:
+                os.remove(tmp)
+                raise
+
         # Backup before edit
-        self._move_to_trash(target)
-        target.write_text(new_content, encoding='utf-8')
-        
+        self._save_version(target, "edit")
+        os.replace(tmp, target)
+        if len(edits) > 1:
+            return f"Edited {path}: applied {len(edits)} edits, replaced {count} occurrence(s)"
         return f"Edited {path}: replaced {count} occurrence(s)"
 
+    def patch(self, diff: str):
+        """
+        Applies a unified diff (any number of files and hunks, fuzzy context matching, see
+        diff_patch.py) all or nothing: every hunk of every file is matched before anything
+        is written, and a failure while replacing files puts the earlier ones back.
+        """
+        import diff_patch
+        try:
+            file_patches = diff_patch.parse(diff)
+        except diff_patch.PatchError as e:
+            return f"Error: {e}"
+        merged = {}
+        for fp in file_patches:
+            key = (fp.old_path, fp.new_path)
+            if key in merged:
+                merged[key].hunks.extend(fp.hunks)
+            else:
+                merged[key] = fp
+
+        staged, report, failures = [], [], []    # staged: (source, target, new content)
+        for fp in merged.values():
+            fp.hunks.sort(key=lambda h: h.old_start)
+            source = self._safe_path(fp.old_path) if fp.old_path else None
+            target = self._safe_path(fp.new_path) if fp.new_path else None
+            if source is None:
+                if target.exists() and target.stat().st_size:
+                    failures.append(f"  {fp.path}: FAILED, the diff creates it but it already exists")
+                    continue
+                content = ""
+            elif not source.is_file():
+                failures.append(f"  {fp.path}: FAILED, file not found")
+                continue
+            else:
+                with open(source, "r", encoding="utf-8", newline="") as f:
+                    content = f.read()
+            try:
+                new_content, statuses = diff_patch.apply(content, fp.hunks)
+            except diff_patch.PatchError as e:
+                failures.append(f"  {fp.path}:\n" + "\n".join(f"    {line}" for line in str(e).splitlines()))
+                continue
+            if target is None and new_content.strip():
+                failures.append(f"  {fp.path}: FAILED, the diff deletes it but doesn't remove all of its lines")
+                continue
+            staged.append((source, target, new_content))
+            action = ("created" if source is None else "deleted" if target is None
+                      else f"renamed from {fp.old_path}" if source != target else "patched")
+            report.append(f"  {fp.path}: {action}" + (f"; {', '.join(statuses)}" if statuses else ""))
+        if failures:
+            return "Error: Patch not applied, no files changed:\n" + "\n".join(failures + [f"{r} (would apply)" for r in report])
+
+        temps = []
+        try:
+            for _, target, new_content in staged:
+                tmp = None
+                if target is not None:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = _temp_beside(target)
+                    with open(tmp, "w", encoding="utf-8", newline="") as f:
+                        f.write(new_content)
+                temps.append(tmp)
+        except BaseException:
+            for tmp in temps:
+                if tmp:
+                    os.remove(tmp)
+            raise
+
+        originals = {}
+        for source, target, _ in staged:
+            for path in (source, target):
+                if path is not None and path not in originals:
+                    originals[path] = path.read_bytes() if path.is_file() else None
+                    self._save_version(path, "patch")
+        try:
+            for (source, target, _), tmp in zip(staged, temps):
+                if target is not None:
+                    os.replace(tmp, target)
+                if source is not None and source != target:
+                    source.unlink()
+        except BaseException:
+            for path, data in originals.items():
+                if data is None:
+                    path.unlink(missing_ok=True)
+                else:
+                    path.write_bytes(data)
+            for tmp in temps:
+                if tmp and os.path.exists(tmp):
+                    os.remove(tmp)
+            raise
+        return f"Patched {len(staged)} file(s):\n" + "\n".join(report)
+
+    def restore(self, path: str, version: str = None):
+        """Lists the saved versions of a file, or restores one (the current content is saved first, so it can be undone)"""
+        target = self._safe_path(path)
+        rel = str(target.relative_to(self.root))
+        versions = self.versions.versions(rel)
+        if version is None or str(version).strip() == "":
+            if not versions:
+                return f"No saved versions of {path}."
+            lines = [f"v{v['version']:<4} {datetime.datetime.fromtimestamp(v['ts']).strftime('%Y-%m-%d %H:%M:%S')} {v['size']:>10} bytes  before {v['reason']}"
+                     for v in reversed(versions)]
+            return f"Saved versions of {path} (newest first):\n" + "\n".join(lines)
+        digits = str(version).strip().lstrip("vV")
+        if not digits.isdigit():
+            return f"Error: invalid version {version!r}; use a number from the list, e.g. restore {path} v3. Run restore {path} to list versions."
+        number = int(digits)
+        data = self.versions.content(rel, number)
+        if data is None:
+            return f"Error: Version {version} of {path} not found. Run restore {path} to list versions."
+        self._save_version(target, "restore")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _temp_beside(target)
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+        return f"Restored {path} to version {number} ({len(data)} bytes)."
+
+    def read_blob(self, blob_id: str, offset: int = 0, length: int = None):
+        """Byte range of an output the wrapper spilled to blobs/ (see blob_store.py)"""
+        import blob_store
+        length = blob_store.MAX_READ_BYTES if length is None else length
+        return blob_store.read_range(blob_id, offset, length, str(self.root / blob_store.BLOB_DIR))
+
     def web_search(self, query: str, num_results: int = 5):
         try:
-            r = requests.get(
+            r = web_request(
+                "GET",
                 "http://gediz-serp:8001/search",
+                WEB_SEARCH_CACHE_TTL,
                 params={"q": query, "num_results": num_results},
                 timeout=15,
             )
@@ -149,8 +481,10 @@ class AgentFileToolbox:
         if ".pdf" in url[-5:]:
             return "Error: You should not fetch .pdf urls via web_fetch tool. Use pdf_fetch if available."
         try:
-            r = requests.post(
+            r = web_request(
+                "POST",
                 "http://gediz-fetcher:8002/fetch",
+                WEB_FETCH_CACHE_TTL,
                 json={
                     "url": url,
                     "extract_mode": "text",
@@ -252,9 +586,7 @@ def apt_install(packages: str):
 
 
 # --- CLI DISPATCHER ---
-def main():
-    if len(sys.argv) < 2:
-        print("""Usage: python3 use_tools.py <tool_name> <args...>
+USAGE = """Usage: python3 use_tools.py <tool_name> <args...>
 
 Available tools:
   Flow Control:
@@ -270,12 +602,19 @@ Available tools:
     shell <command>             - Run allowed shell command
   
   File Operations:
-    read <path>                 - Read file contents
+    read <path> [mode] [a] [b]  - Read file contents; modes: lines <start> [end],
+                                  bytes <offset> [len], head [n], tail [n], wc
     write <path> <content>      - Write/overwrite file
     append <path> <content>     - Append to file
     mkdir <path>                - Create directory
     list <path>                 - List directory contents
+    find <path> [key=value ...] - Recursive listing; pattern= ignore= depth= type=f|d
+                                  sort=name|size|mtime limit= cursor=
     edit <path> <old> <new> [n] - Search/replace in file (n=occurrence, -1=all)
+    multi_edit <path> <edits>   - Several edits in one pass; edits = JSON list of {"old","new","occurrence"}
+    patch <unified diff>        - Apply a multi-file unified diff, all or nothing
+    restore <path> [version]    - List a file's saved versions, or restore one
+    read_blob <id> [offset] [len] - Read a byte range of a spilled tool output
   
   Web:
     web_search <query> [num]    - Search web
@@ -287,116 +626,151 @@ Available tools:
     run_python <script.py>      - Execute Python script
     pip_install <packages>      - Install pip packages
     apt-install                 - Installs system packages
-""")
-        return
+"""
 
-    tool_name = sys.argv[1]
-    raw_args = sys.argv[2:]
-    args=raw_args
-    #args = parse_xml_args(raw_args)  
-
-    # Debug output to stderr so it doesn't interfere with tool output
-    print(f"[DEBUG] tool_name: {tool_name}", file=sys.stderr)
-    print(f"[DEBUG] raw_args: {raw_args}", file=sys.stderr)
-    print(f"[DEBUG] parsed args: {args}", file=sys.stderr)
+FT_TOOLS = ["read", "write", "append", "mkdir", "list", "find", "edit", "multi_edit", "patch", "restore", "read_blob",
+            "web_search", "web_fetch", "http"]
 
 
+def dispatch(tool_name, args, ft=None):
+    """
+    Runs one tool and returns (output, exit_code) instead of printing.
+    Shared by the CLI below and by wrapper.py's in-process mode, so both
+    paths stay byte-for-byte identical. Pass a long-lived `ft` to skip
+    rebuilding AgentFileToolbox on every call.
+    """
     try:
         # --- Flow Tools ---
         if tool_name == "wait":
             sec = int(args[0]) if len(args) >= 1 else 1
             time.sleep(sec)
-            print(f"Waited {sec} seconds.")
+            return f"Waited {sec} seconds.", 0
             
         elif tool_name == "stop":
-            print("STOP_SIGNAL: Stopping current wrapper.py run.")
-            sys.exit(10)
+            return "STOP_SIGNAL: Stopping current wrapper.py run.", 10
             
         elif tool_name == "exit":
-            print("EXIT_SIGNAL: Exiting the current container entirely.")
             try:
                 os.kill(1, signal.SIGTERM)
             except Exception:
                 pass
-            sys.exit(11) 
+            return "EXIT_SIGNAL: Exiting the current container entirely.", 11
 
         elif tool_name == "finish":
             final_message = " ".join(args) if args else "Task completed successfully."
-            print(f"FINISH_SIGNAL: {final_message}")
-            sys.exit(0)
+            return f"FINISH_SIGNAL: {final_message}", 0
 
         # --- Info Tools ---
         elif tool_name == "timestamp":
-            print(get_current_time_stamp())
+            return get_current_time_stamp(), 0
 
         # --- Firewall Tool ---
         elif tool_name == "shell":
             fw = AgentFirewall()
-            print(fw.execute(" ".join(args)))
+            return fw.execute(" ".join(args)), 0
 
         # --- File + Web Tools ---
-        elif tool_name in ["read", "write", "append", "mkdir", "list", "edit", 
-                          "web_search", "web_fetch", "http"]:
-            ft = AgentFileToolbox()
+        elif tool_name in FT_TOOLS:
+            ft = ft or AgentFileToolbox()
 
             if tool_name == "read" and len(args) >= 1:
-                print(ft.read(args[0]))
+                return ft.read(*args[:4]), 0
 
             elif tool_name == "write" and len(args) >= 2:
-                print(ft.write(args[0], " ".join(args[1:])))
+                return ft.write(args[0], " ".join(args[1:])), 0
 
             elif tool_name == "append" and len(args) >= 2:
-                print(ft.append(args[0], " ".join(args[1:])))
+                return ft.append(args[0], " ".join(args[1:])), 0
 
             elif tool_name == "mkdir" and len(args) >= 1:
-                print(ft.mkdir(args[0]))
+                return ft.mkdir(args[0]), 0
 
             elif tool_name == "list":
-                print(ft.list_dir(args[0] if args else "."))
+                return ft.list_dir(args[0] if args else "."), 0
+
+            elif tool_name == "find":
+                return ft.find(args[0] if args else ".", " ".join(args[1:])), 0
 
             elif tool_name == "edit" and len(args) >= 3:
                 # edit <path> <old> <new> [occurrence]
                 occ = int(args[3]) if len(args) >= 4 else 1
-                print(ft.edit_file(args[0], args[1], args[2], occ))
+                return ft.edit_file(args[0], args[1], args[2], occ), 0
+
+            elif tool_name == "multi_edit" and len(args) >= 2:
+                return ft.multi_edit(args[0], args[1]), 0
+
+            elif tool_name == "patch" and len(args) >= 1:
+                return ft.patch(" ".join(args)), 0
+
+            elif tool_name == "restore" and len(args) >= 1:
+                return ft.restore(args[0], args[1] if len(args) >= 2 else None), 0
+
+            elif tool_name == "read_blob" and len(args) >= 1:
+                offset = int(args[1]) if len(args) >= 2 else 0
+                length = int(args[2]) if len(args) >= 3 else None
+                return ft.read_blob(args[0], offset, length), 0
 
             elif tool_name == "web_search" and len(args) >= 1:
                 num = int(args[1]) if len(args) >= 2 else 5
-                print(ft.web_search(args[0], num))
+                return ft.web_search(args[0], num), 0
 
             elif tool_name == "web_fetch" and len(args) >= 1:
                 maxc = int(args[1]) if len(args) >= 2 else 2000
-                print(ft.web_fetch(args[0], maxc))
+                return ft.web_fetch(args[0], maxc), 0
 
             elif tool_name == "http" and len(args) >= 2:
                 # http <method> <url> [data] [headers]
                 data = args[2] if len(args) >= 3 else None
                 headers = args[3] if len(args) >= 4 else None
-                print(ft.http_request(args[0], args[1], data, headers))
+                return ft.http_request(args[0], args[1], data, headers), 0
 
             else:
-                print(f"Error: Missing arguments for {tool_name}")
+                return f"Error: Missing arguments for {tool_name}", 0
 
         # --- Execution Tools ---
         elif tool_name == "run_shell" and len(args) >= 1:
-            print(run_shell(args[0]))
+            return run_shell(args[0]), 0
 
         elif tool_name == "run_python" and len(args) >= 1:
-            print(run_python(args[0]))
+            return run_python(args[0]), 0
 
         elif tool_name == "pip_install" and len(args) >= 1:
-            print(pip_install(" ".join(args)))
+            return pip_install(" ".join(args)), 0
 
         elif tool_name == "apt_install" and len(args) >= 1:
-            print(apt_install(" ".join(args)))
+            return apt_install(" ".join(args)), 0
 
         else:
-            print(f"Error: Tool '{tool_name}' not recognized or missing arguments.")
+            return f"Error: Tool '{tool_name}' not recognized or missing arguments.", 0
 
     except Exception as e:
         tb = traceback.format_exc().splitlines()
         tail = "\n".join(tb[-20:])[-2000:]
-        print(f"TOOL_ERROR: {type(e).__name__}: {e}\n{tail}")
-        sys.exit(1)
+        return f"TOOL_ERROR: {type(e).__name__}: {e}\n{tail}", 1
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(USAGE)
+        return
+
+    tool_name = sys.argv[1]
+    raw_args = sys.argv[2:]
+    args=raw_args
+    #args = parse_xml_args(raw_args)  
+
+    # Debug output to stderr so it doesn't interfere with tool output
+    print(f"[DEBUG] tool_name: {tool_name}", file=sys.stderr)
+    print(f"[DEBUG] raw_args: {raw_args}", file=sys.stderr)
+    print(f"[DEBUG] parsed args: {args}", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    output, code = dispatch(tool_name, args)
+    # wrapper.py subtracts this from its own wall time to report spawn overhead
+    print(f"[TIMING] tool_ms={(time.perf_counter() - t0) * 1000:.1f}", file=sys.stderr)
+    print(output)
+    if code:
+        sys.exit(code)
 
 if __name__ == "__main__":
     main()
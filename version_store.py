@@ -0,0 +1,266 @@
+"""
+Content-addressed version history for files the agent overwrites or edits.
+
+Replaces the old deleted-modified/ trash, which kept a full copy per change.
+Before write / edit / patch / restore change a file, its current content is
+saved here:
+
+    .versions/chunks/ab/<sha256>     zlib-compressed chunk (stored raw if that's smaller)
+    .versions/index/<sha256 of path>.json
+                                     {"path": ..., "versions": [{"version", "ts", "size", "sha256", "reason", "chunks"}]}
+
+Content is cut into chunks at content-defined line boundaries, so two
+versions that differ by an edit share every chunk except the ones around the
+edit: consecutive versions are stored as a delta of the chunks that changed,
+and identical content (the same file saved twice, or two copies of one file)
+is stored once. save() streams the file through the chunker a block at a
+time, so saving a big file never holds it in memory whole.
+
+Retention, applied on every save: at most KEEP_VERSIONS per path, nothing
+older than MAX_AGE_DAYS, and the oldest versions store-wide are dropped
+while the chunks take more than MAX_BYTES. The newest version of each path
+is always kept. Chunks nothing points at are deleted by gc().
+"""
+import io
+import os
+import json
+import time
+import zlib
+import fcntl
+import hashlib
+import tempfile
+from collections import Counter
+from itertools import accumulate
+
+STORE_DIR = ".versions"
+KEEP_VERSIONS = 50
+MAX_AGE_DAYS = 14
+MAX_BYTES = 256 * 1024 * 1024
+GC_INTERVAL = 60                    # seconds between store-wide sweeps
+CHUNK_BOUNDARY_MASK = 0xFF          # a line whose crc32 & mask == 0 ends a chunk (~256 lines per chunk)
+MAX_CHUNK_BYTES = 256 * 1024
+READ_BLOCK = 256 * 1024            # save() streams the file through iter_chunks in blocks this size
+_RAW, _ZLIB = b"r", b"z"
+
+
+def iter_chunks(f, block=READ_BLOCK):
+    """
+    Chunks of a binary file object, cut after lines whose crc32 (without the \\n) & mask is 0;
+    content running past MAX_CHUNK_BYTES without such a line is cut into fixed-size pieces.
+    Reads `block` bytes at a time, so memory stays at about one block plus one chunk.
+    """
+    pending = bytearray()   # the chunk being built
+    crc = 0                 # crc32 of the line being read so far
+    while True:
+        data = f.read(block)
+        if not data:
+            break
+        parts = data.split(b"\n")
+        # crc32 of each line this block finishes, without its \\n (the first carries on from the last block)
+        crcs = list(map(zlib.crc32, parts[:-1]))
+        if crcs:
+            crcs[0] = zlib.crc32(parts[0], crc)
+            crc = zlib.crc32(parts[-1])
+        else:
+            crc = zlib.crc32(data, crc)
+        start = 0
+        cuts = [k for k, line_crc in enumerate(crcs) if not line_crc & CHUNK_BOUNDARY_MASK]
+        if cuts:
+            lengths = list(accumulate(map(len, parts)))
+            for k in cuts:
+                end = lengths[k] + k + 1    # + the newlines of lines 0..k
+                pending += data[start:end]
+                yield from _cut(pending, final=True)
+                start = end
+        pending += data[start:]
+        yield from _cut(pending)
+    yield from _cut(pending, final=True)
+
+def _cut(pending, final=False):
+    """Yields MAX_CHUNK_BYTES pieces off the front of pending while it's longer than that; all of it if final."""
+    while len(pending) > MAX_CHUNK_BYTES:
+        yield bytes(pending[:MAX_CHUNK_BYTES])
+        del pending[:MAX_CHUNK_BYTES]
+    if final and pending:
+        yield bytes(pending)
+        del pending[:]
+
+def chunk(data):
+    """iter_chunks for bytes already in memory."""
+    return list(iter_chunks(io.BytesIO(data)))
+
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class VersionStore:
+    def __init__(self, directory=STORE_DIR, keep=KEEP_VERSIONS, max_age_days=MAX_AGE_DAYS, max_bytes=MAX_BYTES):
+        self.directory = str(directory)
+        self.keep = keep
+        self.max_age = max_age_days * 86400
+        self.max_bytes = max_bytes
+
+    # --- layout ---
+    def _chunk_path(self, digest):
+        return os.path.join(self.directory, "chunks", digest[:2], digest)
+
+    def _index_path(self, path):
+        return os.path.join(self.directory, "index", hashlib.sha256(path.encode("utf-8")).hexdigest()[:32] + ".json")
+
+    def _locked(self):
+        """Store-wide flock, so a sweep never deletes a chunk a concurrent save is about to reference."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(os.path.join(self.directory, "lock"), os.O_RDWR | os.O_CREAT, 0o666)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return fd
+
+    @staticmethod
+    def _unlock(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def _load_index(self, path):
+        try:
+            with open(self._index_path(path), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"path": path, "versions": []}
+
+    def _save_index(self, index):
+        _atomic_write(self._index_path(index["path"]), json.dumps(index).encode("utf-8"))
+
+    def _put_chunk(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(digest)
+        if not os.path.exists(path):
+            packed = zlib.compress(data, 6)
+            _atomic_write(path, _ZLIB + packed if len(packed) < len(data) else _RAW + data)
+        return digest
+
+    def _get_chunk(self, digest):
+        with open(self._chunk_path(digest), "rb") as f:
+            blob = f.read()
+        return zlib.decompress(blob[1:]) if blob[:1] == _ZLIB else blob[1:]
+
+    # --- public ---
+    def save(self, path, file_path, reason="write"):
+        """Records the current content of file_path as the next version of `path`. Returns the version number, or None if unchanged."""
+        fd = self._locked()
+        try:
+            # Streamed: chunks are stored as they're cut, so the file is never in memory whole.
+            # Storing before the unchanged check costs nothing extra: known chunks aren't rewritten.
+            sha, size, digests = hashlib.sha256(), 0, []
+            with open(file_path, "rb") as f:
+                for piece in iter_chunks(f):
+                    sha.update(piece)
+                    size += len(piece)
+                    digests.append(self._put_chunk(piece))
+            sha = sha.hexdigest()
+            index = self._load_index(path)
+            versions = index["versions"]
+            if versions and versions[-1]["sha256"] == sha:
+                return None
+            number = versions[-1]["version"] + 1 if versions else 1
+            versions.append({
+                "version": number,
+                "ts": time.time(),
+                "size": size,
+                "sha256": sha,
+                "reason": reason,
+                "chunks": digests,
+            })
+            self._prune(versions)
+            self._save_index(index)
+        finally:
+            self._unlock(fd)
+        self._maybe_gc()
+        return number
+
+    def _prune(self, versions):
+        cutoff = time.time() - self.max_age
+        while len(versions) > 1 and (len(versions) > self.keep or versions[0]["ts"] < cutoff):
+            versions.pop(0)
+
+    def versions(self, path):
+        return self._load_index(path)["versions"]
+
+    def content(self, path, version):
+        """Bytes of one version, or None if it isn't stored (any more)."""
+        for entry in self.versions(path):
+            if entry["version"] == version:
+                data = b"".join(self._get_chunk(d) for d in entry["chunks"])
+                if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+                    raise ValueError(f"Version {version} of {path} is corrupted.")
+                return data
+        return None
+
+    def _maybe_gc(self):
+        stamp = os.path.join(self.directory, "gc.stamp")
+        try:
+            if time.time() - os.path.getmtime(stamp) < GC_INTERVAL:
+                return
+        except OSError:
+            pass
+        _atomic_write(stamp, b"")
+        self.gc()
+
+    def gc(self):
+        """Applies age and size retention store-wide and deletes unreferenced chunks. Returns bytes freed."""
+        fd = self._locked()
+        try:
+            indexes = []
+            for root, _, files in os.walk(os.path.join(self.directory, "index")):
+                for name in files:
+                    if name.endswith(".json"):
+                        try:
+                            with open(os.path.join(root, name), "r") as f:
+                                indexes.append(json.load(f))
+                        except (OSError, ValueError):
+                            pass
+            sizes = {}
+            for root, _, files in os.walk(os.path.join(self.directory, "chunks")):
+                for name in files:
+                    if not name.startswith(".tmp-"):
+                        sizes[name] = os.path.getsize(os.path.join(root, name))
+            changed = set()
+            for i, index in enumerate(indexes):
+                before = len(index["versions"])
+                self._prune(index["versions"])
+                if len(index["versions"]) != before:
+                    changed.add(i)
+
+            # References per chunk, counted once; dropping a version only decrements its own chunks
+            refs = Counter(d for index in indexes for v in index["versions"] for d in v["chunks"])
+            # Over budget: drop the oldest versions across all paths, never a path's newest
+            total = sum(sizes.get(d, 0) for d in refs)
+            if total > self.max_bytes:
+                candidates = sorted((v["ts"], i) for i, index in enumerate(indexes) for v in index["versions"][:-1])
+                for _, i in candidates:
+                    if total <= self.max_bytes:
+                        break
+                    dropped = indexes[i]["versions"].pop(0)
+                    changed.add(i)
+                    for d in dropped["chunks"]:
+                        refs[d] -= 1
+                        if not refs[d]:
+                            del refs[d]
+                            total -= sizes.get(d, 0)
+            for i in changed:
+                self._save_index(indexes[i])
+
+            freed = 0
+            for digest, size in sizes.items():
+                if digest not in refs:
+                    try:
+                        os.remove(self._chunk_path(digest))
+                        freed += size
+                    except OSError:
+                        pass
+            return freed
+        finally:
+            self._unlock(fd)
@@ -6,7 +6,23 @@ import subprocess
 import openai
 import sys
 import concurrent.futures
-from openai import OpenAI # [MODIFIED] Added to actually invoke the LLM
+import asyncio
+import contextvars
+import importlib.util
+import threading
+import socket
+from openai import OpenAI, AsyncOpenAI # [MODIFIED] Added to actually invoke the LLM
+from event_log import EventLog, BackgroundLogWriter
+from inbox import Inbox, SOCKET_NAME
+from cassette import CassetteClient
+from resilient_llm import Endpoint, ResilientClient, AsyncResilientClient
+from tool_scheduler import ToolScheduler, TurnGraph, run_after
+from tool_pool import PoolExhausted
+from tool_cache import ToolCache
+import json_repair
+import blob_store
+from metrics import MetricsRegistry
+from profiling import Profiler
 import time 
 
 API_KEY="xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
@@ -17,10 +33,12 @@ API_KEY="xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
 SYSTEM_PROMPT = """
 You are an agentic system that thinks acts and observe. 
 
-IMPORTANT: All tools in the 'tool_calls' array are executed CONCURRENTLY in parallel. 
+IMPORTANT: Tools in the 'tool_calls' array are executed CONCURRENTLY in parallel,
+except that file tools touching the same path run in the order you list them.
+So you CAN batch dependent file work in one turn (e.g. write a file, then edit it, then read it).
+run_python, run_shell, shell, pip_install, apt_install and patch wait for the file tools listed before them
+and hold back the file tools listed after them. Web tools never wait for anything.
 web_serach can provide 5 concurrent searches per second at most. 
-Do not schedule dependent actions (like writing a file then reading that exact file) in the same turn. 
-Wait for the next step to do dependent actions.
 
 IMPORTANT: You must ONLY output a valid JSON object in the exact following schema:
 {
@@ -37,7 +55,7 @@ web_search and web_fetch tools are very supperior , if you can't get the results
 do not try to circumvent web_search and web_fetch fails via custom python or shell codes.
 
 Available Tools:
-    read <path>: Read file.
+    read <path> [lines <start> <end> | bytes <offset> <length> | head <n> | tail <n> | wc]: Read file, or part of it. Use ranges for big files and logs.
     write <path> <content>: Write file.
     mkdir <path>: Create dir.
     web_search <query> <num_results,default=5>: Makes a web search.
@@ -48,7 +66,12 @@ Available Tools:
     timestamp: gets current timestamp,
     append <path> <content>: append <arg>path</arg> <arg>content</arg>,
     list <path>: lists the files and folders,
+    find <path> <options>: recursive listing, paged; options are key=value pairs: pattern=*.py (globs, comma-separated), ignore=node_modules,.git (or none), depth=2, type=f|d, sort=name|size|mtime, limit=200, cursor=<given at the end of the previous page>. Use it instead of many lists
     edit <path> <old> <new> <occurrence>: edits a specific part of a file instead of read and write
+    patch <diff>: applies a unified diff (--- a/path, +++ b/path, @@ hunks) to any number of files, all or nothing. Prefer it over rewriting big files with write
+    multi_edit <path> <edits>: several edits to one file at once, all or nothing; edits is a JSON list like [{"old": "a", "new": "b", "occurrence": 1}, ...]
+    restore <path> <version>: every write/edit keeps the previous content; without a version lists them, with one restores it
+    read_blob <blob_id> <offset> <length>: reads a byte range of a large tool output that was stored as a blob
     http <method> <url> <data> <headers>: runs http requests directly
     run_shell <script_path>: runs shell script
     run_python <script_path>: run a python script
@@ -75,63 +98,804 @@ BASE_URL = "https://api.deepinfra.com/v1/openai"
 #MODEL_NAME = "openai/gpt-oss-120b"
 MODEL_NAME = "moonshotai/Kimi-K2.5"
 
+# Secondary endpoint used while the primary is failing (None = no failover)
+FALLBACK_BASE_URL = None
+FALLBACK_MODEL_NAME = None
+FALLBACK_API_KEY = None
+
+# Retry policy for LLM calls (see resilient_llm.py)
+LLM_MAX_RETRIES = 6
+LLM_BACKOFF_BASE = 1.0           # seconds, doubled per attempt, full jitter
+LLM_BACKOFF_MAX = 30.0
+LLM_CALL_DEADLINE = 300.0        # total seconds one call may spend across all retries
+BREAKER_THRESHOLD = 5            # consecutive failures before an endpoint is skipped...
+BREAKER_COOLDOWN = 60.0          # ...for this long
+
 
 
 # Constants from context [2]
 WORK_DIR = "/agent_workspace"
 SESSION_FILE = f"{WORK_DIR}/session_log.txt"
 TOOL_SCRIPT = f"{WORK_DIR}/use_tools.py"
-MAX_CHAR_SIZE = 300000 
 MAX_STEPS = 100 # SLICK UPGRADE: Prevent infinite loops
 
-def get_llm_response(client, messages):
-    try:
-        resp = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=messages,
-            response_format={"type": "json_object"}
-        )
-        raw = resp.choices[0].message.content
-        
-        # SLICK UPGRADE: Bulletproof JSON extraction using Regex
-        match = re.search(r'\{.*\}', raw, re.DOTALL)
-        if match:
-            return json.loads(match.group(0))
+# "pool": long-lived worker processes from tool_pool.py (no startup cost, crashes stay isolated).
+# "inprocess": import use_tools.py once and call its dispatcher directly (no interpreter startup per call).
+# "subprocess": spawn `python3 use_tools.py ...` for every call (old behaviour, also the fallback).
+TOOL_DISPATCH_MODE = "pool"
+TOOL_TIMEOUT = 45
+TOOL_POOL_WARM = 10              # workers started up front; the rest of TOOL_POOL_SIZE start on demand
+TOOL_POOL_MAX_CALLS = 200        # recycle a worker after this many calls
+TOOL_POOL_MAX_RSS_MB = 512       # ...or once it grows past this
+
+# Named tool pools with their own concurrency caps and rate limits (requests/second).
+# SLICK UPGRADE: Cap concurrent workers to prevent OS crashes on massive tool call arrays
+TOOL_POOLS = {
+    "web_search": {"tools": ["web_search"], "concurrency": 5, "rate": 5.0, "burst": 5},
+    "web_fetch": {"tools": ["web_fetch"], "concurrency": 8, "rate": 10.0, "burst": 8},
+    "http": {"tools": ["http"], "concurrency": 8, "rate": 20.0, "burst": 10},
+    "run_python": {"tools": ["run_python", "run_shell", "shell", "pip_install", "apt_install"], "concurrency": 4},
+    "file": {"tools": ["read", "write", "append", "edit", "multi_edit", "patch", "mkdir", "list", "find", "restore", "read_blob"], "concurrency": 10},
+    "default": {"concurrency": 10},
+}
+# One worker per slot the scheduler can admit at once, so no pool's burst can starve another of workers
+TOOL_POOL_SIZE = sum(pool["concurrency"] for pool in TOOL_POOLS.values())
+
+# Context budget: compact old turns into a rolling summary once the prompt reaches
+# CONTEXT_COMPACT_AT of the model's window (minus room for the reply).
+MODEL_CONTEXT_WINDOWS = {
+    "moonshotai/Kimi-K2.5": 262144,
+    "deepseek-ai/DeepSeek-V3.2": 163840,
+    "openai/gpt-oss-120b": 131072,
+}
+DEFAULT_CONTEXT_WINDOW = 128000
+CONTEXT_COMPACT_AT = 0.6
+RESERVED_COMPLETION_TOKENS = 8192
+KEEP_RECENT_MESSAGES = 6
+SUMMARY_INPUT_CHARS = 60000
+USE_EXACT_TOKENIZER = False      # needs `pip install tiktoken`; falls back to the estimator
+
+# log_event hands entries to a background writer thread; these tune it.
+LOG_FLUSH_INTERVAL = 0.5         # seconds of entries batched into one write
+LOG_MAX_BYTES = 50 * 1024 * 1024 # rotate session_log.txt -> session_log.txt.1 past this size
+LOG_BACKUPS = 5
+LOG_ECHO = True                  # also print every event to the console
+
+# "record": save every chat.completions request/response to LLM_CASSETTE_FILE.
+# "replay": answer from that file with no network (see cassette.py). None: talk to the provider.
+LLM_CASSETTE_MODE = None
+LLM_CASSETTE_FILE = "llm_cassette.jsonl"
+
+# How often a running LLM call / tool batch checks the inbox for URGENT: messages (see inbox.py)
+INTERRUPT_CHECK_INTERVAL = 0.2
+
+# Stream the completion and start each tool as soon as its JSON object is complete.
+LLM_STREAM = False
+
+# Seconds a step waits for its tool calls (None = wait for all). Calls still running after that
+# are reported as PENDING and their results are posted as a later message tagged with the call id.
+STEP_SOFT_DEADLINE = None
+# At session end, seconds to wait for those late calls before abandoning them (a late write/edit still lands)
+LATE_CALLS_DRAIN_TIMEOUT = TOOL_TIMEOUT
+
+# Per-session cache of tool results. read/list entries live until a write to the same path;
+# web results expire after the TTL (seconds). Set TOOL_CACHE_TTLS = {} to turn caching off.
+TOOL_CACHE_TTLS = {"read": None, "list": None, "web_search": 600, "web_fetch": 300}
+TOOL_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Tool outputs longer than this (chars) are stored under blobs/ and replaced in the prompt by a
+# preview (size, line count, head, tail, blob id); the model reads the rest with read_blob.
+OBSERVATION_SPILL_CHARS = 20000
+SPILL_HEAD_CHARS = 1500
+SPILL_TAIL_CHARS = 500
+
+# Per-call LLM and tool metrics: JSONL records in raw_activity/metrics.jsonl, an OpenMetrics
+# snapshot in METRICS_FILE after every step, and http://127.0.0.1:METRICS_PORT/metrics when set.
+METRICS_FILE = "metrics.prom"
+METRICS_PORT = None
+AGENT_ID = os.environ.get("AGENT_ID") or socket.gethostname()
+# USD per 1M tokens, {model: (prompt, completion)}, for the cost counter
+MODEL_PRICES = {}
+# Ask for token usage on streamed responses (stream_options.include_usage); not every provider accepts it
+LLM_STREAM_USAGE = False
+
+# "json": the model replies with a {"thought", "tool_calls"} JSON object as text (response_format=json_object).
+# "native": the tool catalog below is sent as OpenAI `tools` and calls come back in message.tool_calls.
+LLM_TOOL_MODE = "json"
+
+NATIVE_SYSTEM_PROMPT = """
+You are an agentic system that thinks acts and observe.
+Use the provided tools to act. Put your reasoning for this step in the message text.
+
+IMPORTANT: The tool calls of one response are executed CONCURRENTLY in parallel,
+except that file tools touching the same path run in the order you list them.
+run_python, run_shell, shell, pip_install, apt_install and patch wait for the file tools listed before them
+and hold back the file tools listed after them. Web tools never wait for anything.
+web_search is rate limited to 5 searches per second; extra searches are queued.
+If web_search or web_fetch can't get a result the site is paywalled or down; do not work around it with custom code.
+
+YOUR TASK IS:
+{MAIN_TASK}
+
+Create and update task progress at every cycle to TASK_PROGRESS.md as you progress in each cycle.
+"""
+
+# name -> (description, argument names in use_tools.py order; "?" marks optional). Used by LLM_TOOL_MODE = "native".
+TOOL_SPECS = {
+    "read": ("Read a file, or part of it: mode 'lines' (a=start line, b=end line), 'bytes' (a=offset, b=length), 'head'/'tail' (a=line count) or 'wc'. Use ranges for big files.", ["path", "mode?", "a?", "b?"]),
+    "write": ("Write a file, replacing it.", ["path", "content"]),
+    "append": ("Append to the end of a file (creates it if missing).", ["path", "content"]),
+    "edit": ("Replace one occurrence of `old` with `new` in a file (occurrence -1 replaces all).", ["path", "old", "new", "occurrence?"]),
+    "multi_edit": ("Apply several replacements to one file at once, all or nothing. edits: JSON list of {\"old\", \"new\", \"occurrence\"}; each matches the file as it was before the call.", ["path", "edits"]),
+    "patch": ("Apply a unified diff (--- a/path, +++ b/path, @@ hunks) to any number of files, all or nothing. Prefer it to rewriting big files with write.", ["diff"]),
+    "mkdir": ("Create a directory.", ["path"]),
+    "restore": ("List the versions saved before each write/edit of a file, or restore one of them.", ["path", "version?"]),
+    "read_blob": ("Read a byte range of a large tool output that was stored as a blob.", ["blob_id", "offset?", "length?"]),
+    "list": ("List the files and folders in a directory.", ["path?"]),
+    "find": ("Recursive listing of a directory tree, paged. options: space-separated key=value pairs: pattern=<glob,...> ignore=<glob,...|none> depth=<n> type=f|d sort=name|size|mtime limit=<n> cursor=<from the previous page>.", ["path?", "options?"]),
+    "web_search": ("Web search.", ["query", "num_results?"]),
+    "web_fetch": ("Fetch a URL as text.", ["url", "max_chars?"]),
+    "http": ("Run an HTTP request directly. headers as 'key:value,key2:value2'.", ["method", "url", "data?", "headers?"]),
+    "run_shell": ("Run a shell script file.", ["script_path"]),
+    "run_python": ("Run a python script file.", ["script_path"]),
+    "pip_install": ("Install python packages.", ["packages"]),
+    "apt_install": ("Install system packages.", ["packages"]),
+    "shell": ("Run a bash command (prefer scripts).", ["command"]),
+    "timestamp": ("Current timestamp.", []),
+    "wait": ("Sleep for some seconds.", ["seconds?"]),
+    "finish": ("Finish the session. CALL THIS WHEN THE TASK IS DONE.", ["message?"]),
+    "stop": ("Force stop execution.", []),
+    "exit": ("Force exit the sandbox environment.", []),
+}
+
+def _tool_definitions():
+    tools = []
+    for name, (description, params) in TOOL_SPECS.items():
+        props = {p.rstrip("?"): {"type": "string"} for p in params}
+        required = [p for p in params if not p.endswith("?")]
+        tools.append({"type": "function", "function": {
+            "name": name, "description": description,
+            "parameters": {"type": "object", "properties": props, "required": required},
+        }})
+    return tools
+
+TOOL_DEFINITIONS = _tool_definitions()
+
+def system_prompt(task_description):
+    template = NATIVE_SYSTEM_PROMPT if LLM_TOOL_MODE == "native" else SYSTEM_PROMPT
+    return template.replace("{MAIN_TASK}", task_description)
+
+_JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+class StreamingResponseParser:
+    """
+    Incremental parser for the {"thought": ..., "tool_calls": [...]} schema.
+    Feed it text deltas; it calls on_tool_call(call) the moment each tool_calls
+    element closes and on_thought(text) with decoded thought text line by line.
+    Anything before the first '{' or after the top-level object closes is ignored,
+    same as the regex extraction in the non-streaming path. Elements that don't
+    parse, and whatever follows the last closed element of a cut-off response,
+    are never dispatched; result() lists them under "invalid_tool_calls".
+    """
+    def __init__(self, on_tool_call=None, on_thought=None):
+        self.on_tool_call = on_tool_call
+        self.on_thought = on_thought
+        self.raw = []
+        self.pos = 0
+        self.depth = 0
+        self.done = False
+        self.in_string = False
+        self.escape = None          # None, "" after a backslash, or the \\uXXXX digits so far
+        self.string_chars = []
+        self.last_string = None
+        self.key = None             # current key of the top-level object
+        self.in_tool_calls = False
+        self.saw_tool_calls = False
+        self.element_start = None
+        self.thought_buffer = []
+        self.thought = []
+        self.tool_calls = []
+        self.invalid_calls = []
+
+    def feed(self, text):
+        for ch in text:
+            if self.done:
+                break
+            self.raw.append(ch)
+            self._step(ch)
+            self.pos += 1
+
+    def _step(self, ch):
+        if self.depth == 0 and ch != "{":
+            return
+        if self.in_string:
+            self._string_char(ch)
+            return
+        if ch == '"':
+            self.in_string = True
+            self.string_chars = []
+        elif ch == ":" and self.depth == 1:
+            self.key = self.last_string
+        elif ch in "{[":
+            if ch == "[" and self.depth == 1 and self.key == "tool_calls":
+                self.in_tool_calls = self.saw_tool_calls = True
+            elif ch == "{" and self.in_tool_calls and self.depth == 2:
+                self.element_start = self.pos
+            self.depth += 1
+        elif ch in "}]":
+            self.depth -= 1
+            if ch == "}" and self.in_tool_calls and self.depth == 2 and self.element_start is not None:
+                self._emit_tool_call("".join(self.raw[self.element_start:self.pos + 1]))
+                self.element_start = None
+            elif ch == "]" and self.depth == 1:
+                self.in_tool_calls = False
+            elif self.depth == 0:
+                self.done = True
+
+    def _string_char(self, ch):
+        streaming_thought = self.depth == 1 and self.key == "thought" and self.last_string == "thought"
+        if self.escape is not None:
+            if self.escape == "" and ch != "u":
+                decoded = _JSON_ESCAPES.get(ch, ch)
+                self.escape = None
+            else:
+                self.escape += ch
+                if len(self.escape) < 5:
+                    return
+                decoded = chr(int(self.escape[1:], 16))
+                self.escape = None
+        elif ch == "\\":
+            self.escape = ""
+            return
+        elif ch == '"':
+            self.in_string = False
+            self.last_string = "".join(self.string_chars)
+            if streaming_thought:
+                self._flush_thought()
+            return
+        else:
+            decoded = ch
+        self.string_chars.append(decoded)
+        if streaming_thought:
+            self.thought.append(decoded)
+            self.thought_buffer.append(decoded)
+            if decoded == "\n":
+                self._flush_thought()
+
+    def _flush_thought(self):
+        text = "".join(self.thought_buffer).strip()
+        self.thought_buffer = []
+        if text and self.on_thought:
+            self.on_thought(text)
+
+    def _emit_tool_call(self, text):
+        try:
+            call = json_repair.loads(text)
+        except json.JSONDecodeError as e:
+            call = e
+        if not isinstance(call, dict):
+            self.invalid_calls.append(f"Could not parse tool call {text[:200]!r} ({call}).")
+            return
+        self.tool_calls.append(call)
+        if self.on_tool_call:
+            self.on_tool_call(call)
+
+    def text(self):
+        return "".join(self.raw)
+
+    def feed_delta(self, delta):
+        if delta.content:
+            self.feed(delta.content)
+
+    def result(self):
+        try:
+            parsed = _parse_response_text(self.text())
+        except json.JSONDecodeError:
+            if not self.tool_calls and not self.invalid_calls:
+                raise
+            # Some calls were already dispatched; keep them rather than asking for a redo.
+            parsed = {"thought": "".join(self.thought)}
+            if not self.done:
+                self.invalid_calls.append(f"The response was cut off after {len(self.tool_calls)} complete tool call(s); anything after them was not run.")
+        if self.saw_tool_calls and "error" not in parsed:
+            # Exactly the calls already dispatched, so the end-of-stream hand-off submits nothing twice
+            parsed["tool_calls"] = list(self.tool_calls)
+        if self.invalid_calls:
+            parsed["invalid_tool_calls"] = self.invalid_calls
+        return parsed
+
+
+def _native_call(name, arguments, call_id=None):
+    """
+    An OpenAI tool call as this loop's {"name", "arguments": [...], "id"}, positional in TOOL_SPECS order.
+    Raises json.JSONDecodeError if the arguments don't parse (e.g. cut off by the token limit).
+    """
+    parsed = json_repair.loads(arguments or "{}")
+    if isinstance(parsed, dict):
+        if name in TOOL_SPECS:
+            order = [p.rstrip("?") for p in TOOL_SPECS[name][1]]
+            parsed = [parsed[p] for p in order if p in parsed]
+        else:
+            parsed = list(parsed.values())
+    elif not isinstance(parsed, list):
+        parsed = [parsed]
+    call = {"name": name, "arguments": [a if isinstance(a, str) else json.dumps(a) for a in parsed]}
+    if call_id:
+        call["id"] = call_id
+    return call
+
+def _raw_native_call(call_id, name, arguments):
+    """A tool call as the API sent it, for the assistant message in the history."""
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": arguments or "{}"}}
+
+def _invalid_native_call(name, arguments, error):
+    return f"Could not parse the arguments of tool call {name} {(arguments or '')[:200]!r} ({error})."
+
+def _parse_native_message(message):
+    calls, invalid, native = [], [], []
+    for tc in message.tool_calls or []:
+        native.append(_raw_native_call(tc.id, tc.function.name, tc.function.arguments))
+        try:
+            calls.append(_native_call(tc.function.name, tc.function.arguments, tc.id))
+        except json.JSONDecodeError as e:
+            invalid.append(_invalid_native_call(tc.function.name, tc.function.arguments, e))
+    content = message.content or ""
+    if not calls and "{" in content:
+        # Some models still answer in the JSON-text schema; accept that too
+        try:
+            parsed = _parse_response_text(content)
+            if parsed.get("tool_calls"):
+                return parsed
+        except json.JSONDecodeError:
+            pass
+    parsed = {"thought": content, "tool_calls": calls}
+    if native:
+        parsed["native_tool_calls"] = native
+    if invalid:
+        parsed["invalid_tool_calls"] = invalid
+    return parsed
+
+class NativeStreamParser:
+    """
+    Assembles streamed message.tool_calls fragments. Each call goes to
+    on_tool_call once the next one starts (or the stream ends); the message
+    text is reported to on_thought line by line. Calls whose arguments don't
+    parse are not dispatched but listed under "invalid_tool_calls".
+    """
+    def __init__(self, on_tool_call=None, on_thought=None):
+        self.on_tool_call = on_tool_call
+        self.on_thought = on_thought
+        self.partial = {}       # index -> [id, name, [argument fragments]]
+        self.emitted = 0
+        self.content = []
+        self.line = []
+        self.tool_calls = []
+        self.invalid_calls = []
+
+    def feed_delta(self, delta):
+        if delta.content:
+            self.content.append(delta.content)
+            for ch in delta.content:
+                self.line.append(ch)
+                if ch == "\n":
+                    self._flush_thought()
+        for tc in getattr(delta, "tool_calls", None) or []:
+            entry = self.partial.setdefault(tc.index, [None, "", []])
+            if getattr(tc, "id", None):
+                entry[0] = tc.id
+            if tc.function and tc.function.name:
+                entry[1] += tc.function.name
+            if tc.function and tc.function.arguments:
+                entry[2].append(tc.function.arguments)
+            self._emit_until(tc.index)
+
+    def _emit_until(self, end):
+        while self.emitted < end and self.emitted in self.partial:
+            call_id, name, fragments = self.partial[self.emitted]
+            self.emitted += 1
+            try:
+                call = _native_call(name, "".join(fragments), call_id)
+            except json.JSONDecodeError as e:
+                self.invalid_calls.append(_invalid_native_call(name, "".join(fragments), e))
+                continue
+            self.tool_calls.append(call)
+            if self.on_tool_call:
+                self.on_tool_call(call)
+
+    def _flush_thought(self):
+        text = "".join(self.line).strip()
+        self.line = []
+        if text and self.on_thought:
+            self.on_thought(text)
+
+    def result(self):
+        self._emit_until(max(self.partial) + 1 if self.partial else 0)
+        self._flush_thought()
+        parsed = {"thought": "".join(self.content), "tool_calls": self.tool_calls}
+        if self.partial:
+            parsed["native_tool_calls"] = [_raw_native_call(call_id, name, "".join(fragments))
+                                           for call_id, name, fragments in (self.partial[i] for i in sorted(self.partial))]
+        if self.invalid_calls:
+            parsed["invalid_tool_calls"] = self.invalid_calls
+        return parsed
+
+
+def _parse_response_text(raw):
+    # SLICK UPGRADE: Bulletproof JSON extraction, repaired locally before we ask the LLM for a redo
+    if "{" not in raw:
         return {"error": "No JSON object found in response."}
+    parsed = json_repair.loads(raw)
+    if not isinstance(parsed, dict):
+        return {"error": "Expected a JSON object."}
+    return parsed
+
+def _llm_request(messages, stream=False):
+    """chat.completions.create arguments for the current LLM_TOOL_MODE."""
+    request = {"model": MODEL_NAME, "messages": messages}
+    if LLM_TOOL_MODE == "native":
+        request["tools"] = TOOL_DEFINITIONS
+    else:
+        request["response_format"] = {"type": "json_object"}
+    if stream:
+        request["stream"] = True
+        if LLM_STREAM_USAGE:
+            request["stream_options"] = {"include_usage": True}
+    return request
+
+def _parse_llm_message(message):
+    if LLM_TOOL_MODE == "native":
+        return _parse_native_message(message)
+    return _parse_response_text(message.content)
+
+def _stream_parser(on_tool_call):
+    parser_class = NativeStreamParser if LLM_TOOL_MODE == "native" else StreamingResponseParser
+    return parser_class(on_tool_call=on_tool_call, on_thought=lambda text: log_event("THOUGHT", text))
+
+def _get_llm_response_stream(client, messages, on_tool_call, cancel=None, stats=None):
+    parser = _stream_parser(on_tool_call)
+    stream = client.chat.completions.create(**_llm_request(messages, stream=True))
+    for chunk in stream:
+        if cancel is not None and cancel.is_set():
+            stream.close()
+            return None
+        stats.chunk(chunk)
+        if chunk.choices:
+            parser.feed_delta(chunk.choices[0].delta)
+    return parser.result()
+
+def make_client(is_async=False):
+    """
+    The LLM client for a session: retries, circuit breaking and failover in
+    front of the provider, wrapped in a cassette when LLM_CASSETTE_MODE is set.
+    """
+    if LLM_CASSETTE_MODE == "replay":
+        return CassetteClient(LLM_CASSETTE_FILE, "replay", is_async=is_async)
+    client_class = AsyncOpenAI if is_async else OpenAI
+    # The resilient layer owns retries, so the SDK's own are switched off
+    endpoints = [Endpoint(BASE_URL, client_class(api_key=API_KEY, base_url=BASE_URL, max_retries=0),
+                          None, BREAKER_THRESHOLD, BREAKER_COOLDOWN)]
+    if FALLBACK_BASE_URL:
+        fallback = client_class(api_key=FALLBACK_API_KEY or API_KEY, base_url=FALLBACK_BASE_URL, max_retries=0)
+        endpoints.append(Endpoint(FALLBACK_BASE_URL, fallback, FALLBACK_MODEL_NAME, BREAKER_THRESHOLD, BREAKER_COOLDOWN))
+    real = (AsyncResilientClient if is_async else ResilientClient)(
+        endpoints,
+        max_retries=LLM_MAX_RETRIES,
+        backoff_base=LLM_BACKOFF_BASE,
+        backoff_max=LLM_BACKOFF_MAX,
+        deadline=LLM_CALL_DEADLINE,
+        on_event=lambda msg: log_event("LLM_RETRY", msg),
+    )
+    if LLM_CASSETTE_MODE == "record":
+        return CassetteClient(LLM_CASSETTE_FILE, "record", real=real, is_async=is_async)
+    return real
+
+def get_llm_response(client, messages, on_tool_call=None, cancel=None):
+    """
+    Returns the parsed response dict, {"error": ...} for bad JSON, or None on API failure.
+    When LLM_STREAM is on, on_tool_call(call) fires for each tool call while the
+    response is still being generated and the thought is logged as it streams.
+    Setting the `cancel` event stops reading a stream early.
+    """
+    stats = LLMCallStats()
+    try:
+        if LLM_STREAM:
+            result = _get_llm_response_stream(client, messages, on_tool_call, cancel, stats)
+            stats.done("ok" if result is not None else "cancelled")
+            return result
+
+        resp = client.chat.completions.create(**_llm_request(messages))
+        stats.usage = getattr(resp, "usage", None)
+        stats.done("ok")
+        return _parse_llm_message(resp.choices[0].message)
         
     except json.JSONDecodeError as e:
+        stats.done("invalid_json")
         return {"error": f"Invalid JSON format: {str(e)}"}
     except Exception as e:
+        stats.done("error")
         log_event("ERROR", f"LLM Call Failed: {e}")
         return None
 
+async def _get_llm_response_stream_async(client, messages, on_tool_call, stats):
+    parser = _stream_parser(on_tool_call)
+    stream = await client.chat.completions.create(**_llm_request(messages, stream=True))
+    async for chunk in stream:
+        stats.chunk(chunk)
+        if chunk.choices:
+            parser.feed_delta(chunk.choices[0].delta)
+    return parser.result()
+
+async def get_llm_response_async(client, messages, on_tool_call=None):
+    """AsyncOpenAI twin of get_llm_response; same return values."""
+    stats = LLMCallStats()
+    try:
+        if LLM_STREAM:
+            result = await _get_llm_response_stream_async(client, messages, on_tool_call, stats)
+            stats.done("ok")
+            return result
+
+        resp = await client.chat.completions.create(**_llm_request(messages))
+        stats.usage = getattr(resp, "usage", None)
+        stats.done("ok")
+        return _parse_llm_message(resp.choices[0].message)
+
+    except json.JSONDecodeError as e:
+        stats.done("invalid_json")
+        return {"error": f"Invalid JSON format: {str(e)}"}
+    except asyncio.CancelledError:
+        stats.done("cancelled")
+        raise
+    except Exception as e:
+        stats.done("error")
+        log_event("ERROR", f"LLM Call Failed: {e}")
+        return None
+
+# Per-session log locations. run_agent_async sets these so several agents in one
+# process each log into their own workspace; the sync path uses the defaults.
+_session_file = contextvars.ContextVar("session_file", default=None)
+_raw_activity_dir = contextvars.ContextVar("raw_activity_dir", default="raw_activity")
+
+_event_logs = {}
+_event_logs_lock = threading.Lock()
+
+def _get_event_log():
+    raw_dir = _raw_activity_dir.get()
+    with _event_logs_lock:
+        if raw_dir not in _event_logs:
+            _event_logs[raw_dir] = EventLog(raw_dir)
+        return _event_logs[raw_dir]
+
 def log_raw_activity(label, content):
-    os.makedirs("raw_activity", exist_ok=True)
-    timestamp = int(time.time() * 1000)
-    filename = f"raw_activity/{timestamp}_{label}.txt"
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(str(content))
+    """Appends to raw_activity/events-*.jsonl; LLM prompts are stored as deltas (see event_log.py)."""
+    event_log = _get_event_log()
+    if label == "LLM_INPUT":
+        event_log.log_messages(content)
+    else:
+        event_log.log(label, content)
+
+_log_writer = None
+_log_writer_lock = threading.Lock()
+
+def _get_log_writer():
+    global _log_writer
+    with _log_writer_lock:
+        if _log_writer is None:
+            _log_writer = BackgroundLogWriter(LOG_FLUSH_INTERVAL, LOG_MAX_BYTES, LOG_BACKUPS, echo=LOG_ECHO)
+        return _log_writer
 
 def log_event(label, content):
+    """Queues the entry for the console and the session log; the writer thread does the I/O."""
     entry = f"\n[{label}] {content}\n"
-    print(entry)
-    # Ensure directory exists before writing logs
-    os.makedirs(WORK_DIR, exist_ok=True)
-    with open(SESSION_FILE, "a") as f:
-        f.write(entry)
+    _get_log_writer().write(_session_file.get() or SESSION_FILE, entry)
+
+def flush_logs():
+    if _log_writer:
+        _log_writer.flush()
+
+# ==========================================
+# METRICS
+# ==========================================
+METRIC_HELP = {
+    "agent_llm_requests": "LLM calls by outcome.",
+    "agent_llm_latency_seconds": "Wall time of an LLM call.",
+    "agent_llm_ttft_seconds": "Time to the first streamed chunk.",
+    "agent_llm_tokens": "Prompt and completion tokens reported by the provider.",
+    "agent_llm_cost_usd": "Spend computed from MODEL_PRICES.",
+    "agent_tool_calls": "Tool calls by exit code.",
+    "agent_tool_queue_seconds": "Time a tool call waited in its scheduler pool.",
+    "agent_tool_run_seconds": "Time a tool call took to run.",
+    "agent_tool_bytes_in": "Bytes of tool arguments.",
+    "agent_tool_bytes_out": "Bytes of tool output.",
+    "agent_step_seconds": "Wall time of a step (LLM call plus its tool calls).",
+}
+_metrics = MetricsRegistry(METRIC_HELP)
+_metrics_server = None
+_agent_id = contextvars.ContextVar("agent_id", default=None)
+
+def _agent():
+    return _agent_id.get() or AGENT_ID
+
+def _record(kind, **fields):
+    """Appends one structured record to raw_activity/metrics.jsonl."""
+    record = {"ts": round(time.time(), 3), "kind": kind, "agent": _agent(), **fields}
+    _get_log_writer().write(os.path.join(_raw_activity_dir.get(), "metrics.jsonl"), json.dumps(record) + "\n", echo=False)
+
+class LLMCallStats:
+    """Latency, time to first chunk and token usage of one LLM call; done() records them."""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_chunk = None
+        self.usage = None
 
-def execute_tool_call(tool_name, args):
-    """Executes a single tool via the use_tools.py script [1]."""
+    def chunk(self, chunk):
+        if self.first_chunk is None:
+            self.first_chunk = time.perf_counter()
+        if getattr(chunk, "usage", None):
+            self.usage = chunk.usage
+
+    def done(self, status):
+        latency = time.perf_counter() - self.started
+        ttft = self.first_chunk - self.started if self.first_chunk is not None else None
+        prompt = getattr(self.usage, "prompt_tokens", None) or 0
+        completion = getattr(self.usage, "completion_tokens", None) or 0
+        price = MODEL_PRICES.get(MODEL_NAME)
+        cost = (prompt * price[0] + completion * price[1]) / 1e6 if price else 0.0
+        labels = {"agent": _agent(), "model": MODEL_NAME}
+        _metrics.inc("agent_llm_requests", status=status, **labels)
+        _metrics.observe("agent_llm_latency_seconds", latency, **labels)
+        if ttft is not None:
+            _metrics.observe("agent_llm_ttft_seconds", ttft, **labels)
+        if prompt or completion:
+            _metrics.inc("agent_llm_tokens", prompt, kind="prompt", **labels)
+            _metrics.inc("agent_llm_tokens", completion, kind="completion", **labels)
+        if cost:
+            _metrics.inc("agent_llm_cost_usd", cost, **labels)
+        _record("llm", model=MODEL_NAME, status=status, latency_ms=round(latency * 1000, 1),
+                ttft_ms=round(ttft * 1000, 1) if ttft is not None else None,
+                prompt_tokens=prompt, completion_tokens=completion, cost_usd=round(cost, 6))
+
+def record_tool_metrics(name, args, result, code, queue_ms, run_ms, mode):
+    bytes_in = sum(len(str(a).encode("utf-8", errors="replace")) for a in args)
+    bytes_out = len(str(result).encode("utf-8", errors="replace"))
+    labels = {"agent": _agent(), "tool": name}
+    _metrics.inc("agent_tool_calls", code="timeout" if code is None else str(code), **labels)
+    if queue_ms is not None:
+        _metrics.observe("agent_tool_queue_seconds", queue_ms / 1000, **labels)
+    _metrics.observe("agent_tool_run_seconds", run_ms / 1000, **labels)
+    _metrics.inc("agent_tool_bytes_in", bytes_in, **labels)
+    _metrics.inc("agent_tool_bytes_out", bytes_out, **labels)
+    _record("tool", tool=name, mode=mode, code=code, queue_ms=round(queue_ms, 1) if queue_ms is not None else None,
+            run_ms=round(run_ms, 1), bytes_in=bytes_in, bytes_out=bytes_out)
+
+def record_step_metrics(step, started, tool_calls):
+    seconds = time.perf_counter() - started
+    _metrics.observe("agent_step_seconds", seconds, agent=_agent())
+    _record("step", step=step + 1, wall_ms=round(seconds * 1000, 1), tool_calls=tool_calls)
+    export_metrics()
+
+def export_metrics():
+    """Refreshes METRICS_FILE and starts the scrape endpoint on first use."""
+    global _metrics_server
+    if METRICS_PORT and _metrics_server is None:
+        try:
+            _metrics_server = _metrics.serve(METRICS_PORT)
+        except OSError as e:
+            _metrics_server = False
+            log_event("ERROR", f"Metrics endpoint unavailable: {e}")
+    if METRICS_FILE:
+        try:
+            _metrics.write_textfile(METRICS_FILE)
+        except OSError as e:
+            log_event("ERROR", f"Failed to write {METRICS_FILE}: {e}")
+
+_tools_module = None
+_toolbox = None
+_tools_lock = threading.Lock()
+
+def _load_tools_module():
+    """Imports use_tools.py once per process. Returns None if it can't be loaded."""
+    global _tools_module, _toolbox
+    with _tools_lock:
+        if _tools_module is not None:
+            return _tools_module or None
+        try:
+            spec = importlib.util.spec_from_file_location("use_tools", TOOL_SCRIPT)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _toolbox = module.AgentFileToolbox()
+            _tools_module = module
+        except Exception as e:
+            log_event("ERROR", f"In-process tools unavailable, falling back to subprocess: {e}")
+            _tools_module = False
+    return _tools_module or None
+
+_tool_pool = None
+
+def _get_tool_pool():
+    """Starts the worker pool on first use. Returns None if it can't be started."""
+    global _tool_pool
+    with _tools_lock:
+        if _tool_pool is not None:
+            return _tool_pool or None
+        try:
+            from tool_pool import ToolWorkerPool
+            _tool_pool = ToolWorkerPool(
+                TOOL_SCRIPT,
+                size=TOOL_POOL_SIZE,
+                warm=TOOL_POOL_WARM,
+                max_calls=TOOL_POOL_MAX_CALLS,
+                max_rss_mb=TOOL_POOL_MAX_RSS_MB,
+            )
+        except Exception as e:
+            log_event("ERROR", f"Tool worker pool unavailable, falling back to subprocess: {e}")
+            _tool_pool = False
+    return _tool_pool or None
+
+def shutdown_tool_pool():
+    global _tool_pool
+    if _tool_pool:
+        _tool_pool.shutdown()
+    _tool_pool = None
+
+def _execute_tool_pool(pool, tool_name, args):
     try:
-        # Cast tool_name into string safely
-        cmd = ["python3", TOOL_SCRIPT, str(tool_name)] + [str(a) for a in args]
-        res = subprocess.run(cmd, capture_output=True, text=True, timeout=45)
-        return res.stdout if res.returncode == 0 else f"ERROR: {res.stderr}"
+        resp = pool.call(str(tool_name), [str(a) for a in args], timeout=TOOL_TIMEOUT)
+    except PoolExhausted as e:
+        return f"SYSTEM_ERROR: Tool {tool_name} not run: {e}", None, None
+    except TimeoutError:
+        return f"SYSTEM_ERROR: Tool {tool_name} timed out after {TOOL_TIMEOUT} seconds (worker killed)", None, None
+    output = f"{resp['output']}\n"
+    return (output if resp["code"] == 0 else f"ERROR: {output}"), resp["tool_ms"], resp["code"]
+
+def _execute_tool_subprocess(tool_name, args):
+    """Returns (output, tool_ms, exit_code) where tool_ms is the time use_tools.py reported for the tool itself."""
+    # Cast tool_name into string safely
+    cmd = ["python3", TOOL_SCRIPT, str(tool_name)] + [str(a) for a in args]
+    res = subprocess.run(cmd, capture_output=True, text=True, timeout=TOOL_TIMEOUT)
+    timing = re.search(r'\[TIMING\] tool_ms=([\d.]+)', res.stderr)
+    tool_ms = float(timing.group(1)) if timing else None
+    return (res.stdout if res.returncode == 0 else f"ERROR: {res.stderr}"), tool_ms, res.returncode
+
+def _execute_tool_inprocess(module, tool_name, args):
+    t0 = time.perf_counter()
+    output, code = module.dispatch(str(tool_name), [str(a) for a in args], ft=_toolbox)
+    tool_ms = (time.perf_counter() - t0) * 1000
+    # print() in the CLI adds a trailing newline; keep observations identical across modes
+    output = f"{output}\n"
+    return (output if code == 0 else f"ERROR: {output}"), tool_ms, code
+
+def execute_tool_call(tool_name, args, queued_at=None):
+    """Executes a single tool via use_tools.py [1]: worker pool, in-process or as a subprocess."""
+    t0 = time.perf_counter()
+    queue_ms = (t0 - queued_at) * 1000 if queued_at is not None else None
+    try:
+        pool = _get_tool_pool() if TOOL_DISPATCH_MODE == "pool" else None
+        module = _load_tools_module() if TOOL_DISPATCH_MODE == "inprocess" else None
+        mode = "pool" if pool else "inprocess" if module else "subprocess"
+        if pool:
+            result, tool_ms, code = _execute_tool_pool(pool, tool_name, args)
+        elif module:
+            result, tool_ms, code = _execute_tool_inprocess(module, tool_name, args)
+        else:
+            result, tool_ms, code = _execute_tool_subprocess(tool_name, args)
+        wall_ms = (time.perf_counter() - t0) * 1000
+        overhead = f"{wall_ms - tool_ms:.1f}ms" if tool_ms is not None else "n/a"
+        log_event("TOOL_TIMING", f"{tool_name} mode={mode} wall={wall_ms:.1f}ms overhead={overhead}")
+        record_tool_metrics(tool_name, args, result, code, queue_ms, wall_ms, mode)
+        return result
     except Exception as e:
-        return f"SYSTEM_ERROR: {str(e)}"
+        result = f"SYSTEM_ERROR: {str(e)}"
+        record_tool_metrics(tool_name, args, result, None, queue_ms, (time.perf_counter() - t0) * 1000, "error")
+        return result
 
 # [MODIFIED] Helper function strictly for processing items in the thread pool
-def _process_single_tool(call):
+def _observation(name, result, blob_dir=blob_store.BLOB_DIR):
+    """The observation for one tool result; oversized outputs are spilled to the blob store and previewed."""
+    if name != "read_blob":
+        result = blob_store.spill(result, OBSERVATION_SPILL_CHARS, blob_dir, SPILL_HEAD_CHARS, SPILL_TAIL_CHARS)
+    return f"Tool {name} Result: {result}"
+
+def _process_single_tool(call, cache=None, queued_at=None):
     name = call.get("name")
     args = call.get("arguments", [])
     
@@ -144,108 +908,627 @@ def _process_single_tool(call):
         return True, f"Signal received: {name}. Exiting."
     
     log_raw_activity(f"TOOL_INPUT_{name}", args)
-    result = execute_tool_call(name, args)
+    result = cache.get(name, args) if cache else None
+    if result is not None:
+        record_tool_metrics(name, args, result, 0, None, 0.0, "cache")
+        log_raw_activity(f"TOOL_OUTPUT_{name}_CACHED", result)
+        return False, _observation(name, result)
+    result = execute_tool_call(name, args, queued_at)
+    if cache:
+        cache.put(name, args, result)
+        cache.invalidate(call)
     log_raw_activity(f"TOOL_OUTPUT_{name}", result)
-    return False, f"Tool {name} Result: {result}"
+    return False, _observation(name, result)
+
+async def execute_tool_call_async(tool_name, args, workspace=".", queued_at=None):
+    """Runs use_tools.py as an asyncio subprocess rooted at `workspace`, so one event loop can serve many sessions."""
+    t0 = time.perf_counter()
+    queue_ms = (t0 - queued_at) * 1000 if queued_at is not None else None
+    code = None
+    result = None
+    try:
+        result = await _run_tool_async(tool_name, args, workspace)
+        code, result = result
+        return result
+    finally:
+        if result is not None:
+            record_tool_metrics(tool_name, args, result, code, queue_ms, (time.perf_counter() - t0) * 1000, "async")
+
+async def _run_tool_async(tool_name, args, workspace):
+    """(exit_code, output); exit_code is None on a timeout or a failure to launch."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "python3", TOOL_SCRIPT, str(tool_name), *[str(a) for a in args],
+            cwd=workspace,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            out, err = await asyncio.wait_for(proc.communicate(), TOOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return None, f"SYSTEM_ERROR: Tool {tool_name} timed out after {TOOL_TIMEOUT} seconds"
+        except asyncio.CancelledError:
+            proc.kill()
+            raise
+        out = out.decode("utf-8", errors="replace")
+        return proc.returncode, (out if proc.returncode == 0 else f"ERROR: {err.decode('utf-8', errors='replace')}")
+    except Exception as e:
+        return None, f"SYSTEM_ERROR: {str(e)}"
+
+def _submit_tool(graph, scheduler, cache, call, profiler=None):
+    """Queues one call on its pool once the earlier calls of the turn it conflicts with have finished."""
+    process = profiler.wrap(_process_single_tool) if profiler else _process_single_tool
+    return graph.add(call, lambda deps: run_after(deps, lambda: scheduler.submit(call.get("name"), process, call, cache, time.perf_counter())))
+
+async def _process_single_tool_async(call, workspace, scheduler, cache, after=()):
+    name = call.get("name")
+    args = call.get("arguments", [])
+    if after:
+        await asyncio.wait(after)
+
+    if not name:
+        return False, f"Tool Error: tool name was missing in standard JSON call. Raw call: {call}"
+
+    if name in ["finish", "stop", "exit"]:
+        return True, f"Signal received: {name}. Exiting."
+
+    log_raw_activity(f"TOOL_INPUT_{name}", args)
+    result = cache.get(name, args)
+    if result is not None:
+        record_tool_metrics(name, args, result, 0, None, 0.0, "cache")
+        log_raw_activity(f"TOOL_OUTPUT_{name}_CACHED", result)
+        return False, _observation(name, result, os.path.join(workspace, blob_store.BLOB_DIR))
+    result = await scheduler.run_async(name, execute_tool_call_async, name, args, workspace, time.perf_counter())
+    cache.put(name, args, result)
+    cache.invalidate(call)
+    log_raw_activity(f"TOOL_OUTPUT_{name}", result)
+    return False, _observation(name, result, os.path.join(workspace, blob_store.BLOB_DIR))
+
+def check_interrupt(messages, inbox):
+    """Moves any external messages waiting in the inbox into `messages`."""
+    for interruption_content in inbox.drain():
+        log_event("SYSTEM", f"External Interruption Received: {interruption_content[:50]}...")
+        messages.append({
+            "role": "user", 
+            "content": f"<INCOMING_MESSAGE_INTERRUPTION : {interruption_content} >"
+        })
+
+def _poll_interval(deadline):
+    """How long to wait before the next inbox check, or None once `deadline` has passed."""
+    if deadline is None:
+        return INTERRUPT_CHECK_INTERVAL
+    left = deadline - time.monotonic()
+    return min(INTERRUPT_CHECK_INTERVAL, left) if left > 0 else None
+
+def _wait_interruptible(futures, inbox, timeout=None):
+    """Waits for all futures. Returns False as soon as an urgent message arrives, or after `timeout` seconds, instead."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    pending = set(futures)
+    while pending:
+        interval = _poll_interval(deadline)
+        if inbox.urgent.is_set() or interval is None:
+            return False
+        _, pending = concurrent.futures.wait(pending, timeout=interval)
+    return True
+
+async def _wait_interruptible_async(tasks, inbox, timeout=None):
+    deadline = None if timeout is None else time.monotonic() + timeout
+    pending = set(tasks)
+    while pending:
+        interval = _poll_interval(deadline)
+        if inbox.urgent.is_set() or interval is None:
+            return False
+        _, pending = await asyncio.wait(pending, timeout=interval)
+    return True
+
+def _cancelled_observation(call, future):
+    if isinstance(future, asyncio.Future):
+        # Cancelling the task kills the tool's subprocess if it had started
+        return f"Tool {call.get('name')} Result: CANCELLED (interrupted by incoming message; if it had already started, it was killed part way)"
+    return f"Tool {call.get('name')} Result: CANCELLED (interrupted by incoming message before it started)"
+
+def _carry_late(late, step, i, call, future, why):
+    call_id = f"{step + 1}.{i + 1}"
+    late.append((call_id, call, future))
+    return f"Tool {call.get('name')} Result: PENDING (call {call_id} {why}; its result will be posted in a later message)"
+
+def _collect_observations(submitted, completed, step, late, cancel=False):
+    """
+    (is_exit, observations) in call order. Unfinished calls keep running and are added
+    to `late`; with `cancel` (urgent message), the ones that haven't started yet are
+    cancelled instead. A call already running on a tool worker can't be, so it is carried too.
+    """
+    exit_signal = False
+    observations = []
+    for i, (call, future) in enumerate(submitted):
+        if completed or (future.done() and not future.cancelled()):
+            is_exit, obs_str = future.result()
+            observations.append(obs_str)
+            exit_signal = exit_signal or is_exit
+        elif cancel and future.cancel():
+            observations.append(_cancelled_observation(call, future))
+        elif cancel:
+            observations.append(_carry_late(late, step, i, call, future, "was already running and could not be cancelled"))
+        else:
+            observations.append(_carry_late(late, step, i, call, future, "is still running"))
+    return exit_signal, observations
+
+def _abandon_submitted(submitted, step, late):
+    """An urgent message abandoned the LLM call: cancels its calls that haven't started and carries the running ones."""
+    running = []
+    for i, (call, future) in enumerate(submitted):
+        if not future.cancel() and not future.done():
+            _carry_late(late, step, i, call, future, "was already running")
+            running.append(call.get("name"))
+    if running:
+        log_event("SYSTEM", f"{len(running)} tool call(s) were already running and will finish: {', '.join(running)}")
+
+def _assistant_message(response_json):
+    """
+    The model's turn as it goes back into the history: in native mode the message
+    text plus its tool_calls, otherwise the JSON-schema reply. The parser's own
+    bookkeeping stays out.
+    """
+    if response_json.get("native_tool_calls"):
+        return {"role": "assistant", "content": response_json.get("thought") or None, "tool_calls": response_json["native_tool_calls"]}
+    if LLM_TOOL_MODE == "native" and not response_json.get("tool_calls"):
+        return {"role": "assistant", "content": response_json.get("thought", "")}
+    return {"role": "assistant", "content": json.dumps({k: v for k, v in response_json.items() if k not in ("invalid_tool_calls", "native_tool_calls")})}
+
+def _invalid_call_observations(response_json):
+    """Tells the model which of its tool calls were dropped for not parsing, so it can send them again."""
+    return [f"System Error: {reason} Please send that call again." for reason in response_json.get("invalid_tool_calls", [])]
+
+def _observation_messages(response_json, submitted, observations):
+    """
+    The results of one turn for the history: a single user message, or in native
+    mode one tool message per tool call, answering each call id of the assistant message.
+    """
+    invalid = _invalid_call_observations(response_json)
+    native = response_json.get("native_tool_calls")
+    if not native:
+        combined_obs = "\n".join(observations + invalid)
+        return [{"role": "user", "content": combined_obs}] if combined_obs else []
+    results = {call.get("id"): obs for (call, _), obs in zip(submitted, observations)}
+    # Calls without a result are the ones that didn't parse, in the same order as their errors
+    invalid = iter(invalid)
+    return [{"role": "tool", "tool_call_id": tc["id"], "content": results[tc["id"]] if tc["id"] in results else next(invalid, "System Error: not run.")}
+            for tc in native]
+
+def _error_prompt(error):
+    """What to tell the model when its reply couldn't be used."""
+    if LLM_TOOL_MODE == "native":
+        return f"System Error: {error}. Please answer again, calling the tools you need through function calls."
+    return f"System Error: {error}. Please output VALID JSON ONLY containing 'thought' and 'tool_calls'."
+
+def post_late_results(messages, late):
+    """Moves the results of straggler calls that have finished since into `messages`."""
+    observations = []
+    for entry in list(late):
+        call_id, call, future = entry
+        if not future.done():
+            continue
+        late.remove(entry)
+        if future.cancelled():
+            obs_str = f"Tool {call.get('name')} Result: CANCELLED"
+        else:
+            _, obs_str = future.result()
+        observations.append(f"[Late result for call {call_id}] {obs_str}")
+    if observations:
+        combined_obs = "\n".join(observations)
+        log_event("OBSERVATION", combined_obs)
+        messages.append({"role": "user", "content": combined_obs})
+
+def _abandon_late(late, started):
+    """Cancels the late calls that never finished; the ones still waiting on dependencies then never start."""
+    abandoned = [call_id for call_id, _, future in late if not future.done()]
+    for _, _, future in late:
+        future.cancel()
+    if abandoned:
+        log_event("SYSTEM", f"Abandoned {len(abandoned)} late tool call(s) still running after {time.time() - started:.1f}s: {', '.join(abandoned)}")
+
+def drain_late_calls(late):
+    """Session teardown: gives straggler calls LATE_CALLS_DRAIN_TIMEOUT to finish and logs their results, then cancels the rest."""
+    if not late:
+        return
+    log_event("SYSTEM", f"Session ended with {len(late)} late tool call(s) still running: {', '.join(c for c, _, _ in late)}. Waiting up to {LATE_CALLS_DRAIN_TIMEOUT}s for them.")
+    started = time.time()
+    concurrent.futures.wait([f for _, _, f in late], timeout=LATE_CALLS_DRAIN_TIMEOUT)
+    post_late_results([], late)
+    _abandon_late(late, started)
+
+async def drain_late_calls_async(late):
+    if not late:
+        return
+    log_event("SYSTEM", f"Session ended with {len(late)} late tool call(s) still running: {', '.join(c for c, _, _ in late)}. Waiting up to {LATE_CALLS_DRAIN_TIMEOUT}s for them.")
+    started = time.time()
+    await asyncio.wait([t for _, _, t in late], timeout=LATE_CALLS_DRAIN_TIMEOUT)
+    post_late_results([], late)
+    _abandon_late(late, started)
+
+_tokenizer = None
+
+def count_tokens(message):
+    """Token count for one chat message: ~4 chars/token, or tiktoken when USE_EXACT_TOKENIZER is on."""
+    global _tokenizer
+    text = str(message.get("content") or "")
+    if message.get("tool_calls"):
+        text += json.dumps(message["tool_calls"])
+    if USE_EXACT_TOKENIZER and _tokenizer is None:
+        try:
+            import tiktoken
+            _tokenizer = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _tokenizer = False
+    if _tokenizer:
+        return len(_tokenizer.encode(text, disallowed_special=())) + 4
+    return len(text) // 4 + 4
+
+def _is_observation(message):
+    """Tool results in the history, as opposed to the task, summaries and incoming user messages."""
+    content = message.get("content")
+    if not isinstance(content, str):
+        return False
+    if message.get("role") == "tool":
+        return True
+    return message.get("role") == "user" and not content.startswith(("<INCOMING_MESSAGE_INTERRUPTION", "Summary: "))
+
+class ContextWindow:
+    """
+    Tracks the token size of `messages` incrementally. Code keeps appending to
+    `messages` as before; sync() only counts what was added since the last call.
+    """
+    def __init__(self, messages, model=None):
+        self.messages = messages
+        self.counts = []
+        window = MODEL_CONTEXT_WINDOWS.get(model or MODEL_NAME, DEFAULT_CONTEXT_WINDOW)
+        self.budget = int(window * CONTEXT_COMPACT_AT) - RESERVED_COMPLETION_TOKENS
+        self.total = 0
+        self.sync()
+
+    def sync(self):
+        for message in self.messages[len(self.counts):]:
+            n = count_tokens(message)
+            self.counts.append(n)
+            self.total += n
+        return self.total
+
+    def _recent_start(self):
+        """Where the kept recent messages begin: never between a tool_calls message and its tool results."""
+        start = max(2, len(self.messages) - KEEP_RECENT_MESSAGES)
+        while start < len(self.messages) and self.messages[start].get("role") == "tool":
+            start += 1
+        return start
+
+    def compactable(self):
+        """The middle turns to fold into the summary, or [] if the prompt still fits."""
+        if self.sync() <= self.budget:
+            return []
+        middle = self.messages[2:self._recent_start()]
+        # A lone previous summary isn't worth another summary call
+        return middle if len(middle) >= 2 else []
+
+    def trim_observations(self):
+        """
+        Fallback when summarizing can't bring the prompt under budget (the middle is too
+        small, or the recent turns alone are too big): cuts the largest tool observations
+        down to their head and tail until it fits. Returns how many were trimmed.
+        """
+        trimmed = 0
+        candidates = [i for i in range(2, len(self.messages)) if _is_observation(self.messages[i])]
+        candidates.sort(key=lambda i: self.counts[i], reverse=True)
+        for i in candidates:
+            if self.sync() <= self.budget:
+                break
+            content = self.messages[i]["content"]
+            if len(content) <= SPILL_HEAD_CHARS + SPILL_TAIL_CHARS:
+                continue
+            cut = len(content) - SPILL_HEAD_CHARS - SPILL_TAIL_CHARS
+            content = (f"{content[:SPILL_HEAD_CHARS]}\n[... {cut} chars trimmed to fit the context window; "
+                       f"run the tool again if you need them ...]\n{content[-SPILL_TAIL_CHARS:]}")
+            self.messages[i] = dict(self.messages[i], content=content)
+            n = count_tokens(self.messages[i])
+            self.total += n - self.counts[i]
+            self.counts[i] = n
+            trimmed += 1
+        return trimmed
+
+    def apply_summary(self, summary):
+        # Keep System prompt [0], initial task [1], and the most recent messages.
+        # This safely throws away the middle without breaking JSON formatting.
+        recent = self.messages[self._recent_start():]
+        self.messages = self.messages[:2] + [{"role": "user", "content": f"Summary: {summary}"}] + recent
+        self.counts = []
+        self.total = 0
+        self.sync()
+        return self.messages
+
+SUMMARY_PROMPT = """Summarize the agent's work so far for its own future reference.
+Keep: facts learned, files created or changed, decisions made, what failed, and what is left to do.
+Plain text, at most 400 words."""
+
+def _summary_request(old_messages):
+    transcript = "\n\n".join(f"[{m['role']}] {m.get('content') or json.dumps(m.get('tool_calls', ''))}" for m in old_messages)
+    return [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": transcript[-SUMMARY_INPUT_CHARS:]},
+    ]
+
+FALLBACK_SUMMARY = "You can look at the TASK_PROGRESS.md in work folder for summary."
+
+def _trim_if_over_budget(ctx):
+    if ctx.sync() > ctx.budget:
+        total = ctx.total
+        trimmed = ctx.trim_observations()
+        log_event("SYSTEM", f"Context still at {total}/{ctx.budget} tokens. Trimmed {trimmed} oversized tool observations to {ctx.total}.")
+
+def compact_context(ctx, client):
+    """Folds old turns into a rolling summary before the prompt outgrows the model. Returns ctx.messages."""
+    old = ctx.compactable()
+    if old:
+        log_event("SYSTEM", f"Context at {ctx.total}/{ctx.budget} tokens. Compacting {len(old)} older messages into a summary...")
+        try:
+            resp = client.chat.completions.create(model=MODEL_NAME, messages=_summary_request(old))
+            summary = resp.choices[0].message.content.strip() or FALLBACK_SUMMARY
+        except Exception as e:
+            log_event("ERROR", f"Summary call failed, using fallback: {e}")
+            summary = FALLBACK_SUMMARY
+        ctx.apply_summary(summary)
+    _trim_if_over_budget(ctx)
+    return ctx.messages
+
+async def compact_context_async(ctx, client):
+    old = ctx.compactable()
+    if old:
+        log_event("SYSTEM", f"Context at {ctx.total}/{ctx.budget} tokens. Compacting {len(old)} older messages into a summary...")
+        try:
+            resp = await client.chat.completions.create(model=MODEL_NAME, messages=_summary_request(old))
+            summary = resp.choices[0].message.content.strip() or FALLBACK_SUMMARY
+        except Exception as e:
+            log_event("ERROR", f"Summary call failed, using fallback: {e}")
+            summary = FALLBACK_SUMMARY
+        ctx.apply_summary(summary)
+    _trim_if_over_budget(ctx)
+    return ctx.messages
 
 def run_agent(task_description):
-    client = OpenAI(api_key=API_KEY, base_url=BASE_URL)
+    client = make_client()
 
     messages = [
-        {"role": "system", "content": SYSTEM_PROMPT.replace("{MAIN_TASK}",task_description)},
+        {"role": "system", "content": system_prompt(task_description)},
         {"role": "user", "content": "Begin task."}
     ]
-    
+    ctx = ContextWindow(messages)
+    exit_signal = False
+    inbox = Inbox(on_error=lambda msg: log_event("ERROR", msg))
+    llm_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    scheduler = ToolScheduler(TOOL_POOLS)
+    cache = ToolCache(TOOL_CACHE_TTLS, TOOL_CACHE_MAX_BYTES)
+    late = []   # (call_id, call, future) still running past STEP_SOFT_DEADLINE
+    # AGENT_PROFILE=cprofile,tracemalloc,sampler dumps profiles to raw_activity/profiles/ (see profiling.py)
+    profiler = Profiler.from_env(os.path.join(_raw_activity_dir.get(), "profiles"))
     
     for step in range(MAX_STEPS):
-  
-        # 1. Check if the message bus file exists and has content
-        interrupt_file = "INCOMING_MESSAGE.md"
-        if os.path.exists(interrupt_file) and os.path.getsize(interrupt_file) > 0:
-            try:
-                # 2. Read the content
-                with open(interrupt_file, "r") as f:
-                    interruption_content = f.read().strip()
-                
-                # 3. ZERO OUT the file immediately to prevent duplicate reads
-                with open(interrupt_file, "w") as f:
-                    f.truncate(0) 
-
-                # 4. Inject into the agent's message loop
-                if interruption_content:
-                    log_event("SYSTEM", f"External Interruption Received: {interruption_content[:50]}...")
-                    messages.append({
-                        "role": "user", 
-                        "content": f"<INCOMING_MESSAGE_INTERRUPTION : {interruption_content} >"
-                    })
-            except Exception as e:
-                log_event("ERROR", f"Failed to read/clear interruption file: {e}")
-
+        step_started = time.perf_counter()
+        check_interrupt(messages, inbox)
+        post_late_results(messages, late)
 
         log_event("SYSTEM", f"--- Step {step + 1}/{MAX_STEPS} ---")
         
+        messages = compact_context(ctx, client)
         log_raw_activity("LLM_INPUT", messages)
-        response_json = get_llm_response(client, messages) 
+        # In streaming mode tools are submitted while the response is still arriving.
+        # Calls touching the same paths run in the order given, the rest in parallel.
+        submitted = []
+        graph = TurnGraph()
+        for _, call, future in late:
+            graph.carry(call, future)
+        submit = lambda call: submitted.append((call, _submit_tool(graph, scheduler, cache, call, profiler)))
+        # The LLM call runs on its own thread so an urgent message can abandon it mid-flight.
+        cancel = threading.Event()
+        llm_future = llm_executor.submit(get_llm_response, client, list(messages), submit, cancel)
+        if not _wait_interruptible([llm_future], inbox):
+            cancel.set()
+            log_event("SYSTEM", "Urgent message received. Abandoning the in-flight LLM call.")
+            _abandon_submitted(submitted, step, late)
+            continue
+        response_json = llm_future.result()
         log_raw_activity("LLM_OUTPUT", response_json)
         if not response_json: 
+            concurrent.futures.wait([f for _, f in submitted])
             break
             
         # SLICK UPGRADE: If the LLM messed up the JSON, tell it to fix it!
         if "error" in response_json:
-            error_msg = f"System Error: {response_json['error']}. Please output VALID JSON ONLY containing 'thought' and 'tool_calls'."
+            concurrent.futures.wait([f for _, f in submitted])
+            error_msg = _error_prompt(response_json["error"])
             log_event("OBSERVATION", error_msg)
             messages.append({"role": "user", "content": error_msg})
             continue # Try again
         
-        log_event("THOUGHT", response_json.get("thought", "Acting..."))
-        messages.append({"role": "assistant", "content": json.dumps(response_json)})
+        if not LLM_STREAM:
+            log_event("THOUGHT", response_json.get("thought", "Acting..."))
+        messages.append(_assistant_message(response_json))
 
         tool_calls = response_json.get("tool_calls", [])
-        observations = []
-        exit_signal = False
-
-        if tool_calls:
-            # SLICK UPGRADE: Cap concurrent workers to prevent OS crashes on massive tool call arrays
-            max_workers = min(len(tool_calls), 10) 
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                results = executor.map(_process_single_tool, tool_calls)
-                
-                for is_exit, obs_str in results:
-                    observations.append(obs_str)
-                    if is_exit:
-                        exit_signal = True
 
-        combined_obs = "\n".join(observations)
+        # Whatever the stream didn't already start (everything, when not streaming)
+        for call in tool_calls[len(submitted):]:
+            submit(call)
+        completed = _wait_interruptible([f for _, f in submitted], inbox, STEP_SOFT_DEADLINE)
+        straggling = not completed and not inbox.urgent.is_set()
+        if straggling:
+            log_event("SYSTEM", f"Soft deadline of {STEP_SOFT_DEADLINE}s passed. Continuing without the unfinished tool calls.")
+        elif not completed:
+            log_event("SYSTEM", "Urgent message received. Cancelling unfinished tool calls.")
+        exit_signal, observations = _collect_observations(submitted, completed, step, late, cancel=not straggling)
+
+        combined_obs = "\n".join(observations + _invalid_call_observations(response_json))
         if combined_obs:  
             log_event("OBSERVATION", combined_obs)
-            messages.append({"role": "user", "content": combined_obs})
+        messages.extend(_observation_messages(response_json, submitted, observations))
+        record_step_metrics(step, step_started, len(submitted))
+        if profiler:
+            profiler.step()
 
         if exit_signal:
             log_event("SYSTEM", "Task finalized successfully.")
             break
 
-        # SLICK UPGRADE: Safe Memory Management
-        current_chars = sum(len(str(m.get("content", ""))) for m in messages)
-        if current_chars > MAX_CHAR_SIZE:
-            log_event("SYSTEM", "Memory warning. Dropping oldest interactions to preserve context...")
-            # Keep System prompt [0], initial task [1], and the 6 most recent messages.
-            # This safely throws away the middle without breaking JSON formatting.
-            
-            
-            summary = [
-            {"role": "user", "content": "Summary: You can look at the TASK_PROGRESS.md in work folder for summary."}
-            ]
-            
-            messages = messages[:2] + summary+ messages[-6:]
-
     if not exit_signal:
         log_event("SYSTEM", "Agent stopped: Reached MAX_STEPS limit.")
+    # Before the pools go down: shutting them down kills whatever is still running
+    drain_late_calls(late)
+    if profiler:
+        profiler.stop()
+
+    log_event("SCHEDULER", json.dumps(scheduler.metrics()))
+    log_event("TOOL_CACHE", json.dumps(cache.stats()))
+    export_metrics()
+    inbox.close()
+    llm_executor.shutdown(wait=False)
+    scheduler.shutdown()
+    shutdown_tool_pool()
+    flush_logs()
         
     return "Agent session ended."
 
+async def run_agent_async(task_description, workspace=".", client=None, scheduler=None, profiler=None):
+    """
+    Asyncio version of run_agent. Each call is one session rooted at `workspace`
+    (tools, session_log.txt, raw_activity/ and INCOMING_MESSAGE.md all live there),
+    so many sessions can share one process, one event loop, one client and
+    one ToolScheduler (so rate limits hold across all of them). Sessions on one
+    loop must share one `profiler` too: cProfile allows one per thread.
+    """
+    workspace = os.path.abspath(workspace)
+    _session_file.set(os.path.join(workspace, "session_log.txt"))
+    _raw_activity_dir.set(os.path.join(workspace, "raw_activity"))
+    _agent_id.set(os.path.basename(workspace))
+    client = client or make_client(is_async=True)
+    scheduler = scheduler or ToolScheduler(TOOL_POOLS)
+    cache = ToolCache(TOOL_CACHE_TTLS, TOOL_CACHE_MAX_BYTES, workspace)
+    # Inbox threads don't inherit this task's context; hand them a copy so errors land in this session's log
+    session_context = contextvars.copy_context()
+    inbox = Inbox(
+        os.path.join(workspace, "INCOMING_MESSAGE.md"),
+        os.path.join(workspace, SOCKET_NAME),
+        on_error=lambda msg: session_context.copy().run(log_event, "ERROR", msg),
+    )
+
+    messages = [
+        {"role": "system", "content": system_prompt(task_description)},
+        {"role": "user", "content": "Begin task."}
+    ]
+    ctx = ContextWindow(messages)
+    exit_signal = False
+    late = []
+    # Everything but the tool subprocesses runs on the loop thread, so that's the one to sample
+    own_profiler = profiler is None
+    if own_profiler:
+        profiler = Profiler.from_env(os.path.join(_raw_activity_dir.get(), "profiles"), (threading.current_thread().name,))
+
+    for step in range(MAX_STEPS):
+        step_started = time.perf_counter()
+        check_interrupt(messages, inbox)
+        post_late_results(messages, late)
+
+        log_event("SYSTEM", f"--- Step {step + 1}/{MAX_STEPS} ---")
+
+        messages = await compact_context_async(ctx, client)
+        log_raw_activity("LLM_INPUT", messages)
+        submitted = []
+        graph = TurnGraph(workspace)
+        for _, call, task in late:
+            graph.carry(call, task)
+        submit = lambda call: submitted.append((call, graph.add(
+            call, lambda deps: asyncio.ensure_future(_process_single_tool_async(call, workspace, scheduler, cache, deps)))))
+        llm_task = asyncio.ensure_future(get_llm_response_async(client, list(messages), on_tool_call=submit))
+        if not await _wait_interruptible_async([llm_task], inbox):
+            llm_task.cancel()
+            for _, task in submitted:
+                task.cancel()
+            log_event("SYSTEM", "Urgent message received. Abandoning the in-flight LLM call.")
+            continue
+        response_json = llm_task.result()
+        log_raw_activity("LLM_OUTPUT", response_json)
+        if not response_json:
+            await asyncio.gather(*[t for _, t in submitted])
+            break
+
+        if "error" in response_json:
+            await asyncio.gather(*[t for _, t in submitted])
+            error_msg = _error_prompt(response_json["error"])
+            log_event("OBSERVATION", error_msg)
+            messages.append({"role": "user", "content": error_msg})
+            continue
+
+        if not LLM_STREAM:
+            log_event("THOUGHT", response_json.get("thought", "Acting..."))
+        messages.append(_assistant_message(response_json))
+
+        for call in response_json.get("tool_calls", [])[len(submitted):]:
+            submit(call)
+        completed = await _wait_interruptible_async([t for _, t in submitted], inbox, STEP_SOFT_DEADLINE)
+        straggling = not completed and not inbox.urgent.is_set()
+        if straggling:
+            log_event("SYSTEM", f"Soft deadline of {STEP_SOFT_DEADLINE}s passed. Continuing without the unfinished tool calls.")
+        elif not completed:
+            log_event("SYSTEM", "Urgent message received. Cancelling unfinished tool calls.")
+        exit_signal, observations = _collect_observations(submitted, completed, step, late, cancel=not straggling)
+
+        combined_obs = "\n".join(observations + _invalid_call_observations(response_json))
+        if combined_obs:
+            log_event("OBSERVATION", combined_obs)
+        messages.extend(_observation_messages(response_json, submitted, observations))
+        record_step_metrics(step, step_started, len(submitted))
+        if profiler:
+            profiler.step()
+
+        if exit_signal:
+            log_event("SYSTEM", "Task finalized successfully.")
+            break
+
+    if not exit_signal:
+        log_event("SYSTEM", "Agent stopped: Reached MAX_STEPS limit.")
+    await drain_late_calls_async(late)
+    if profiler and own_profiler:
+        profiler.stop()
+
+    log_event("TOOL_CACHE", json.dumps(cache.stats()))
+    export_metrics()
+    inbox.close()
+    flush_logs()
+    return "Agent session ended."
+
+async def run_agents_async(workspaces):
+    """Runs one session per workspace (each must contain task.md) concurrently on a single event loop."""
+    client = make_client(is_async=True)
+    scheduler = ToolScheduler(TOOL_POOLS)
+    # One profiler for the loop thread all sessions share, dumped to raw_activity/profiles/ of the current directory
+    profiler = Profiler.from_env(os.path.join(_raw_activity_dir.get(), "profiles"), (threading.current_thread().name,))
+    sessions = []
+    for workspace in workspaces:
+        with open(os.path.join(workspace, "task.md"), "r") as f:
+            sessions.append(run_agent_async(f.read(), workspace, client, scheduler, profiler))
+    results = await asyncio.gather(*sessions, return_exceptions=True)
+    log_event("SCHEDULER", json.dumps(scheduler.metrics()))
+    scheduler.shutdown()
+    if profiler:
+        profiler.stop()
+    return results
+
 if __name__ == "__main__":
     # Ensure workspace logic stays intact if use_tools.py depends on it
     os.makedirs(WORK_DIR, exist_ok=True)
+
+    # `python3 wrapper.py ws1 ws2 ...` runs every workspace's task.md in this one process
+    if len(sys.argv) > 1:
+        for workspace, result in zip(sys.argv[1:], asyncio.run(run_agents_async(sys.argv[1:]))):
+            print(f"{workspace}: {result}")
+        sys.exit(0)
     
     # Read directly from task.md in the current directory
     try: